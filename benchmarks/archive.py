@@ -0,0 +1,124 @@
+"""Measure load time and disk usage of archived chats on a synthetic corpus.
+
+Usage:
+    python -m benchmarks.archive [--chats 50000] [--samples 200] [--seed 0]
+
+The corpus is written to a temporary data dir (XDG_DATA_HOME), with every chat
+older than the archive cutoff. Disk usage counts the allocated blocks, small
+files take a whole block each.
+"""
+
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from collections.abc import Callable
+from pathlib import Path
+
+WORDS = (
+    "the a python function returns list of values error when calling api with "
+    "async request timeout config file database query index cache memory thread "
+    "process terminal output you can use this instead change line code example"
+).split()
+
+
+def make_chat(rng: random.Random) -> list[dict[str, str]]:
+    messages = [{"role": "system", "content": "You are a helpful assistant."}]
+    for _ in range(rng.randint(1, 12)):
+        for role, words in (("user", 30), ("assistant", 250)):
+            lines = [
+                " ".join(rng.choices(WORDS, k=rng.randint(5, 15)))
+                for _ in range(rng.randint(1, words // 10))
+            ]
+            messages.append({"role": role, "content": "\n".join(lines)})
+    return messages
+
+
+def disk_usage(path: Path) -> int:
+    return sum(
+        file_path.stat().st_blocks * 512
+        for file_path in path.rglob("*")
+        if file_path.is_file()
+    )
+
+
+def median_ms(func: Callable[[str], object], chat_ids: list[str]) -> float:
+    timings: list[float] = []
+    for chat_id in chat_ids:
+        start = time.perf_counter()
+        func(chat_id)
+        timings.append(time.perf_counter() - start)
+    return statistics.median(timings) * 1000
+
+
+def report(name: str, value: str):
+    sys.stdout.write(f"{name:<34} {value:>14}\n")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--chats", type=int, default=50_000)
+    parser.add_argument("--samples", type=int, default=200)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as data_home:
+        os.environ["XDG_DATA_HOME"] = data_home
+        from llm_chat_term import db
+
+        rng = random.Random(args.seed)  # noqa: S311
+        old = time.time() - 90 * 24 * 60 * 60
+        start = time.perf_counter()
+        for i in range(args.chats):
+            chat_id = f"chat {i}"
+            db.save_chat_history(chat_id, make_chat(rng))
+            os.utime(db.get_chat_file(chat_id), (old + i, old + i))
+        report("corpus written", f"{time.perf_counter() - start:.1f}s")
+
+        data_dir = db.get_data_dir()
+        samples = rng.sample([f"chat {i}" for i in range(args.chats)], args.samples)
+        plain_usage = disk_usage(data_dir)
+        report("disk usage, plain", f"{plain_usage / 2**20:.1f} MB")
+        start = time.perf_counter()
+        db.list_all_chats()
+        report("list_all_chats, plain", f"{time.perf_counter() - start:.3f}s")
+        report(
+            "load_chat_history, plain",
+            f"{median_ms(db.load_chat_history, samples):.3f} ms",
+        )
+
+        start = time.perf_counter()
+        archived, original_bytes, compressed_bytes = db.archive_chats(days=30)
+        report(
+            f"archive_chats ({db.get_archive_codec()})",
+            f"{time.perf_counter() - start:.1f}s",
+        )
+        report("chats archived", str(archived))
+        report(
+            "compression ratio",
+            f"{original_bytes / max(compressed_bytes, 1):.2f}x",
+        )
+        archive_usage = disk_usage(data_dir)
+        report("disk usage, archived", f"{archive_usage / 2**20:.1f} MB")
+        start = time.perf_counter()
+        db.list_all_chats()
+        report("list_all_chats, archived", f"{time.perf_counter() - start:.3f}s")
+
+        def load_archived(chat_id: str):
+            return db.load_chat_history(chat_id, restore=False)
+
+        report(
+            "load_chat_history, archived",
+            f"{median_ms(load_archived, samples):.3f} ms",
+        )
+        report(
+            "load_chat_history + restore",
+            f"{median_ms(db.load_chat_history, samples):.3f} ms",
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,179 @@
+"""A stub OpenAI-compatible server, standing in for llama.cpp or vLLM.
+
+Usage:
+    python -m benchmarks.stub_server [--port 8089] [--models stub-model]
+        [--ttft-ms 100] [--tokens-per-second 100] [--tokens 200]
+
+Add it to the config as an endpoint:
+
+    llm:
+      endpoints:
+        - name: stub
+          base_url: http://127.0.0.1:8089/v1
+
+It serves /v1/models and streaming or plain /v1/chat/completions with
+synthetic text, over keep-alive connections. The number of connections is
+reported, to check that requests reuse them.
+"""
+
+import argparse
+import json
+import random
+import sys
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, ClassVar
+
+WORDS = (
+    "the a function returns list of values error when calling api with async "
+    "request timeout config file database query index cache memory thread"
+).split()
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    # Keep-alive, the streams use chunked transfer encoding
+    protocol_version = "HTTP/1.1"
+    models: ClassVar[list[str]] = ["stub-model"]
+    ttft: ClassVar[float] = 0.1
+    token_delay: ClassVar[float] = 0.01
+    tokens: ClassVar[int] = 200
+    connections: ClassVar[int] = 0
+
+    def setup(self):
+        super().setup()
+        StubHandler.connections += 1
+        sys.stdout.write(f"connection {StubHandler.connections}\n")
+
+    def log_message(self, format: str, *args: Any):  # noqa: A002, ARG002
+        return
+
+    def _send_json(self, data: dict[str, Any], status: int = 200):
+        body = json.dumps(data).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _write_chunk(self, data: bytes):
+        self.wfile.write(f"{len(data):x}\r\n".encode() + data + b"\r\n")
+        self.wfile.flush()
+
+    def do_GET(self):  # noqa: N802
+        if self.path.rstrip("/") != "/v1/models":
+            self._send_json({"error": {"message": "Not found"}}, 404)
+            return
+        self._send_json(
+            {
+                "object": "list",
+                "data": [
+                    {"id": model, "object": "model", "owned_by": "stub"}
+                    for model in self.models
+                ],
+            }
+        )
+
+    def do_POST(self):  # noqa: N802
+        if self.path.rstrip("/") != "/v1/chat/completions":
+            self._send_json({"error": {"message": "Not found"}}, 404)
+            return
+        length = int(self.headers.get("Content-Length", 0))
+        request = json.loads(self.rfile.read(length))
+        model = request.get("model", self.models[0])
+        prompt_tokens = (
+            sum(len(str(message.get("content", ""))) for message in request["messages"])
+            // 4
+        )
+        rng = random.Random(prompt_tokens)  # noqa: S311
+        words = [f"{rng.choice(WORDS)} " for _ in range(self.tokens)]
+        completion_id = f"chatcmpl-{uuid.uuid4().hex[:12]}"
+        usage = {
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": len(words),
+            "total_tokens": prompt_tokens + len(words),
+        }
+        time.sleep(self.ttft)
+
+        if not request.get("stream"):
+            self._send_json(
+                {
+                    "id": completion_id,
+                    "object": "chat.completion",
+                    "created": int(time.time()),
+                    "model": model,
+                    "choices": [
+                        {
+                            "index": 0,
+                            "message": {"role": "assistant", "content": "".join(words)},
+                            "finish_reason": "stop",
+                        }
+                    ],
+                    "usage": usage,
+                }
+            )
+            return
+
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+
+        def event(choices: list[dict[str, Any]], **extra: Any) -> bytes:
+            data = {
+                "id": completion_id,
+                "object": "chat.completion.chunk",
+                "created": int(time.time()),
+                "model": model,
+                "choices": choices,
+                **extra,
+            }
+            return f"data: {json.dumps(data)}\n\n".encode()
+
+        i = 0
+        try:
+            for i, word in enumerate(words):
+                delta = (
+                    {"content": word} if i else {"role": "assistant", "content": word}
+                )
+                self._write_chunk(
+                    event([{"index": 0, "delta": delta, "finish_reason": None}])
+                )
+                time.sleep(self.token_delay)
+        except (BrokenPipeError, ConnectionResetError):
+            # The client cancelled the stream
+            sys.stdout.write(f"cancelled after {i} tokens\n")
+            self.close_connection = True
+            return
+        self._write_chunk(event([{"index": 0, "delta": {}, "finish_reason": "stop"}]))
+        if request.get("stream_options", {}).get("include_usage"):
+            self._write_chunk(event([], usage=usage))
+        self._write_chunk(b"data: [DONE]\n\n")
+        self._write_chunk(b"")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8089)
+    parser.add_argument("--models", nargs="+", default=["stub-model"])
+    parser.add_argument("--ttft-ms", type=float, default=100)
+    parser.add_argument("--tokens-per-second", type=float, default=100)
+    parser.add_argument("--tokens", type=int, default=200)
+    args = parser.parse_args()
+
+    StubHandler.models = args.models
+    StubHandler.ttft = args.ttft_ms / 1000
+    StubHandler.token_delay = 1 / args.tokens_per_second
+    StubHandler.tokens = args.tokens
+    server = ThreadingHTTPServer((args.host, args.port), StubHandler)
+    sys.stdout.write(f"Serving on http://{args.host}:{args.port}/v1\n")
+    sys.stdout.flush()
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,314 @@
+"""Benchmark the storage, rendering and streaming hot paths.
+
+Usage:
+    python -m benchmarks.suite [names ...] [--repeat 5] [--tolerance 0.5]
+        [--update]
+
+Every benchmark is run --repeat times and its median is compared with the
+threshold in benchmarks/thresholds.json. A median more than --tolerance above
+its threshold is a regression and the suite exits with 1. Thresholds depend on
+the machine, regenerate them with --update when the hardware or a benchmark
+changes. The config and data dirs point to temporary directories.
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from collections.abc import Callable
+from pathlib import Path
+from typing import Any
+
+THRESHOLDS_FILE = Path(__file__).with_name("thresholds.json")
+
+WORDS = (
+    "the a python function returns list of values error when calling api with "
+    "async request timeout config file database query index cache memory thread "
+    "process terminal output you can use this instead change line code example"
+).split()
+
+# A benchmark prepares its data and returns the function that is timed
+Benchmark = Callable[[], Callable[[], Any]]
+_benchmarks: dict[str, Benchmark] = {}
+_rng = random.Random(0)  # noqa: S311
+
+
+def benchmark(name: str) -> Callable[[Benchmark], Benchmark]:
+    def register(func: Benchmark) -> Benchmark:
+        _benchmarks[name] = func
+        return func
+
+    return register
+
+
+def make_text(lines: int) -> str:
+    return "\n".join(
+        " ".join(_rng.choices(WORDS, k=_rng.randint(5, 15))) for _ in range(lines)
+    )
+
+
+def make_answer(lines: int) -> str:
+    """Markdown like the LLM answers, with lists and a code block."""
+    return (
+        f"{make_text(lines // 2)}\n\n"
+        + "\n".join(f"- {make_text(1)}" for _ in range(lines // 4))
+        + "\n\n```python\n"
+        + "\n".join(f"value_{i} = compute({i})" for i in range(lines // 4))
+        + "\n```\n"
+    )
+
+
+def make_messages(exchanges: int) -> list[dict[str, str]]:
+    messages = [{"role": "system", "content": "You are a helpful assistant."}]
+    for _ in range(exchanges):
+        messages.append({"role": "user", "content": make_text(3)})
+        messages.append({"role": "assistant", "content": make_answer(24)})
+    return messages
+
+
+def save_chats(prefix: str, count: int, exchanges: int) -> list[str]:
+    from llm_chat_term import db
+
+    chat_ids = [f"{prefix} {i}" for i in range(count)]
+    for chat_id in chat_ids:
+        db.save_chat_history(chat_id, make_messages(exchanges))
+    return chat_ids
+
+
+@benchmark("db.save_chat_history[10 messages]")
+def bench_save_small():
+    from llm_chat_term import db
+
+    messages = make_messages(5)
+    return lambda: db.save_chat_history("save small", messages)
+
+
+@benchmark("db.save_chat_history[400 messages]")
+def bench_save_large():
+    from llm_chat_term import db
+
+    messages = make_messages(200)
+    return lambda: db.save_chat_history("save large", messages)
+
+
+@benchmark("db.load_chat_history[10 messages]")
+def bench_load_small():
+    from llm_chat_term import db
+
+    (chat_id,) = save_chats("load small", 1, 5)
+    return lambda: db.load_chat_history(chat_id)
+
+
+@benchmark("db.load_chat_history[400 messages]")
+def bench_load_large():
+    from llm_chat_term import db
+
+    (chat_id,) = save_chats("load large", 1, 200)
+    return lambda: db.load_chat_history(chat_id)
+
+
+@benchmark("db.list_all_chats[2000 chats]")
+def bench_list_chats():
+    from llm_chat_term import db
+
+    save_chats("list", 2000, 1)
+    return db.list_all_chats
+
+
+def get_null_ui() -> Any:
+    """A ChatUI rendering to a fixed size terminal that is discarded."""
+    from rich.console import Console
+    from rich.live import Live
+
+    from llm_chat_term.ui.chat_ui import ChatUI
+
+    # prompt_toolkit warns when stdin is not a terminal, e.g. in CI
+    with contextlib.redirect_stderr(io.StringIO()):
+        ui = ChatUI()
+    ui.console = Console(file=io.StringIO(), force_terminal=True, width=120, height=40)
+    ui.live = Live(console=ui.console, auto_refresh=False)
+    return ui
+
+
+@benchmark("ChatUI.render_conversation[100 messages]")
+def bench_render_conversation():
+    from langchain_core.messages import AIMessage, HumanMessage
+
+    ui = get_null_ui()
+    messages = [
+        message
+        for _ in range(50)
+        for message in (HumanMessage(make_text(3)), AIMessage(make_answer(24)))
+    ]
+
+    def render():
+        ui.console.file = io.StringIO()
+        ui.render_conversation(messages, "benchmark")
+
+    return render
+
+
+@benchmark("ChatUI._update_live[300 tokens]")
+def bench_update_live():
+    ui = get_null_ui()
+    tokens = [f"{word} " for word in make_answer(24).split(" ")][:300]
+
+    def stream():
+        ui.console.file = io.StringIO()
+        for token in tokens:
+            ui.stream_token(token, "text")
+        ui.end_streaming()
+
+    return stream
+
+
+@benchmark("ChatUI.stream_token[2000 thinking tokens]")
+def bench_stream_thinking():
+    ui = get_null_ui()
+    tokens = [f"{word} " for word in make_text(300).split(" ")][:2000]
+
+    def stream():
+        ui.console.file = io.StringIO()
+        for token in tokens:
+            ui.stream_token(token, "thinking")
+        ui.end_streaming()
+
+    return stream
+
+
+def make_chunk_streams() -> list[Any]:
+    """Chunks shaped like the ones the providers stream."""
+    from langchain_core.messages import AIMessageChunk
+
+    chunks: list[Any] = []
+    # Anthropic: content blocks, thinking then text
+    chunks.extend(
+        AIMessageChunk(
+            content=[{"type": "thinking", "thinking": f"{word} ", "index": 0}]
+        )
+        for word in make_text(50).split()
+    )
+    chunks.extend(
+        AIMessageChunk(content=[{"type": "text", "text": f"{word} ", "index": 1}])
+        for word in make_text(100).split()
+    )
+    # OpenAI and DeepSeek: plain strings, Google: lists of strings
+    chunks.extend(AIMessageChunk(content=f"{word} ") for word in make_text(100).split())
+    chunks.extend(
+        AIMessageChunk(content=[f"{word} "]) for word in make_text(100).split()
+    )
+    # Tool call chunks have no content
+    chunks.extend(AIMessageChunk(content=[]) for _ in range(100))
+    return chunks
+
+
+@benchmark("get_chunk_text_and_type[recorded streams]")
+def bench_chunk_text_and_type():
+    from llm_chat_term.llm.llm_client import get_chunk_text_and_type
+
+    chunks = make_chunk_streams()
+
+    def run():
+        for chunk in chunks:
+            get_chunk_text_and_type(chunk)
+
+    return run
+
+
+@benchmark("parse_insert_commands[5 MB file]")
+def bench_parse_insert_commands():
+    from llm_chat_term.llm.insert_commands import parse_insert_commands
+
+    file_path = Path(os.environ["XDG_DATA_HOME"]) / "large.txt"
+    file_path.write_text(make_text(60_000), encoding="utf-8")
+    user_input = f"Explain this file:\n:read {file_path}\nThanks"
+
+    def run():
+        # It reports the embedded files on stdout
+        with contextlib.redirect_stdout(io.StringIO()):
+            parse_insert_commands(user_input)
+
+    return run
+
+
+# Fast benchmarks are looped until a timing takes at least this long
+MIN_TIMING_SECONDS = 0.05
+
+
+def run_benchmark(setup: Benchmark, repeat: int) -> float:
+    """The median time of a call, fast calls are timed in loops like timeit."""
+    func = setup()
+    start = time.perf_counter()
+    func()  # Warm up caches and imports
+    first = time.perf_counter() - start
+    number = max(1, int(MIN_TIMING_SECONDS / max(first, 1e-9)))
+
+    timings: list[float] = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(number):
+            func()
+        timings.append((time.perf_counter() - start) / number)
+    return statistics.median(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("names", nargs="*", help="Run only these benchmarks")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument(
+        "--tolerance",
+        type=float,
+        default=0.5,
+        help="Allowed slowdown over the threshold, 0.5 is 50%%",
+    )
+    parser.add_argument(
+        "--update", action="store_true", help="Save the results as thresholds"
+    )
+    args = parser.parse_args()
+
+    thresholds: dict[str, float] = (
+        json.loads(THRESHOLDS_FILE.read_text()) if THRESHOLDS_FILE.exists() else {}
+    )
+    names = args.names or list(_benchmarks)
+    regressions: list[str] = []
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        os.environ["XDG_CONFIG_HOME"] = str(Path(tmp_dir) / "config")
+        os.environ["XDG_DATA_HOME"] = str(Path(tmp_dir) / "data")
+        Path(os.environ["XDG_DATA_HOME"]).mkdir()
+        # Loading the config writes the default one
+        with contextlib.redirect_stdout(io.StringIO()):
+            import llm_chat_term.config  # noqa: F401
+
+        sys.stdout.write(f"{'benchmark':<44} {'median':>10} {'threshold':>10}\n")
+        for name in names:
+            median = run_benchmark(_benchmarks[name], args.repeat)
+            threshold = thresholds.get(name)
+            status = ""
+            if args.update:
+                thresholds[name] = round(median, 6)
+            elif threshold is not None and median > threshold * (1 + args.tolerance):
+                status = "  REGRESSION"
+                regressions.append(name)
+            sys.stdout.write(
+                f"{name:<44} {median * 1000:>8.2f}ms "
+                + (f"{threshold * 1000:>8.2f}ms" if threshold else f"{'-':>10}")
+                + f"{status}\n"
+            )
+
+    if args.update:
+        THRESHOLDS_FILE.write_text(json.dumps(thresholds, indent=2) + "\n")
+        sys.stdout.write(f"Saved thresholds to {THRESHOLDS_FILE}\n")
+    if regressions:
+        sys.stdout.write(f"{len(regressions)} benchmarks regressed\n")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
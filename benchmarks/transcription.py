@@ -0,0 +1,78 @@
+"""Compare the latency and real-time factor of the transcription backends.
+
+Usage:
+    python -m benchmarks.transcription speech.wav [more.wav ...]
+        [--backends openai local mock] [--local-model base.en] [--runs 3]
+
+The real-time factor is the transcription time divided by the audio duration,
+lower is better and below 1 means faster than real time. The local backend
+is loaded (and reported) before timing, like it is kept warm in the app.
+"""
+
+import argparse
+import statistics
+import sys
+import time
+import wave
+from pathlib import Path
+
+from llm_chat_term.audio.speech_to_text import (
+    MockTranscriptionBackend,
+    OpenAITranscriptionBackend,
+    TranscriptionBackend,
+    get_local_backend,
+)
+from llm_chat_term.utils import get_api_key
+
+
+def get_duration(path: Path) -> float:
+    with wave.open(str(path), "rb") as wav:
+        return wav.getnframes() / wav.getframerate()
+
+
+def get_backend(name: str, local_model: str) -> TranscriptionBackend:
+    if name == "openai":
+        return OpenAITranscriptionBackend(get_api_key("openai").get_secret_value())
+    if name == "local":
+        start = time.monotonic()
+        backend = get_local_backend(local_model)
+        backend.ready.wait()
+        sys.stdout.write(
+            f"local: loaded {local_model} in {time.monotonic() - start:.2f}s\n"
+        )
+        return backend
+    return MockTranscriptionBackend()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("files", nargs="+", type=Path, help="WAV files to transcribe")
+    parser.add_argument(
+        "--backends", nargs="+", default=["openai", "local"], help="Backends"
+    )
+    parser.add_argument("--local-model", default="base.en")
+    parser.add_argument("--runs", type=int, default=3)
+    args = parser.parse_args()
+
+    sys.stdout.write(
+        f"{'backend':<8} {'file':<24} {'audio':>7} {'median':>8} {'rtf':>6}\n"
+    )
+    for backend_name in args.backends:
+        backend = get_backend(backend_name, args.local_model)
+        for path in args.files:
+            audio = path.read_bytes()
+            duration = get_duration(path)
+            latencies: list[float] = []
+            for _ in range(args.runs):
+                start = time.monotonic()
+                backend.transcribe(audio, path.name)
+                latencies.append(time.monotonic() - start)
+            median = statistics.median(latencies)
+            sys.stdout.write(
+                f"{backend_name:<8} {path.name[:24]:<24} {duration:>6.1f}s "
+                f"{median:>7.2f}s {median / duration:>6.2f}\n"
+            )
+
+
+if __name__ == "__main__":
+    main()
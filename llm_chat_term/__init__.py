@@ -1,7 +1,9 @@
 from llm_chat_term.llm.tools.handlers.cat import handle_cat
 from llm_chat_term.llm.tools.handlers.git import handle_git
+from llm_chat_term.llm.tools.handlers.search import handle_search
 
 __all__ = [
     "handle_cat",
     "handle_git",
+    "handle_search",
 ]
@@ -1,11 +1,34 @@
 import sys
 
+from llm_chat_term.config import config
 from llm_chat_term.utils import has_audio_support
 
 
+def prewarm_voice():
+    """Prepare the audio input and start loading the local transcription model."""
+    if not has_audio_support():
+        return
+
+    from llm_chat_term.audio.speech_to_text import get_local_backend
+    from llm_chat_term.audio.voice_command import prime_audio_input
+
+    # PyAudio swaps stdout/stderr while initializing, so not in a thread
+    prime_audio_input()
+    if config.voice.backend != "local":
+        return
+
+    get_local_backend(
+        config.voice.local_model,
+        config.voice.local_compute_type,
+        config.voice.language,
+    )
+
+
 def handle_voice():
     if not has_audio_support():
-        sys.stderr.write("No voice support found. Install llm_chat_term[voice]\n")
+        sys.stderr.write(
+            "No voice support found. Install llm_chat_term[voice] and ffmpeg\n"
+        )
         return ""
 
     from llm_chat_term.audio.voice_command import process_voice_command
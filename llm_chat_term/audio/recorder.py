@@ -1,88 +1,235 @@
+import shutil
+import subprocess
 import sys
-import tempfile
-import warnings
+import threading
+import time
 import wave
-from pathlib import Path
+from collections.abc import Callable
+from dataclasses import dataclass
+from functools import cache
+from io import BytesIO
 
-import pyaudio
-from pydub import AudioSegment
+from llm_chat_term.audio.session import get_audio_session
 
-from llm_chat_term.audio.pyaudio_no_log import PyAudioNoLog
+SAMPLE_WIDTH = 2  # paInt16
+# Captured audio waiting to be encoded, 10 seconds at 16kHz mono
+RING_BUFFER_SECONDS = 10
 
-# Silence tye pydub warnings coming from broken regexes
-warnings.filterwarnings("ignore", category=SyntaxWarning, module="pydub.utils")
 
+@dataclass
+class Recording:
+    data: bytes
+    file_name: str
 
-def record_audio(
+
+class RingBuffer:
+    """Preallocated byte ring buffer between the capture and the encoder threads."""
+
+    def __init__(self, capacity: int):
+        self.buffer = bytearray(capacity)
+        self.capacity = capacity
+        # Total bytes written/read, positions in the buffer are modulo capacity
+        self.written = 0
+        self.read_total = 0
+        self.dropped = 0
+        self.closed = False
+        self.condition = threading.Condition()
+
+    def write(self, data: bytes) -> None:
+        with self.condition:
+            free = self.capacity - (self.written - self.read_total)
+            if len(data) > free:
+                # The encoder fell behind, drop the newest audio
+                self.dropped += len(data) - free
+                data = data[:free]
+            start = self.written % self.capacity
+            first = min(len(data), self.capacity - start)
+            self.buffer[start : start + first] = data[:first]
+            self.buffer[: len(data) - first] = data[first:]
+            self.written += len(data)
+            self.condition.notify()
+
+    def read(self, max_bytes: int) -> bytes:
+        """Block until there is data, returns b"" once closed and drained."""
+        with self.condition:
+            while self.written == self.read_total and not self.closed:
+                self.condition.wait()
+            size = min(max_bytes, self.written - self.read_total)
+            start = self.read_total % self.capacity
+            first = min(size, self.capacity - start)
+            data = bytes(self.buffer[start : start + first]) + bytes(
+                self.buffer[: size - first]
+            )
+            self.read_total += size
+            return data
+
+    def close(self) -> None:
+        with self.condition:
+            self.closed = True
+            self.condition.notify()
+
+
+@cache
+def _get_encoder() -> tuple[list[str], str] | None:
+    """Get the ffmpeg output arguments and file name, None without ffmpeg."""
+    ffmpeg = shutil.which("ffmpeg")
+    if not ffmpeg:
+        return None
+    encoders = subprocess.run(  # noqa: S603
+        [ffmpeg, "-hide_banner", "-encoders"],
+        capture_output=True,
+        text=True,
+        check=False,
+    ).stdout
+    if "libopus" in encoders:
+        return ["-c:a", "libopus", "-b:a", "24k", "-f", "ogg"], "speech.ogg"
+    return ["-c:a", "flac", "-f", "flac"], "speech.flac"
+
+
+class StreamingEncoder:
+    """Encode raw PCM as it is captured, compressed in memory through ffmpeg.
+
+    Without ffmpeg the audio is written to an in-memory WAV file instead.
+    """
+
+    def __init__(self, sample_rate: int, channels: int):
+        self.output = BytesIO()
+        self.encoder = _get_encoder()
+        self.process: subprocess.Popen[bytes] | None = None
+        self.wav: wave.Wave_write | None = None
+        self.reader: threading.Thread | None = None
+        if self.encoder is None:
+            self.wav = wave.open(self.output, "wb")  # noqa: SIM115
+            self.wav.setnchannels(channels)
+            self.wav.setsampwidth(SAMPLE_WIDTH)
+            self.wav.setframerate(sample_rate)
+            return
+
+        output_args, _ = self.encoder
+        self.process = subprocess.Popen(  # noqa: S603
+            [  # noqa: S607
+                "ffmpeg",
+                "-hide_banner",
+                "-loglevel",
+                "error",
+                "-f",
+                "s16le",
+                "-ar",
+                str(sample_rate),
+                "-ac",
+                str(channels),
+                "-i",
+                "pipe:0",
+                *output_args,
+                "pipe:1",
+            ],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL,
+        )
+        self.reader = threading.Thread(target=self._collect, daemon=True)
+        self.reader.start()
+
+    @property
+    def file_name(self) -> str:
+        return self.encoder[1] if self.encoder else "speech.wav"
+
+    def _collect(self) -> None:
+        if self.process is None or self.process.stdout is None:
+            return
+        while chunk := self.process.stdout.read1(64 * 1024):
+            self.output.write(chunk)
+
+    def write(self, pcm: bytes) -> None:
+        if self.wav is not None:
+            self.wav.writeframesraw(pcm)
+        elif self.process is not None and self.process.stdin is not None:
+            self.process.stdin.write(pcm)
+
+    def finish(self) -> bytes:
+        if self.wav is not None:
+            self.wav.close()
+        elif self.process is not None and self.process.stdin is not None:
+            self.process.stdin.close()
+            self.process.wait()
+            if self.reader:
+                self.reader.join()
+        return self.output.getvalue()
+
+
+def encode_pcm(pcm: bytes, sample_rate: int, channels: int = 1) -> Recording:
+    """Encode captured PCM like a recording, e.g. a speech segment."""
+    encoder = StreamingEncoder(sample_rate, channels)
+    encoder.write(pcm)
+    return Recording(encoder.finish(), encoder.file_name)
+
+
+def capture_audio(
     audio_device_idx: int,
+    consume: Callable[[bytes], None],
     sample_rate: int = 16000,
     channels: int = 1,
     chunk: int = 1024,
-) -> str | None:
-    """Record audio from microphone until Ctrl+C and save as MP3"""
-    # Initialize PyAudio, capturing stdout and stderr to avoid it
-    # flooding the console with warnings
-    with PyAudioNoLog() as pyaudio_initializer:
-        p = pyaudio_initializer
-
-    with tempfile.NamedTemporaryFile(suffix=".wav", delete=False) as temp:
-        temp_wav = temp.name
-    with tempfile.NamedTemporaryFile(suffix=".mp3", delete=False) as temp:
-        temp_mp3 = temp.name
+) -> int | None:
+    """Capture audio from microphone until Ctrl+C.
 
-    sys.stdout.write("Recording... Press Ctrl+C to stop")
-    sys.stdout.flush()
+    The raw PCM is passed to consume from a separate thread as it is captured.
+    Returns the number of bytes captured, None if the capture failed.
+    """
+    ring = RingBuffer(sample_rate * channels * SAMPLE_WIDTH * RING_BUFFER_SECONDS)
+
+    def drain():
+        while pcm := ring.read(chunk * SAMPLE_WIDTH * channels * 4):
+            consume(pcm)
+
+    session = get_audio_session()
     try:
-        # Open stream
-        stream = p.open(
-            format=pyaudio.paInt16,
-            channels=channels,
-            rate=sample_rate,
-            input=True,
-            input_device_index=audio_device_idx,
-            frames_per_buffer=chunk,
-        )
+        # Already open, unless the device or the parameters changed
+        stream = session.prime(audio_device_idx, sample_rate, channels, chunk)
+        session.start(ring.write)
     except Exception as e:
         sys.stderr.write(f"Error capturing audio: {e}\n")
         return None
 
-    frames: list[bytes] = []
-
+    sys.stdout.write("Recording... Press Ctrl+C to stop")
+    sys.stdout.flush()
+    drain_thread = threading.Thread(target=drain, daemon=True)
+    drain_thread.start()
     try:
-        while True:
-            data = stream.read(chunk)
-            frames.append(data)
+        while stream.is_active():
+            time.sleep(0.05)
     except KeyboardInterrupt:
         sys.stdout.write("\033[2K")  # Clear the entire line and return to start
         sys.stdout.flush()
         sys.stdout.write("Recording stopped. Transcribing audio...\n")
     finally:
-        # Stop and close the stream
-        stream.stop_stream()
-        stream.close()
-        p.terminate()
-
-    if frames:
-        # Save as WAV first (temporary)
-        wf = wave.open(temp_wav, "wb")  # noqa: SIM115
-        wf.setnchannels(channels)
-        wf.setsampwidth(p.get_sample_size(pyaudio.paInt16))
-        wf.setframerate(sample_rate)
-        wf.writeframes(b"".join(frames))
-        wf.close()
-
-        # Convert to MP3
-        sound = AudioSegment.from_wav(temp_wav)
-        sound.export(
-            temp_mp3,
-            format="mp3",
-            bitrate="64k",
-            parameters=["-ac", "1", "-ar", "16000"],
-        )
+        # Stop the stream, it stays open for the next recording
+        session.stop()
+        ring.close()
+
+    # Only the tail of the audio is left to consume
+    drain_thread.join()
+    if ring.dropped:
+        sys.stderr.write(f"Dropped {ring.dropped} bytes of audio...\n")
+    return ring.written
+
+
+def record_audio(
+    audio_device_idx: int,
+    sample_rate: int = 16000,
+    channels: int = 1,
+    chunk: int = 1024,
+) -> Recording | None:
+    """Record audio from microphone until Ctrl+C, encoding it while recording"""
+    encoder = StreamingEncoder(sample_rate, channels)
+    captured = capture_audio(
+        audio_device_idx, encoder.write, sample_rate, channels, chunk
+    )
+    data = encoder.finish()
 
-        # Remove temporary WAV file
-        Path(temp_wav).unlink()
-        return temp_mp3
+    if captured:
+        return Recording(data, encoder.file_name)
 
-    sys.stderr.write("Failed to capture audio...\n")
+    if captured is not None:
+        sys.stderr.write("Failed to capture audio...\n")
     return None
@@ -0,0 +1,129 @@
+import atexit
+import os
+from collections.abc import Callable
+from functools import cache
+from pathlib import Path
+from typing import Any
+
+import pyaudio
+from pyaudio import PyAudio
+
+from llm_chat_term.audio.pyaudio_no_log import PyAudioNoLog
+
+# Linux lists the sound devices here, it changes when one is (un)plugged
+_SOUND_DEVICES_DIR = Path("/dev/snd")
+
+
+def get_audio_input_devices(p: PyAudio) -> dict[str, int]:
+    devices: dict[str, int] = {}
+    for i in range(p.get_device_count()):
+        device_info = p.get_device_info_by_index(i)
+        max_input_channels = int(device_info["maxInputChannels"])
+        name = str(device_info["name"])
+        if max_input_channels > 0:
+            devices[name] = i
+
+    return devices
+
+
+def _get_hotplug_key() -> tuple[str, ...] | None:
+    """A cheap value that changes when audio devices are added or removed.
+
+    PortAudio only sees new devices after a re-initialization, so this decides
+    when the PyAudio instance has to be replaced. None where it can't be told,
+    there the devices are enumerated once per session.
+    """
+    if os.name != "posix" or not _SOUND_DEVICES_DIR.is_dir():
+        return None
+    return tuple(sorted(os.listdir(_SOUND_DEVICES_DIR)))
+
+
+class AudioSession:
+    """A long-lived PyAudio instance, with its devices and a primed input stream.
+
+    The input stream is opened ahead of time and only started/stopped for each
+    recording, its callback forwards the captured audio to the current consumer.
+    """
+
+    def __init__(self):
+        self.pyaudio: PyAudio | None = None
+        self.devices: dict[str, int] = {}
+        self.hotplug_key: tuple[str, ...] | None = None
+        self.stream: pyaudio.Stream | None = None
+        self.stream_params: tuple[int, int, int, int] | None = None
+        self.consumer: Callable[[bytes], None] | None = None
+
+    def _initialize(self) -> None:
+        self.close()
+        # Initialize PyAudio, capturing stdout and stderr to avoid it
+        # flooding the console with warnings
+        with PyAudioNoLog() as pyaudio_initializer:
+            self.pyaudio = pyaudio_initializer
+        self.devices = get_audio_input_devices(self.pyaudio)
+
+    def get_input_devices(self) -> dict[str, int]:
+        hotplug_key = _get_hotplug_key()
+        if self.pyaudio is None or hotplug_key != self.hotplug_key:
+            self._initialize()
+            self.hotplug_key = hotplug_key
+        return self.devices
+
+    def _callback(self, in_data: bytes | None, *_: Any):
+        consumer = self.consumer
+        if consumer and in_data:
+            consumer(in_data)
+        return None, pyaudio.paContinue
+
+    def prime(
+        self, audio_device_idx: int, sample_rate: int, channels: int, chunk: int
+    ) -> pyaudio.Stream:
+        """Open the input stream, without starting it, if it isn't already."""
+        params = (audio_device_idx, sample_rate, channels, chunk)
+        if self.stream is not None and self.stream_params == params:
+            return self.stream
+        if self.pyaudio is None:
+            self.get_input_devices()
+        if self.stream is not None:
+            self.stream.close()
+        assert self.pyaudio is not None  # noqa: S101
+        self.stream = self.pyaudio.open(
+            format=pyaudio.paInt16,
+            channels=channels,
+            rate=sample_rate,
+            input=True,
+            input_device_index=audio_device_idx,
+            frames_per_buffer=chunk,
+            stream_callback=self._callback,
+            start=False,
+        )
+        self.stream_params = params
+        return self.stream
+
+    def start(self, consumer: Callable[[bytes], None]) -> None:
+        if self.stream is None:
+            error_msg = "The input stream is not primed"
+            raise RuntimeError(error_msg)
+        self.consumer = consumer
+        self.stream.start_stream()
+
+    def stop(self) -> None:
+        if self.stream is not None and not self.stream.is_stopped():
+            self.stream.stop_stream()
+        self.consumer = None
+
+    def close(self) -> None:
+        if self.stream is not None:
+            self.stop()
+            self.stream.close()
+            self.stream = None
+            self.stream_params = None
+        if self.pyaudio is not None:
+            self.pyaudio.terminate()
+            self.pyaudio = None
+
+
+@cache
+def get_audio_session() -> AudioSession:
+    session = AudioSession()
+    atexit.register(session.close)
+    return session
@@ -1,31 +1,185 @@
+import queue
 import sys
-from pathlib import Path
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from functools import cache
+from io import BytesIO
+from typing import Protocol
 
-from openai import OpenAI
+from llm_chat_term.audio.recorder import capture_audio, encode_pcm, record_audio
+from llm_chat_term.audio.vad import SpeechSegmenter
+from llm_chat_term.config import config
 
-from llm_chat_term.audio.recorder import record_audio
+SAMPLE_RATE = 16000
+# Whisper likes to come up with this for silence and noise
+HALLUCINATIONS = {"Thanks for watching!"}
 
 
-def transcribe_speech(audio_device_idx: int, openai_api_key: str) -> str | None:
-    mp3_file = record_audio(audio_device_idx)
-    if not mp3_file:
+class TranscriptionBackend(Protocol):
+    def transcribe(self, audio: bytes, file_name: str) -> str:
+        """Transcribe an encoded audio file, the format is told by file_name."""
+        ...
+
+
+class OpenAITranscriptionBackend:
+    def __init__(self, api_key: str, model: str = "whisper-1", language: str = "en"):
+        from openai import OpenAI
+
+        self.client = OpenAI(api_key=api_key)
+        self.model = model
+        self.language = language
+
+    def transcribe(self, audio: bytes, file_name: str) -> str:
+        transcription = self.client.audio.transcriptions.create(
+            model=self.model, file=(file_name, audio), language=self.language
+        )
+        return transcription.text
+
+
+class LocalWhisperBackend:
+    """CPU transcription with faster-whisper, no network involved.
+
+    The model is loaded once in a background thread, which then stays around
+    and runs the transcriptions, so it is warm for every :v after the first.
+    """
+
+    def __init__(
+        self, model_size: str, compute_type: str = "int8", language: str = "en"
+    ):
+        self.model_size = model_size
+        self.compute_type = compute_type
+        self.language = language
+        self.jobs: queue.Queue[tuple[bytes, Future[str]]] = queue.Queue()
+        self.ready = threading.Event()
+        threading.Thread(target=self._run, name="local-whisper", daemon=True).start()
+
+    def _run(self) -> None:
+        try:
+            from faster_whisper import (  # pyright: ignore[reportMissingImports]
+                WhisperModel,
+            )
+
+            model = WhisperModel(
+                self.model_size, device="cpu", compute_type=self.compute_type
+            )
+        except Exception as e:
+            self.ready.set()
+            while True:
+                _, future = self.jobs.get()
+                future.set_exception(e)
+
+        self.ready.set()
+        while True:
+            audio, future = self.jobs.get()
+            if not future.set_running_or_notify_cancel():
+                continue
+            try:
+                segments, _ = model.transcribe(
+                    BytesIO(audio), language=self.language, beam_size=1
+                )
+                future.set_result("".join(segment.text for segment in segments))
+            except Exception as e:
+                future.set_exception(e)
+
+    def transcribe(self, audio: bytes, file_name: str) -> str:  # noqa: ARG002
+        future: Future[str] = Future()
+        self.jobs.put((audio, future))
+        return future.result()
+
+
+@cache
+def get_local_backend(
+    model_size: str, compute_type: str = "int8", language: str = "en"
+) -> LocalWhisperBackend:
+    """Get the local backend for a model, loading it only the first time."""
+    return LocalWhisperBackend(model_size, compute_type, language)
+
+
+class MockTranscriptionBackend:
+    """Offline stand-in, answers with canned texts after a simulated latency."""
+
+    def __init__(self, latency: float = 0.0, texts: list[str] | None = None):
+        self.latency = latency
+        self.texts = texts or []
+        self.calls = 0
+
+    def transcribe(self, audio: bytes, file_name: str) -> str:
+        time.sleep(self.latency)
+        self.calls += 1
+        if self.calls <= len(self.texts):
+            return self.texts[self.calls - 1]
+        return f"[{file_name} #{self.calls}: {len(audio)} bytes]"
+
+
+def _clean(text: str) -> str:
+    text = text.strip()
+    return "" if text in HALLUCINATIONS else text
+
+
+class ChunkedTranscriber:
+    """Transcribe speech segments concurrently, while recording goes on."""
+
+    def __init__(self, backend: TranscriptionBackend, max_workers: int = 4):
+        self.backend = backend
+        self.executor = ThreadPoolExecutor(max_workers=max_workers)
+        self.futures: list[Future[str]] = []
+
+    def submit(self, pcm: bytes) -> None:
+        self.futures.append(self.executor.submit(self._transcribe, pcm))
+
+    def _transcribe(self, pcm: bytes) -> str:
+        # Encoded on the worker, the capture isn't held up by ffmpeg
+        segment = encode_pcm(pcm, SAMPLE_RATE)
+        return self.backend.transcribe(segment.data, segment.file_name)
+
+    def result(self) -> str:
+        """Wait for all the segments and stitch their text in order."""
+        texts: list[str] = []
+        try:
+            for future in self.futures:
+                try:
+                    texts.append(_clean(future.result()))
+                except Exception as e:
+                    sys.stderr.write(f"Error transcribing audio segment: {e}\n")
+        finally:
+            self.executor.shutdown(wait=False, cancel_futures=True)
+        return " ".join(text for text in texts if text)
+
+
+def _transcribe_chunked(
+    audio_device_idx: int, backend: TranscriptionBackend
+) -> str | None:
+    transcriber = ChunkedTranscriber(backend)
+    segmenter = SpeechSegmenter(
+        transcriber.submit,
+        sample_rate=SAMPLE_RATE,
+        threshold=config.voice.silence_threshold,
+        min_silence_ms=config.voice.min_silence_ms,
+        max_segment_seconds=config.voice.max_segment_seconds,
+    )
+    captured = capture_audio(audio_device_idx, segmenter.feed, SAMPLE_RATE)
+    segmenter.flush()
+    if not captured:
+        return None
+    return transcriber.result() or None
+
+
+def transcribe_speech(
+    audio_device_idx: int, backend: TranscriptionBackend
+) -> str | None:
+    if config.voice.chunked:
+        return _transcribe_chunked(audio_device_idx, backend)
+
+    # The recording is already encoded in memory, upload it as is
+    recording = record_audio(audio_device_idx, SAMPLE_RATE)
+    if not recording:
         return None
-    mp3_file = Path(mp3_file)
 
-    client = OpenAI(api_key=openai_api_key)
     try:
-        audio_file = mp3_file.open("rb")
-        transcription = client.audio.transcriptions.create(
-            model="whisper-1", file=audio_file, language="en"
-        )
-        audio_file.close()
+        result = backend.transcribe(recording.data, recording.file_name)
     except Exception as e:
         sys.stderr.write(f"Error transcribing audio: {e}\n")
         return None
-    finally:
-        mp3_file.unlink()
 
-    result = transcription.text
-    if result == "Thanks for watching!":
-        return None
-    return result
+    return _clean(result) or None
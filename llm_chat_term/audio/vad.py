@@ -0,0 +1,117 @@
+import math
+from array import array
+from collections import deque
+from collections.abc import Callable
+
+from llm_chat_term.audio.recorder import SAMPLE_WIDTH
+
+# Frames the energy is measured on
+FRAME_MS = 20
+# Audio kept from before the speech starts, so the first syllable isn't cut
+PRE_ROLL_MS = 300
+# Audio the noise floor is first measured on, before anything counts as speech
+CALIBRATION_MS = 300
+# Speech is this many times louder than the noise floor (~10 dB)
+SPEECH_TO_NOISE_RATIO = 3.0
+# Lowest calibrated threshold, for digital silence
+MIN_THRESHOLD = 50.0
+# How fast the noise floor follows the level of the silent frames
+NOISE_FLOOR_ADAPTATION = 0.05
+
+
+def frame_rms(frame: bytes) -> float:
+    samples = array("h", frame)
+    if not samples:
+        return 0.0
+    return math.sqrt(sum(sample * sample for sample in samples) / len(samples))
+
+
+class SpeechSegmenter:
+    """Split captured PCM into speech segments on silence (energy based VAD).
+
+    A segment ends after min_silence_ms of frames below the threshold, or
+    when it gets longer than max_segment_seconds. Audio without speech is
+    dropped, whisper tends to hallucinate on silence.
+
+    Without a fixed threshold, it is calibrated from the noise floor: the
+    level of the first CALIBRATION_MS of audio, then of the silent frames.
+    """
+
+    def __init__(  # noqa: PLR0913
+        self,
+        on_segment: Callable[[bytes], None],
+        *,
+        sample_rate: int = 16000,
+        channels: int = 1,
+        threshold: float | None = None,
+        min_silence_ms: int = 700,
+        max_segment_seconds: float = 30,
+    ):
+        self.on_segment = on_segment
+        self.fixed_threshold = threshold
+        self.noise_floor: float | None = None
+        self.calibration: list[float] = []
+        self.min_silence_ms = min_silence_ms
+        self.frame_bytes = sample_rate * channels * SAMPLE_WIDTH * FRAME_MS // 1000
+        self.max_segment_frames = int(max_segment_seconds * 1000 / FRAME_MS)
+        self.pending = bytearray()
+        self.pre_roll: deque[bytes] = deque(maxlen=PRE_ROLL_MS // FRAME_MS)
+        self.segment: list[bytes] = []
+        self.silence_ms = 0
+
+    def feed(self, pcm: bytes) -> None:
+        self.pending += pcm
+        while len(self.pending) >= self.frame_bytes:
+            frame = bytes(self.pending[: self.frame_bytes])
+            del self.pending[: self.frame_bytes]
+            self._process(frame)
+
+    @property
+    def threshold(self) -> float:
+        if self.fixed_threshold is not None:
+            return self.fixed_threshold
+        if self.noise_floor is None:
+            return math.inf
+        return max(self.noise_floor * SPEECH_TO_NOISE_RATIO, MIN_THRESHOLD)
+
+    def _calibrate(self, rms: float) -> None:
+        if self.noise_floor is None:
+            self.calibration.append(rms)
+            if len(self.calibration) * FRAME_MS >= CALIBRATION_MS:
+                # The median, speech started early only raises a few frames
+                self.noise_floor = sorted(self.calibration)[len(self.calibration) // 2]
+        else:
+            self.noise_floor += (rms - self.noise_floor) * NOISE_FLOOR_ADAPTATION
+
+    def _process(self, frame: bytes) -> None:
+        rms = frame_rms(frame)
+        loud = rms >= self.threshold
+        if not loud and self.fixed_threshold is None:
+            self._calibrate(rms)
+        if not self.segment:
+            if loud:
+                self.segment = [*self.pre_roll, frame]
+                self.pre_roll.clear()
+                self.silence_ms = 0
+            else:
+                self.pre_roll.append(frame)
+            return
+
+        self.segment.append(frame)
+        self.silence_ms = 0 if loud else self.silence_ms + FRAME_MS
+        if (
+            self.silence_ms >= self.min_silence_ms
+            or len(self.segment) >= self.max_segment_frames
+        ):
+            self._emit()
+
+    def _emit(self) -> None:
+        self.on_segment(b"".join(self.segment))
+        self.segment = []
+
+    def flush(self) -> None:
+        """Emit the segment in progress, once the capture has stopped."""
+        if self.segment:
+            self.segment.append(bytes(self.pending))
+            self._emit()
+        self.pending.clear()
@@ -1,36 +1,27 @@
 import sys
 
-from pyaudio import PyAudio
-
-from llm_chat_term.audio.pyaudio_no_log import PyAudioNoLog
-from llm_chat_term.audio.speech_to_text import transcribe_speech
+from llm_chat_term.audio.session import get_audio_session
+from llm_chat_term.audio.speech_to_text import (
+    SAMPLE_RATE,
+    MockTranscriptionBackend,
+    OpenAITranscriptionBackend,
+    TranscriptionBackend,
+    get_local_backend,
+    transcribe_speech,
+)
 from llm_chat_term.config import config
 from llm_chat_term.ui.chat_ui import ChatUI
 from llm_chat_term.utils import get_api_key
 
 
-def get_audio_input_devices(p: PyAudio) -> dict[str, int]:
-    devices: dict[str, int] = {}
-    for i in range(p.get_device_count()):
-        device_info = p.get_device_info_by_index(i)
-        max_input_channels = int(device_info["maxInputChannels"])
-        name = str(device_info["name"])
-        if max_input_channels > 0:
-            devices[name] = i
-
-    return devices
-
-
 def get_user_device_idx() -> int:
     audio_device = config.audio_device
-    with PyAudioNoLog() as pyaudio_initializer:
-        p = pyaudio_initializer
-        available_devices = get_audio_input_devices(p)
-        p.terminate()
+    # Enumerated once, again only when a device is plugged in or removed
+    available_devices = get_audio_session().get_input_devices()
 
     if audio_device:
         found_audio_device = available_devices.get(audio_device)
-        if found_audio_device:
+        if found_audio_device is not None:
             return found_audio_device
 
     # User hasn't selected audio device or we couldn't find it
@@ -38,15 +29,48 @@ def get_user_device_idx() -> int:
     return available_devices[selected_audio_device]
 
 
-def process_voice_command() -> str:
-    openai_api_key = get_api_key("openai")
-    if not openai_api_key:
+def prime_audio_input() -> None:
+    """Open the configured input device ahead of the first recording."""
+    if not config.audio_device:
+        return
+
+    session = get_audio_session()
+    audio_device_idx = session.get_input_devices().get(config.audio_device)
+    if audio_device_idx is None:
+        return
+    try:
+        session.prime(audio_device_idx, SAMPLE_RATE, 1, 1024)
+    except Exception:
+        # Opened again when recording, where the error is reported
+        return
+
+
+def get_transcription_backend() -> TranscriptionBackend | None:
+    if config.voice.backend == "mock":
+        return MockTranscriptionBackend()
+    if config.voice.backend == "local":
+        return get_local_backend(
+            config.voice.local_model,
+            config.voice.local_compute_type,
+            config.voice.language,
+        )
+
+    try:
+        openai_api_key = get_api_key("openai")
+    except ValueError:
         sys.stderr.write("API key for OpenAI not found.\n")
         sys.stderr.write("It is needed for transcribing audio.\n")
+        return None
+    return OpenAITranscriptionBackend(
+        openai_api_key.get_secret_value(), language=config.voice.language
+    )
+
+
+def process_voice_command() -> str:
+    backend = get_transcription_backend()
+    if backend is None:
         return ""
 
     audio_device_idx = get_user_device_idx()
-    captured_speech = transcribe_speech(
-        audio_device_idx, openai_api_key.get_secret_value()
-    )
+    captured_speech = transcribe_speech(audio_device_idx, backend)
     return captured_speech or ""
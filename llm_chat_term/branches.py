@@ -0,0 +1,236 @@
+"""Chat branches, stored as a tree of content-addressed messages.
+
+Every message is a node identified by the hash of its parent, role and
+content, so branches forked from the same conversation share the nodes of
+their common prefix. A branch is a named reference to its last node, kept per
+chat. The chat's .txt file stays the working copy of the active branch.
+"""
+
+import hashlib
+import json
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any
+from urllib.parse import quote_plus
+
+from llm_chat_term import db
+
+DEFAULT_BRANCH = "main"
+
+
+@dataclass(frozen=True)
+class Node:
+    parent: str | None
+    role: str
+    content: str
+
+
+# Nodes are immutable, shared by every branch that contains them
+_node_cache: dict[str, Node] = {}
+
+
+def _get_nodes_dir() -> Path:
+    nodes_dir = db.get_data_dir() / "nodes"
+    nodes_dir.mkdir(parents=True, exist_ok=True)
+    return nodes_dir
+
+
+def _get_branches_dir() -> Path:
+    branches_dir = db.get_data_dir() / "branches"
+    branches_dir.mkdir(parents=True, exist_ok=True)
+    return branches_dir
+
+
+def _get_branches_file(chat_id: str) -> Path:
+    return _get_branches_dir() / f"{quote_plus(chat_id)}.json"
+
+
+def _node_path(node_hash: str) -> Path:
+    return _get_nodes_dir() / node_hash[:2] / node_hash[2:]
+
+
+def hash_node(parent: str | None, role: str, content: str) -> str:
+    data = json.dumps([parent, role, content], ensure_ascii=False)
+    return hashlib.sha256(data.encode()).hexdigest()
+
+
+def get_node(node_hash: str) -> Node:
+    node = _node_cache.get(node_hash)
+    if node is None:
+        data = json.loads(_node_path(node_hash).read_text(encoding="utf-8"))
+        node = Node(data["parent"], data["role"], data["content"])
+        _node_cache[node_hash] = node
+    return node
+
+
+def store_messages(messages: list[dict[str, str]]) -> str | None:
+    """Store the messages as a chain of nodes, returns the hash of the last.
+
+    Nodes that exist already, e.g. the shared prefix of a branch, are not
+    written again.
+    """
+    parent: str | None = None
+    for message in messages:
+        # Large payloads are kept in the blob store, nodes only reference them
+        content = db.collapse_blobs(message["content"])
+        node_hash = hash_node(parent, message["role"], content)
+        if node_hash not in _node_cache:
+            path = _node_path(node_hash)
+            if not path.exists():
+                path.parent.mkdir(exist_ok=True)
+                path.write_text(
+                    json.dumps(
+                        {"parent": parent, "role": message["role"], "content": content}
+                    ),
+                    encoding="utf-8",
+                )
+            _node_cache[node_hash] = Node(parent, message["role"], content)
+        parent = node_hash
+    return parent
+
+
+def load_messages(head: str | None) -> list[dict[str, str]]:
+    """Rebuild a branch walking from its last node, O(branch depth)."""
+    nodes: list[Node] = []
+    while head is not None:
+        node = get_node(head)
+        nodes.append(node)
+        head = node.parent
+    return [{"role": node.role, "content": node.content} for node in reversed(nodes)]
+
+
+def _load_refs(chat_id: str) -> dict[str, Any]:
+    file_path = _get_branches_file(chat_id)
+    if not file_path.exists():
+        return {"active": DEFAULT_BRANCH, "branches": {}}
+    return json.loads(file_path.read_text(encoding="utf-8"))
+
+
+def _save_refs(chat_id: str, refs: dict[str, Any]) -> None:
+    file_path = _get_branches_file(chat_id)
+    tmp_path = file_path.with_suffix(".tmp")
+    tmp_path.write_text(json.dumps(refs, indent=2), encoding="utf-8")
+    tmp_path.replace(file_path)
+
+
+def has_branches(chat_id: str) -> bool:
+    return _get_branches_file(chat_id).exists()
+
+
+def list_branches(chat_id: str) -> tuple[str, list[str]]:
+    """The active branch and the names of all branches of a chat."""
+    refs = _load_refs(chat_id)
+    branches = refs["branches"]
+    return refs["active"], sorted(branches or {DEFAULT_BRANCH: None})
+
+
+def _working_copy(chat_id: str) -> list[dict[str, str]]:
+    # The loader yields an empty message before the first indicator
+    return [message for message in db.load_chat_history(chat_id) if message["role"]]
+
+
+def sync_branch(chat_id: str, messages: list[dict[str, str]]) -> None:
+    """Point the active branch to the messages just saved for the chat."""
+    refs = _load_refs(chat_id)
+    refs["branches"][refs["active"]] = store_messages(messages)
+    _save_refs(chat_id, refs)
+
+
+def fork(chat_id: str, name: str, drop: int = 0) -> list[dict[str, str]]:
+    """Create a branch from the active one and make it active.
+
+    The last drop messages are left out of the new branch, e.g. to try a
+    different prompt for the last question. Saved thinking isn't counted, it
+    is dropped with its answer. Returns the branch messages.
+    """
+    refs = _load_refs(chat_id)
+    branches = refs["branches"]
+    if name in branches:
+        error_msg = f"Branch {name} already exists"
+        raise ValueError(error_msg)
+
+    messages = _working_copy(chat_id)
+    branches[refs["active"]] = store_messages(messages)
+    keep = len(messages)
+    # Never drop the system prompt
+    while drop > 0 and keep > 1:
+        keep -= 1
+        if messages[keep]["role"] != "thinking":
+            drop -= 1
+    # The thinking saved before a dropped answer goes with it
+    while keep > 1 and messages[keep - 1]["role"] == "thinking":
+        keep -= 1
+    messages = messages[:keep]
+    branches[name] = store_messages(messages)
+    refs["active"] = name
+    _save_refs(chat_id, refs)
+    db.save_chat_history(chat_id, messages)
+    return messages
+
+
+def switch(chat_id: str, name: str) -> list[dict[str, str]]:
+    """Make a branch active, its messages become the chat's working copy.
+
+    The active branch may have no node yet, e.g. main before the first fork,
+    switching to it keeps the working copy.
+    """
+    refs = _load_refs(chat_id)
+    branches = refs["branches"]
+    if name not in branches and name != refs["active"]:
+        error_msg = f"Branch {name} does not exist"
+        raise ValueError(error_msg)
+
+    # Keep what was added to the current branch since it was last synced
+    branches[refs["active"]] = store_messages(_working_copy(chat_id))
+    messages = load_messages(branches[name])
+    refs["active"] = name
+    _save_refs(chat_id, refs)
+    db.save_chat_history(chat_id, messages)
+    return messages
+
+
+def delete_branches(chat_id: str) -> None:
+    _get_branches_file(chat_id).unlink(missing_ok=True)
+
+
+def _reachable_nodes() -> set[str]:
+    """The nodes of every branch of every chat."""
+    reachable: set[str] = set()
+    for refs_file in _get_branches_dir().glob("*.json"):
+        refs = json.loads(refs_file.read_text(encoding="utf-8"))
+        for head in refs["branches"].values():
+            node_hash = head
+            while node_hash is not None and node_hash not in reachable:
+                try:
+                    node = get_node(node_hash)
+                except FileNotFoundError:
+                    break
+                reachable.add(node_hash)
+                node_hash = node.parent
+    return reachable
+
+
+def gc_nodes() -> tuple[int, set[str]]:
+    """Delete the nodes that no branch reaches anymore, e.g. of deleted chats.
+
+    Returns the number of nodes deleted and the blobs referenced by the
+    nodes that are kept.
+    """
+    reachable = _reachable_nodes()
+    deleted = 0
+    # Nodes are written before the refs pointing to them, maybe by another
+    # process, recent ones are kept like the blobs
+    grace_limit = time.time() - db.BLOB_GC_GRACE_SECONDS
+    for path in _get_nodes_dir().glob("*/*"):
+        node_hash = path.parent.name + path.name
+        if node_hash in reachable or path.stat().st_mtime > grace_limit:
+            continue
+        path.unlink()
+        _node_cache.pop(node_hash, None)
+        deleted += 1
+
+    referenced: set[str] = set()
+    for node_hash in reachable:
+        referenced |= db.find_blob_refs(get_node(node_hash).content)
+    return deleted, referenced
@@ -1,9 +1,10 @@
 """Configuration module for the terminal LLM chatbot."""
 
 import sys
+from typing import Any, Literal
 
 import yaml
-from pydantic import BaseModel, Field, SecretStr
+from pydantic import BaseModel, Field, SecretStr, model_validator
 
 from llm_chat_term.db import get_config_file
 
@@ -22,8 +23,169 @@ def get_default_api_keys() -> list[ApiKey]:
     ]
 
 
+# Anthropic rejects smaller thinking budgets
+MIN_THINKING_BUDGET = 1024
+
+Provider = Literal[
+    "anthropic", "openai", "deepseek", "google", "openai-compatible", "local-fake"
+]
+
+
+class ModelConfig(BaseModel):
+    provider: Provider
+    name: str
+    # None uses the provider's default
+    temperature: float | None = None
+    # USD per million tokens
+    input_price: float | None = None
+    output_price: float | None = None
+    # USD per million input tokens read from the prompt cache, None bills them
+    # at input_price
+    cached_input_price: float | None = None
+    # Name of the configured endpoint serving an openai-compatible model
+    endpoint: str = ""
+    max_tokens: int = 16384
+    # Tokens the model may spend thinking, for :think (Claude only)
+    thinking_budget: int = 2048
+    # Warn before sending a conversation larger than this, 0 to disable
+    context_window: int = 0
+    # Request timeout in seconds, None uses the provider's default
+    timeout: float | None = None
+    # Stream text to the UI in pieces of at least this many characters, fewer
+    # renders of large answers at the cost of a choppier stream
+    stream_chunk_chars: int = 0
+    # Models are listed by priority, highest first, the first with an API key
+    # is used at startup
+    priority: int = 0
+
+    @model_validator(mode="after")
+    def check_limits(self) -> "ModelConfig":
+        if self.max_tokens <= 0:
+            error_msg = f"{self.name}: max_tokens must be positive"
+            raise ValueError(error_msg)
+        if self.provider == "anthropic" and not (
+            MIN_THINKING_BUDGET <= self.thinking_budget < self.max_tokens
+        ):
+            error_msg = (
+                f"{self.name}: thinking_budget must be at least {MIN_THINKING_BUDGET} and "
+                "less than max_tokens"
+            )
+            raise ValueError(error_msg)
+        if self.provider == "openai-compatible" and not self.endpoint:
+            error_msg = f"{self.name}: openai-compatible models need an endpoint"
+            raise ValueError(error_msg)
+        return self
+
+    def estimate_cost(
+        self, input_tokens: int, output_tokens: int, cached_tokens: int = 0
+    ) -> float | None:
+        """The cost in USD, None without prices.
+
+        cached_tokens are the part of input_tokens read from the prompt cache.
+        """
+        if self.input_price is None or self.output_price is None:
+            return None
+        cached_price = (
+            self.input_price
+            if self.cached_input_price is None
+            else self.cached_input_price
+        )
+        return (
+            (input_tokens - cached_tokens) * self.input_price
+            + cached_tokens * cached_price
+            + output_tokens * self.output_price
+        ) / 1_000_000
+
+
+def get_default_models() -> list[ModelConfig]:
+    return [
+        ModelConfig(
+            provider="google",
+            name="gemini-3-pro-preview",
+            temperature=0.4,
+            input_price=2.0,
+            output_price=12.0,
+            cached_input_price=0.2,
+            context_window=1_000_000,
+        ),
+        ModelConfig(
+            provider="deepseek",
+            name="deepseek-reasoner",
+            temperature=0.0,
+            input_price=0.28,
+            output_price=0.42,
+            cached_input_price=0.028,
+            max_tokens=8192,
+            context_window=128_000,
+        ),
+        ModelConfig(
+            provider="openai",
+            name="gtp-5-mini",
+            temperature=1.0,
+            input_price=0.25,
+            output_price=2.0,
+            cached_input_price=0.025,
+            context_window=400_000,
+        ),
+        ModelConfig(
+            provider="openai",
+            name="gpt-5",
+            temperature=1.0,
+            input_price=1.25,
+            output_price=10.0,
+            cached_input_price=0.125,
+            context_window=400_000,
+        ),
+        ModelConfig(
+            provider="anthropic",
+            name="claude-sonnet-4-5",
+            temperature=0.4,
+            input_price=3.0,
+            output_price=15.0,
+            cached_input_price=0.3,
+            context_window=200_000,
+        ),
+        ModelConfig(
+            provider="anthropic",
+            name="claude-opus-4-1",
+            temperature=0.4,
+            input_price=15.0,
+            output_price=75.0,
+            cached_input_price=1.5,
+            context_window=200_000,
+        ),
+    ]
+
+
+class EndpointConfig(BaseModel):
+    """An OpenAI-compatible server, e.g. llama.cpp or vLLM."""
+
+    name: str
+    # The API root, e.g. http://localhost:8080/v1
+    base_url: str
+    api_key: SecretStr = Field(default=SecretStr(""))
+    # Models listed even when the endpoint can't be reached
+    models: list[str] = Field(default_factory=list)
+    # Also list the models the endpoint reports in /models
+    discover_models: bool = True
+    timeout: float = 120
+
+
+class RateLimitConfig(BaseModel):
+    """Client-side budgets, shared by every process using the same key."""
+
+    provider: str
+    # 0 disables a budget
+    requests_per_minute: int = 0
+    tokens_per_minute: int = 0
+
+
 class LLMConfig(BaseModel):
+    models: list[ModelConfig] = Field(default_factory=get_default_models)
     api_keys: list[ApiKey] = Field(default_factory=get_default_api_keys)
+    endpoints: list[EndpointConfig] = Field(default_factory=list)
+    # Requests wait for the budget instead of failing with rate limit errors
+    rate_limits: list[RateLimitConfig] = Field(default_factory=list)
     system_prompt: str = (
         "You are a helpful assistant responding to a user's questions in a PC terminal application.\n"
         "The user is an experienced software engineer, your answers should be concise and not repetitive.\n"
@@ -31,6 +193,26 @@ class LLMConfig(BaseModel):
         "If the user asks for a change in code, don't return the whole code, just the changed segment(s).\n"
         "Return your answers in markdown format, and wrap code in ``` blocks, but avoid using headings."
     )
+    # Generate a title and tags for chats in the background, with the cheapest
+    # model of the provider (and endpoint) each chat was last answered by
+    auto_title: bool = False
+    # Save the thinking of the answers in the chat files, shown with :thinking
+    save_thinking: bool = False
+
+    @model_validator(mode="after")
+    def check_models(self) -> "LLMConfig":
+        endpoints = {endpoint.name for endpoint in self.endpoints}
+        seen: set[tuple[str, str, str]] = set()
+        for model in self.models:
+            key = (model.provider, model.endpoint, model.name)
+            if key in seen:
+                error_msg = f"Model {model.name} is defined more than once"
+                raise ValueError(error_msg)
+            seen.add(key)
+            if model.endpoint and model.endpoint not in endpoints:
+                error_msg = f"{model.name}: endpoint {model.endpoint} is not configured"
+                raise ValueError(error_msg)
+        return self
 
 
 class UIConfig(BaseModel):
@@ -45,11 +227,80 @@ class ColorConfig(BaseModel):
     system: str = "yellow"
 
 
+class AgentConfig(BaseModel):
+    # Wall-clock limit in seconds for a single tool command, 0 to disable
+    tool_timeout: float = 30.0
+    # Output of a tool command past this size keeps only its head and tail
+    tool_max_output_bytes: int = 64 * 1024
+    # "batch" serves ls-files and show <rev>:<path> from the index file and a
+    # long-lived `git cat-file --batch` process, other commands (status, log,
+    # diff...) fork git. "subprocess" always forks git
+    git_backend: Literal["batch", "subprocess"] = "batch"
+    # Maximum number of LLM requests in a single agent turn
+    max_steps: int = 20
+    # Stop the agent turn once its requests used this many tokens, 0 to disable
+    token_budget: int = 200_000
+    # Tool commands that run without confirmation, matched as command prefixes.
+    # Calls with paths outside the working directory or options that write
+    # files (e.g. --output) are always confirmed
+    auto_approve: list[str] = Field(
+        default_factory=lambda: [
+            "cat",
+            "git status",
+            "git diff",
+            "git log",
+            "git show",
+            "search",
+        ]
+    )
+
+
+class VoiceConfig(BaseModel):
+    # "local" transcribes on the CPU with faster-whisper (llm-chat-term[voice-local]),
+    # "mock" transcribes offline with placeholder texts, for testing
+    backend: Literal["openai", "local", "mock"] = "openai"
+    # faster-whisper model size for the local backend, e.g. tiny.en, base.en, small
+    local_model: str = "base.en"
+    local_compute_type: str = "int8"
+    language: str = "en"
+    # Transcribe segments split on silence while still recording
+    chunked: bool = True
+    # RMS level of 16-bit samples above which a frame counts as speech, None
+    # calibrates it from the noise floor of the microphone
+    silence_threshold: float | None = None
+    min_silence_ms: int = 700
+    max_segment_seconds: float = 30
+
+
+class FakeProviderConfig(BaseModel):
+    # Adds the "local-fake" model, an offline stand-in streaming synthetic or
+    # recorded responses, for profiling and stress testing
+    enabled: bool = False
+    # Time to first token and streaming speed, jitter is a fraction of the delay
+    ttft_ms: float = 400
+    tokens_per_second: float = 60
+    jitter: float = 0.3
+    # Length of the synthetic responses
+    response_tokens: int = 300
+    # Thinking tokens streamed before the response by the thinking model
+    thinking_tokens: int = 80
+    # With tools bound (agent mode), ask for this tool call before answering
+    tool_call_name: str = ""
+    tool_call_args: dict[str, Any] = Field(default_factory=dict)
+    # JSON lines of recorded chunks to replay instead of synthetic ones, with
+    # "type" (text, thinking or tool_call), "text" and an optional "delay_ms"
+    replay_file: str = ""
+    seed: int = 0
+
+
 class AppConfig(BaseModel):
     llm: LLMConfig = Field(default_factory=LLMConfig)
     ui: UIConfig = Field(default_factory=UIConfig)
     colors: ColorConfig = Field(default_factory=ColorConfig)
+    agent: AgentConfig = Field(default_factory=AgentConfig)
     audio_device: str = ""
+    voice: VoiceConfig = Field(default_factory=VoiceConfig)
+    fake: FakeProviderConfig = Field(default_factory=FakeProviderConfig)
 
 
 def save_config(conf: AppConfig) -> None:
@@ -59,6 +310,8 @@ def save_config(conf: AppConfig) -> None:
 
     for api_key in conf_dict["llm"]["api_keys"]:
         api_key["api_key"] = api_key["api_key"].get_secret_value()
+    for endpoint in conf_dict["llm"]["endpoints"]:
+        endpoint["api_key"] = endpoint["api_key"].get_secret_value()
 
     with config_file.open("w") as f:
         yaml.dump(conf_dict, f, default_flow_style=False, sort_keys=False)
@@ -1,8 +1,41 @@
+import contextlib
+import gzip
+import hashlib
+import json
 import os
+import re
+import threading
+import time
+from collections.abc import Iterator
+from dataclasses import dataclass, replace
+from functools import cache, lru_cache
+from io import BytesIO
 from pathlib import Path
+from typing import Any, BinaryIO
 from urllib.parse import quote_plus, unquote_plus
 
 MESSAGE_INDICATOR = "▒▒▒▒▒▒▒▒▒▒▒▒▒▒▒▒▒▒▒▒▒▒▒▒▒▒▒▒▒▒▒▒▒▒▒▒▒"
+_INDICATOR_BYTES = MESSAGE_INDICATOR.encode()
+_HEADER_RE = re.compile(
+    rb"^" + re.escape(_INDICATOR_BYTES) + rb" +(\w+) +" + re.escape(_INDICATOR_BYTES),
+    re.MULTILINE,
+)
+# Bounded reads used for the chat previews
+PREVIEW_READ_BYTES = 8 * 1024
+PREVIEW_MAX_SEARCH_BYTES = 256 * 1024
+COUNT_CHUNK_BYTES = 64 * 1024
+# Embedded payloads (:read/:web) of this size go to the blob store
+BLOB_MIN_BYTES = 4 * 1024
+# Whole message bodies of this size go to the blob store
+BLOB_MESSAGE_BYTES = 64 * 1024
+# Blobs younger than this are never garbage collected, another process may be
+# about to save a chat that references them
+BLOB_GC_GRACE_SECONDS = 3600
+# Chats untouched for this many days are moved to the archive by :archive
+DEFAULT_ARCHIVE_DAYS = 30
+# A new archive segment is started when the current one reaches this size
+ARCHIVE_SEGMENT_BYTES = 64 * 1024 * 1024
+_BLOB_REF_RE = re.compile(r"^▒▒ blob ([0-9a-f]{64}) ▒▒$", re.MULTILINE)
 
 
 def get_chat_file(chat_id: str) -> Path:
@@ -34,6 +67,10 @@ def _get_config_dir() -> Path:
     return config_dir
 
 
+def get_data_dir() -> Path:
+    return _get_data_dir()
+
+
 def _get_data_dir() -> Path:
     """Get platform-specific data directory for llm_chat_term."""
     home = Path.home()
@@ -55,6 +92,36 @@ def _get_data_dir() -> Path:
     return data_dir
 
 
+@contextlib.contextmanager
+def locked_file(path: Path) -> Iterator[None]:
+    """Hold an exclusive lock on the file, across processes."""
+    with path.open("a") as lock:
+        if os.name == "nt":  # Windows
+            import msvcrt
+
+            # Locks the first byte, LK_LOCK gives up after 10 seconds
+            lock.seek(0)
+            while True:
+                try:
+                    msvcrt.locking(lock.fileno(), msvcrt.LK_LOCK, 1)
+                    break
+                except OSError:
+                    continue
+            try:
+                yield
+            finally:
+                lock.seek(0)
+                msvcrt.locking(lock.fileno(), msvcrt.LK_UNLCK, 1)
+        else:
+            import fcntl
+
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+
+
 def _get_chats_dir() -> Path:
     """Get the directory where the chats are saved"""
     chats_dir = _get_data_dir() / "chats"
@@ -94,57 +161,83 @@ def save_chat_history(chat_id: str, messages: list[dict[str, str]]):
             padded_role = " " * left_padding + role + " " * right_padding
 
             f.write(f"{MESSAGE_INDICATOR} {padded_role} {MESSAGE_INDICATOR}\n")
-            f.write(f"{message['content']}\n")
+            f.write(f"{collapse_blobs(message['content'])}\n")
 
+    # Kept in the metadata for the previews, the system prompt and saved
+    # thinking are not counted
+    message_count = sum(
+        message["role"] not in {"", "system", "thinking"} for message in messages
+    )
+    if get_chat_metadata(chat_id).get("message_count") != message_count:
+        update_chat_metadata(chat_id, message_count=message_count)
 
-def load_chat_history(chat_id: str) -> list[dict[str, str]]:
+
+def load_chat_history(chat_id: str, *, restore: bool = True) -> list[dict[str, str]]:
     """Load chat history from a text file.
 
+    Archived chats are decompressed transparently.
+
     Args:
         chat_id: Identifier for the chat session
+        restore: Move an archived chat back to the chats dir, as it is in use
 
     Returns:
-        List of message dictionaries
+        List of message dictionaries, large payloads stay blob references
     """
     file_path = get_chat_file(chat_id)
 
-    if not file_path.exists():
-        return []
+    if file_path.exists():
+        text = file_path.read_text(encoding="utf-8")
+    else:
+        data = _read_archived_chat(chat_id)
+        if data is None:
+            return []
+        if restore:
+            restore_chat(chat_id)
+        text = data.decode("utf-8")
 
+    # Blob references are kept, expand_blobs reads them when they are needed
+    return _parse_chat_text(text)
+
+
+def _parse_chat_text(text: str) -> list[dict[str, str]]:
     messages: list[dict[str, str]] = []
-    with file_path.open(encoding="utf-8") as f:
-        lines = f.read().splitlines()
-        last_index = len(lines) - 1
-
-        msg_role = ""
-        msg_content = ""
-        for i, line in enumerate(lines):
-            if line.startswith(f"{MESSAGE_INDICATOR}") and line.endswith(
-                f"{MESSAGE_INDICATOR}"
-            ):
-                messages.append(
-                    {
-                        "role": msg_role,
-                        "content": msg_content.rstrip(),
-                    }
-                )
-                msg_content = ""
-                # Extract next message type if not last file line
-                msg_role = line.split(f"{MESSAGE_INDICATOR}")[1].strip()
-            elif i == last_index:
-                msg_content += line + "\n"
-                messages.append(
-                    {
-                        "role": msg_role,
-                        "content": msg_content.rstrip(),
-                    }
-                )
-            else:
-                msg_content += line + "\n"
+    lines = text.splitlines()
+    last_index = len(lines) - 1
+
+    msg_role = ""
+    msg_content = ""
+    for i, line in enumerate(lines):
+        if line.startswith(f"{MESSAGE_INDICATOR}") and line.endswith(
+            f"{MESSAGE_INDICATOR}"
+        ):
+            messages.append(
+                {
+                    "role": msg_role,
+                    "content": msg_content.rstrip(),
+                }
+            )
+            msg_content = ""
+            # Extract next message type if not last file line
+            msg_role = line.split(f"{MESSAGE_INDICATOR}")[1].strip()
+        elif i == last_index:
+            msg_content += line + "\n"
+            messages.append(
+                {
+                    "role": msg_role,
+                    "content": msg_content.rstrip(),
+                }
+            )
+        else:
+            msg_content += line + "\n"
 
     return messages
 
 
+def chat_exists(chat_id: str) -> bool:
+    return get_chat_file(chat_id).exists() or chat_id in _load_archive_index()
+
+
 def list_all_chats() -> list[str]:
     """List all available chat histories.
 
@@ -163,6 +256,567 @@ def list_all_chats() -> list[str]:
             # Skip files that can't be decoded properly
             continue
 
+    # Archived chats are listed from the archive index
+    listed = {chat_id for chat_id, _ in chats_with_time}
+    chats_with_time.extend(
+        (chat_id, entry["mtime"])
+        for chat_id, entry in _load_archive_index().items()
+        if chat_id not in listed
+    )
+
     chats_with_time.sort(key=lambda x: x[1], reverse=True)
 
     return [chat_id for chat_id, _ in chats_with_time]
+
+
+def list_all_chats_with_metadata() -> list[tuple[str, dict[str, Any]]]:
+    """List all chat_ids with their metadata (title, tags, model...).
+
+    The metadata comes from the metadata store, the chat files are not opened.
+    """
+    metadata = load_chats_metadata()
+    return [(chat_id, metadata.get(chat_id, {})) for chat_id in list_all_chats()]
+
+
+def _get_metadata_file() -> Path:
+    return _get_data_dir() / "chats_metadata.json"
+
+
+_metadata_cache: tuple[int, dict[str, dict[str, Any]]] | None = None
+# Metadata is also updated from background threads
+_metadata_lock = threading.Lock()
+
+
+def load_chats_metadata() -> dict[str, dict[str, Any]]:
+    """Load the metadata of all chats (e.g. the model), keyed by chat_id."""
+    global _metadata_cache  # noqa: PLW0603
+    file_path = _get_metadata_file()
+    try:
+        mtime = file_path.stat().st_mtime_ns
+    except FileNotFoundError:
+        return {}
+    if _metadata_cache is None or _metadata_cache[0] != mtime:
+        _metadata_cache = (mtime, _read_metadata())
+    return _metadata_cache[1]
+
+
+def _read_metadata() -> dict[str, dict[str, Any]]:
+    try:
+        return json.loads(_get_metadata_file().read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return {}
+
+
+@contextlib.contextmanager
+def _locked_metadata() -> Iterator[dict[str, dict[str, Any]]]:
+    """The metadata as on disk, written back when the block exits.
+
+    Other terminals save chats too, the file lock keeps their updates.
+    """
+    with _metadata_lock, locked_file(_get_metadata_file().with_suffix(".lock")):
+        # Read past the cache, its mtime may not tell apart two quick writes
+        metadata = _read_metadata()
+        yield metadata
+        _write_metadata(metadata)
+
+
+def get_chat_metadata(chat_id: str) -> dict[str, Any]:
+    return load_chats_metadata().get(chat_id, {})
+
+
+def update_chat_metadata(chat_id: str, **fields: Any) -> None:
+    """Update (or remove with None) metadata fields of a chat."""
+    with _locked_metadata() as metadata:
+        chat_metadata = metadata.setdefault(chat_id, {})
+        for key, value in fields.items():
+            if value is None:
+                chat_metadata.pop(key, None)
+            else:
+                chat_metadata[key] = value
+        if not chat_metadata:
+            del metadata[chat_id]
+
+
+def delete_chat_metadata(chat_id: str) -> None:
+    with _locked_metadata() as metadata:
+        metadata.pop(chat_id, None)
+
+
+def _write_metadata(metadata: dict[str, dict[str, Any]]) -> None:
+    global _metadata_cache  # noqa: PLW0603
+    # Write to a temp file first so a reader never sees a partial file
+    file_path = _get_metadata_file()
+    tmp_path = file_path.with_suffix(".tmp")
+    tmp_path.write_text(json.dumps(metadata, indent=2), encoding="utf-8")
+    tmp_path.replace(file_path)
+    _metadata_cache = (file_path.stat().st_mtime_ns, metadata)
+
+
+@dataclass
+class ChatPreview:
+    first_user_message: str
+    last_assistant_message: str
+    message_count: int
+    model: str
+    title: str
+    tags: list[str]
+
+
+_preview_cache: dict[str, tuple[int, int, ChatPreview]] = {}
+
+
+def get_chat_preview(chat_id: str) -> ChatPreview | None:
+    """Get a preview of a chat without loading the whole file.
+
+    The first user message is read from the head of the file and the last
+    assistant message from its tail, with bounded reads. The number of
+    messages is kept in the metadata when saving, chats saved before that are
+    counted reading in chunks. Cached per modification time of the file, the
+    metadata (message count, model, title, tags) is always up to date.
+    """
+    file_path = get_chat_file(chat_id)
+    try:
+        stat = file_path.stat()
+        version = (stat.st_mtime_ns, stat.st_size)
+    except FileNotFoundError:
+        archived = _load_archive_index().get(chat_id)
+        if archived is None:
+            return None
+        version = (int(archived["mtime"] * 1e9), archived["size"])
+    metadata = get_chat_metadata(chat_id)
+    cached = _preview_cache.get(chat_id)
+    if cached and cached[:2] == version:
+        return replace(
+            cached[2],
+            message_count=metadata.get("message_count", cached[2].message_count),
+            model=metadata.get("model", ""),
+            title=metadata.get("title", ""),
+            tags=metadata.get("tags", []),
+        )
+
+    data = _read_archived_chat(chat_id) if not file_path.exists() else None
+    with BytesIO(data) if data is not None else file_path.open("rb") as f:
+        head = f.read(PREVIEW_READ_BYTES)
+        messages = _split_messages(head)
+        first_user_message = next(
+            (content for role, content in messages if role == "user"), ""
+        )
+        last_assistant_message = _read_last_message(f, version[1], "assistant")
+        message_count = metadata.get("message_count")
+        if message_count is None:
+            f.seek(0)
+            message_count = _count_messages(f)
+            # The system prompt is not counted
+            if messages and messages[0][0] == "system":
+                message_count -= 1
+
+    preview = ChatPreview(
+        first_user_message=first_user_message,
+        last_assistant_message=last_assistant_message,
+        message_count=max(message_count, 0),
+        model=metadata.get("model", ""),
+        title=metadata.get("title", ""),
+        tags=metadata.get("tags", []),
+    )
+    _preview_cache[chat_id] = (*version, preview)
+    return preview
+
+
+def _split_messages(data: bytes) -> list[tuple[str, str]]:
+    """Split raw chat file data into (role, content), the last may be cut."""
+    headers = list(_HEADER_RE.finditer(data))
+    messages: list[tuple[str, str]] = []
+    for i, header in enumerate(headers):
+        end = headers[i + 1].start() if i + 1 < len(headers) else len(data)
+        content = data[header.end() : end].decode("utf-8", errors="ignore")
+        messages.append((header.group(1).decode(), describe_blobs(content.strip())))
+    return messages
+
+
+def _read_last_message(f: BinaryIO, size: int, role: str) -> str:
+    """Find the last message of a role scanning backwards from the end."""
+    position = size
+    tail = b""
+    while position > 0 and size - position < PREVIEW_MAX_SEARCH_BYTES:
+        read_size = min(PREVIEW_READ_BYTES, position)
+        position -= read_size
+        f.seek(position)
+        tail = f.read(read_size) + tail
+        # A header cut at the start of the tail is matched on the next read
+        messages = _split_messages(tail if position == 0 else tail[1:])
+        for message_role, content in reversed(messages):
+            if message_role == role:
+                return content[:PREVIEW_READ_BYTES]
+    return ""
+
+
+def _count_messages(f: BinaryIO) -> int:
+    count = 0
+    carry = b""
+    marker = b"\n" + _INDICATOR_BYTES + b" "
+    # Saved thinking belongs to the answer after it, it isn't a message
+    thinking_marker = marker + b"thinking "
+    if f.read(len(marker) - 1) == marker[1:]:
+        count += 1
+    f.seek(0)
+    thinking_carry = b""
+    while chunk := f.read(COUNT_CHUNK_BYTES):
+        data = carry + chunk
+        count += data.count(marker)
+        # Keep the bytes that may be the start of a marker cut by the chunk
+        carry = data[-(len(marker) - 1) :]
+        data = thinking_carry + chunk
+        count -= data.count(thinking_marker)
+        thinking_carry = data[-(len(thinking_marker) - 1) :]
+    return count
+
+
+def _get_blobs_dir() -> Path:
+    blobs_dir = _get_data_dir() / "blobs"
+    blobs_dir.mkdir(parents=True, exist_ok=True)
+    return blobs_dir
+
+
+def _blob_path(blob_hash: str) -> Path:
+    return _get_blobs_dir() / blob_hash[:2] / blob_hash[2:]
+
+
+def _blob_ref(blob_hash: str) -> str:
+    return f"▒▒ blob {blob_hash} ▒▒"
+
+
+# Payloads stored or expanded in this session, collapsed again when saving
+_payload_hashes: dict[str, str] = {}
+
+
+def store_blob(text: str) -> str:
+    """Store text in the blob store by its hash, returns the hash."""
+    blob_hash = _payload_hashes.get(text)
+    if blob_hash is None:
+        blob_hash = hashlib.sha256(text.encode()).hexdigest()
+    path = _blob_path(blob_hash)
+    # The blob may have been deleted by :gc in another process
+    if not path.exists():
+        path.parent.mkdir(exist_ok=True)
+        tmp_path = path.with_suffix(".tmp")
+        tmp_path.write_text(text, encoding="utf-8")
+        tmp_path.replace(path)
+    _payload_hashes[text] = blob_hash
+    return blob_hash
+
+
+def register_payload(text: str) -> None:
+    """Store a large embedded payload, chats containing it will reference it."""
+    if len(text.encode()) >= BLOB_MIN_BYTES:
+        store_blob(text)
+
+
+@lru_cache(maxsize=32)
+def read_blob(blob_hash: str) -> str:
+    text = _blob_path(blob_hash).read_text(encoding="utf-8")
+    _payload_hashes[text] = blob_hash
+    return text
+
+
+def _replace_lines(content: str, payload: str, ref: str) -> str:
+    """Replace the occurrences of payload that span whole lines."""
+    parts = content.split(payload)
+    result = parts[0]
+    for part in parts[1:]:
+        whole_lines = result[-1:] in {"", "\n"} and part[:1] in {"", "\n"}
+        result += (ref if whole_lines else payload) + part
+    return result
+
+
+def collapse_blobs(content: str) -> str:
+    """Replace large payloads in a message body with references to blobs.
+
+    References are whole lines, so only payloads that span whole lines of the
+    body are replaced, e.g. a :read file but not the same text quoted inline.
+    """
+    if len(content) < BLOB_MIN_BYTES:
+        return content
+    for payload, blob_hash in _payload_hashes.items():
+        if payload in content:
+            content = _replace_lines(content, payload, _blob_ref(blob_hash))
+    if len(content.encode()) >= BLOB_MESSAGE_BYTES and not _BLOB_REF_RE.search(content):
+        content = _blob_ref(store_blob(content))
+    return content
+
+
+def expand_blobs(content: str) -> str:
+    """Replace the blob references of a message body with their contents."""
+    if "▒▒ blob " not in content:
+        return content
+
+    def expand(match: re.Match[str]) -> str:
+        try:
+            return read_blob(match.group(1))
+        except FileNotFoundError:
+            return f"[missing blob {match.group(1)}]"
+
+    return _BLOB_REF_RE.sub(expand, content)
+
+
+def describe_blobs(content: str) -> str:
+    """Replace blob references with their size, without reading them."""
+    if "▒▒ blob " not in content:
+        return content
+
+    def describe(match: re.Match[str]) -> str:
+        try:
+            size = _blob_path(match.group(1)).stat().st_size
+        except FileNotFoundError:
+            return "[missing embedded content]"
+        return f"[embedded content, {size / 1024:.0f} KB]"
+
+    return _BLOB_REF_RE.sub(describe, content)
+
+
+def expanded_size(content: str) -> int:
+    """The length of a message body with its blobs, without reading them."""
+    if "▒▒ blob " not in content:
+        return len(content)
+    size = len(content)
+    for match in _BLOB_REF_RE.finditer(content):
+        with contextlib.suppress(FileNotFoundError):
+            size += _blob_path(match.group(1)).stat().st_size - len(match.group(0))
+    return size
+
+
+def find_blob_refs(text: str) -> set[str]:
+    return set(_BLOB_REF_RE.findall(text))
+
+
+def gc_blobs(extra_referenced: set[str] | None = None) -> tuple[int, int]:
+    """Delete the blobs that no chat references anymore.
+
+    Other stores that keep message bodies (e.g. branches) pass the blobs they
+    reference. Returns the number of blobs and bytes deleted.
+    """
+    referenced = set(extra_referenced or ())
+    for file_path in _get_chats_dir().glob("*.txt"):
+        referenced |= find_blob_refs(file_path.read_text(encoding="utf-8"))
+    for entry in _load_archive_index().values():
+        referenced.update(entry.get("blobs", []))
+
+    deleted = 0
+    deleted_bytes = 0
+    grace_limit = time.time() - BLOB_GC_GRACE_SECONDS
+    for path in _get_blobs_dir().glob("*/*"):
+        blob_hash = path.parent.name + path.name
+        stat = path.stat()
+        if blob_hash in referenced or stat.st_mtime > grace_limit:
+            continue
+        path.unlink()
+        deleted += 1
+        deleted_bytes += stat.st_size
+    read_blob.cache_clear()
+    # Payloads are stored again when saved, their blobs may be gone now
+    _payload_hashes.clear()
+    return deleted, deleted_bytes
+
+
+def _get_archive_dir() -> Path:
+    archive_dir = _get_data_dir() / "archive"
+    archive_dir.mkdir(parents=True, exist_ok=True)
+    return archive_dir
+
+
+def get_archive_codec() -> str:
+    """zstd when zstandard is installed, gzip otherwise."""
+    try:
+        import zstandard  # pyright: ignore[reportUnusedImport]  # noqa: F401
+    except ImportError:
+        return "gzip"
+    return "zstd"
+
+
+@cache
+def _get_zstd_compressor() -> Any:
+    import zstandard
+
+    return zstandard.ZstdCompressor(level=6)
+
+
+@cache
+def _get_zstd_decompressor() -> Any:
+    import zstandard
+
+    return zstandard.ZstdDecompressor()
+
+
+def _compress(data: bytes, codec: str) -> bytes:
+    if codec == "zstd":
+        return _get_zstd_compressor().compress(data)
+    return gzip.compress(data, compresslevel=6, mtime=0)
+
+
+def _decompress(data: bytes, codec: str) -> bytes:
+    if codec == "zstd":
+        return _get_zstd_decompressor().decompress(data)
+    return gzip.decompress(data)
+
+
+_archive_index_cache: tuple[int, dict[str, dict[str, Any]]] | None = None
+
+
+def _load_archive_index() -> dict[str, dict[str, Any]]:
+    """The archived chats, each with its segment, offset, length and mtime."""
+    global _archive_index_cache  # noqa: PLW0603
+    index_path = _get_archive_dir() / "index.json"
+    try:
+        mtime = index_path.stat().st_mtime_ns
+    except FileNotFoundError:
+        return {}
+    if _archive_index_cache is None or _archive_index_cache[0] != mtime:
+        index = json.loads(index_path.read_text(encoding="utf-8"))
+        _archive_index_cache = (mtime, index)
+    return _archive_index_cache[1]
+
+
+def _write_archive_index(index: dict[str, dict[str, Any]]) -> None:
+    index_path = _get_archive_dir() / "index.json"
+    tmp_path = index_path.with_suffix(".tmp")
+    tmp_path.write_text(json.dumps(index), encoding="utf-8")
+    tmp_path.replace(index_path)
+
+
+def _read_archived_chat(chat_id: str) -> bytes | None:
+    entry = _load_archive_index().get(chat_id)
+    if entry is None:
+        return None
+    with (_get_archive_dir() / entry["segment"]).open("rb") as f:
+        f.seek(entry["offset"])
+        return _decompress(f.read(entry["length"]), entry["codec"])
+
+
+def _current_segment(codec: str) -> Path:
+    suffix = ".zst" if codec == "zstd" else ".gz"
+    segments = sorted(_get_archive_dir().glob(f"segment-*{suffix}"))
+    if segments and segments[-1].stat().st_size < ARCHIVE_SEGMENT_BYTES:
+        return segments[-1]
+    number = int(segments[-1].name.split("-")[1].split(".")[0]) + 1 if segments else 0
+    return _get_archive_dir() / f"segment-{number:05}{suffix}"
+
+
+def archive_chats(
+    days: int = DEFAULT_ARCHIVE_DAYS, exclude: set[str] | None = None
+) -> tuple[int, int, int]:
+    """Move the chats untouched for days to compressed archive segments.
+
+    Every chat is a separately compressed member appended to a segment, the
+    index has its position. The segment is synced to disk before the index is
+    written and the chat file removed, an interrupted run loses nothing.
+    Returns the number of chats archived, their size and their compressed size.
+    """
+    cutoff = time.time() - days * 24 * 60 * 60
+    # Restored chats have a file again, their archived copy may be outdated
+    archive_index = _load_archive_index()
+    index = {
+        chat_id: entry
+        for chat_id, entry in archive_index.items()
+        if not get_chat_file(chat_id).exists()
+    }
+    codec = get_archive_codec()
+    archived = 0
+    original_bytes = 0
+    compressed_bytes = 0
+
+    to_archive: list[tuple[str, Path, float]] = []
+    # Restored chats left unchanged, their archived copy is kept
+    unchanged: list[Path] = []
+    for file_path in _get_chats_dir().glob("*.txt"):
+        chat_id = _decode_filepath(file_path)
+        stat = file_path.stat()
+        if stat.st_mtime >= cutoff or chat_id in (exclude or ()):
+            continue
+        entry = archive_index.get(chat_id)
+        if (
+            entry is not None
+            and entry["size"] == stat.st_size
+            and abs(entry["mtime"] - stat.st_mtime) < 1e-3  # noqa: PLR2004
+        ):
+            index[chat_id] = entry
+            unchanged.append(file_path)
+            archived += 1
+            original_bytes += entry["size"]
+            compressed_bytes += entry["length"]
+        else:
+            to_archive.append((chat_id, file_path, stat.st_mtime))
+    if not to_archive:
+        _write_archive_index(index)
+        for file_path in unchanged:
+            file_path.unlink()
+        _remove_unused_segments(index)
+        return archived, original_bytes, compressed_bytes
+
+    segment = _current_segment(codec)
+    f = segment.open("ab")
+    try:
+        for chat_id, file_path, mtime in to_archive:
+            if f.tell() >= ARCHIVE_SEGMENT_BYTES:
+                f.close()
+                segment = _current_segment(codec)
+                f = segment.open("ab")
+            data = file_path.read_bytes()
+            compressed = _compress(data, codec)
+            offset = f.tell()
+            f.write(compressed)
+            index[chat_id] = {
+                "segment": segment.name,
+                "offset": offset,
+                "length": len(compressed),
+                "codec": codec,
+                "mtime": mtime,
+                "size": len(data),
+                # Kept so the blob garbage collection doesn't need to decompress
+                "blobs": sorted(find_blob_refs(data.decode("utf-8"))),
+            }
+            archived += 1
+            original_bytes += len(data)
+            compressed_bytes += len(compressed)
+        f.flush()
+        os.fsync(f.fileno())
+    finally:
+        f.close()
+
+    _write_archive_index(index)
+    for file_path in [*unchanged, *(path for _, path, _ in to_archive)]:
+        file_path.unlink()
+    _remove_unused_segments(index)
+    return archived, original_bytes, compressed_bytes
+
+
+def _remove_unused_segments(index: dict[str, dict[str, Any]]) -> None:
+    # Segments are append only, one is dropped once none of its chats is left
+    used = {entry["segment"] for entry in index.values()}
+    for segment in _get_archive_dir().glob("segment-*"):
+        if segment.name not in used:
+            segment.unlink()
+
+
+def restore_chat(chat_id: str) -> bool:
+    """Write an archived chat back to the chats dir, keeping its mtime.
+
+    The chat file takes precedence over the archived copy from now on, so
+    restoring doesn't rewrite the index. The next archive run keeps the copy
+    if the chat is unchanged, or drops it and archives the chat again.
+    """
+    file_path = get_chat_file(chat_id)
+    if file_path.exists():
+        return False
+    data = _read_archived_chat(chat_id)
+    if data is None:
+        return False
+    file_path.write_bytes(data)
+    mtime = _load_archive_index()[chat_id]["mtime"]
+    os.utime(file_path, (mtime, mtime))
+    return True
+
+
+def delete_chat(chat_id: str) -> None:
+    get_chat_file(chat_id).unlink(missing_ok=True)
+    index = dict(_load_archive_index())
+    if index.pop(chat_id, None) is not None:
+        _write_archive_index(index)
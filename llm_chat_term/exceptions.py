@@ -1,3 +1,9 @@
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from llm_chat_term.usage import CallUsage
+
+
 class FileReadError(Exception):
     pass
 
@@ -8,3 +14,13 @@ class UrlReadError(Exception):
 
 class ConfigurationError(Exception):
     pass
+
+
+class StreamCancelledError(Exception):
+    """The user cut off a response, with what was streamed until then."""
+
+    def __init__(self, response: str, thinking: str, usage: "CallUsage"):
+        super().__init__("Response cancelled")
+        self.response = response
+        self.thinking = thinking
+        self.usage = usage
@@ -0,0 +1,100 @@
+"""OpenAI-compatible endpoints: pooled connections and model discovery."""
+
+import json
+import logging
+import time
+from functools import cache
+
+import httpx
+
+from llm_chat_term import db
+from llm_chat_term.config import EndpointConfig, config
+
+logger = logging.getLogger(__name__)
+
+# Provider of the models served by a configured endpoint
+ENDPOINT_PROVIDER = "openai-compatible"
+# Discovered models are listed from the cache for this long
+DISCOVERY_TTL_SECONDS = 60 * 60
+# Listing the models must not hold up the model selector
+DISCOVERY_TIMEOUT_SECONDS = 2.0
+
+
+def get_endpoint(name: str) -> EndpointConfig:
+    for endpoint in config.llm.endpoints:
+        if endpoint.name == name:
+            return endpoint
+    error_msg = f"Endpoint {name} is not configured"
+    raise ValueError(error_msg)
+
+
+@cache
+def get_http_client(base_url: str, timeout: float) -> httpx.Client:
+    """A client per endpoint, so the requests reuse its connections."""
+    return httpx.Client(
+        base_url=base_url,
+        timeout=httpx.Timeout(timeout, connect=10.0),
+        limits=httpx.Limits(max_keepalive_connections=8, keepalive_expiry=300),
+    )
+
+
+def _get_cache_file():
+    return db.get_data_dir() / "endpoint_models.json"
+
+
+def _load_cache() -> dict[str, dict[str, float | list[str]]]:
+    try:
+        return json.loads(_get_cache_file().read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return {}
+
+
+def _fetch_models(endpoint: EndpointConfig) -> list[str]:
+    headers: dict[str, str] = {}
+    api_key = endpoint.api_key.get_secret_value()
+    if api_key:
+        headers["Authorization"] = f"Bearer {api_key}"
+    client = get_http_client(endpoint.base_url, endpoint.timeout)
+    response = client.get("models", headers=headers, timeout=DISCOVERY_TIMEOUT_SECONDS)
+    response.raise_for_status()
+    return [str(model["id"]) for model in response.json().get("data", [])]
+
+
+@cache
+def discover_models(endpoint_name: str) -> tuple[str, ...]:
+    """The models reported by the endpoint, cached on disk and per process.
+
+    A stale cache is used when the endpoint can't be reached.
+    """
+    endpoint = get_endpoint(endpoint_name)
+    cache_key = endpoint.base_url
+    cached = _load_cache().get(cache_key)
+    if cached and time.time() - float(cached["time"]) < DISCOVERY_TTL_SECONDS:  # pyright: ignore[reportArgumentType]
+        return tuple(cached["models"])  # pyright: ignore[reportArgumentType]
+
+    try:
+        models = _fetch_models(endpoint)
+    except (httpx.HTTPError, ValueError, KeyError, TypeError):
+        logger.warning("Could not list the models of %s", endpoint.base_url)
+        return tuple(cached["models"]) if cached else ()  # pyright: ignore[reportArgumentType]
+
+    models_cache = _load_cache()
+    models_cache[cache_key] = {"time": time.time(), "models": models}
+    _get_cache_file().write_text(json.dumps(models_cache), encoding="utf-8")
+    return tuple(models)
+
+
+def get_endpoint_models(*, discover: bool = True) -> list[tuple[str, str]]:
+    """(endpoint name, model name) of the configured and discovered models.
+
+    Without discover, only the models listed in the config, no request is made.
+    """
+    models: list[tuple[str, str]] = []
+    for endpoint in config.llm.endpoints:
+        names = list(endpoint.models)
+        if discover and endpoint.discover_models:
+            names.extend(
+                name for name in discover_models(endpoint.name) if name not in names
+            )
+        models.extend((endpoint.name, name) for name in names)
+    return models
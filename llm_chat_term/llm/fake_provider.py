@@ -0,0 +1,198 @@
+"""An offline chat model streaming synthetic or recorded responses.
+
+It stands in for the providers when profiling or stress testing the whole
+chat pipeline, with configurable latency, thinking blocks and tool calls.
+"""
+
+import json
+import random
+import time
+import uuid
+from collections.abc import Iterator, Sequence
+from pathlib import Path
+from typing import Any, cast, override
+
+from langchain_core.callbacks import CallbackManagerForLLMRun
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import (
+    AIMessageChunk,
+    BaseMessage,
+    ToolMessage,
+    message_chunk_to_message,
+)
+from langchain_core.messages.ai import add_ai_message_chunks
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+from pydantic import Field
+
+from llm_chat_term.config import FakeProviderConfig
+
+WORDS = (
+    "the a function returns list of values error when calling api with async "
+    "request timeout config file database query index cache memory thread "
+    "process terminal output you can use this instead change line example"
+).split()
+
+
+def _synthetic_tokens(rng: random.Random, count: int) -> Iterator[str]:
+    """Markdown-ish tokens: sentences, a list and a code block."""
+    for i in range(count):
+        if i == count // 2:
+            yield "\n\n```python\n"
+        elif i == count // 2 + count // 5:
+            yield "\n```\n\n"
+        elif i % 25 == 0 and i:
+            yield "\n- "
+        yield f"{rng.choice(WORDS)} "
+
+
+class FakeStreamingChatModel(BaseChatModel):
+    """Streams chunks shaped like the Anthropic ones, without a network."""
+
+    settings: FakeProviderConfig
+    thinking: bool = False
+    tool_names: list[str] = Field(default_factory=list)
+
+    @property
+    @override
+    def _llm_type(self) -> str:
+        return "local-fake"
+
+    @override
+    def bind_tools(self, tools: Sequence[Any], **kwargs: Any) -> Any:
+        names = [getattr(tool, "__name__", str(tool)) for tool in tools]
+        return self.model_copy(update={"tool_names": names})
+
+    def _delay(self, rng: random.Random, seconds: float) -> None:
+        jitter = self.settings.jitter
+        time.sleep(max(seconds * (1 + rng.uniform(-jitter, jitter)), 0))
+
+    def _chunks(self, messages: list[BaseMessage]) -> Iterator[AIMessageChunk]:
+        settings = self.settings
+        rng = random.Random(settings.seed + len(messages))  # noqa: S311
+        token_delay = 1 / settings.tokens_per_second
+        self._delay(rng, settings.ttft_ms / 1000)
+
+        if settings.replay_file:
+            yield from self._replay(Path(settings.replay_file).expanduser(), rng)
+            return
+
+        if self.thinking:
+            for token in _synthetic_tokens(rng, settings.thinking_tokens):
+                yield AIMessageChunk(
+                    content=[{"type": "thinking", "thinking": token, "index": 0}]
+                )
+                self._delay(rng, token_delay)
+
+        # Ask for the tool once, answer after its result
+        asks_tool = settings.tool_call_name in self.tool_names and not isinstance(
+            messages[-1], ToolMessage
+        )
+        text_tokens = settings.response_tokens // 10 if asks_tool else None
+        for token in _synthetic_tokens(rng, text_tokens or settings.response_tokens):
+            yield AIMessageChunk(content=[{"type": "text", "text": token, "index": 1}])
+            self._delay(rng, token_delay)
+
+        if asks_tool:
+            yield from self._tool_call_chunks(rng, token_delay)
+
+    def _tool_call_chunks(
+        self, rng: random.Random, token_delay: float
+    ) -> Iterator[AIMessageChunk]:
+        args = json.dumps(self.settings.tool_call_args)
+        # The name and id come first, the arguments in small pieces
+        yield AIMessageChunk(
+            content=[],
+            tool_call_chunks=[
+                {
+                    "name": self.settings.tool_call_name,
+                    "id": f"fake_{uuid.uuid4().hex[:12]}",
+                    "args": "",
+                    "index": 2,
+                }
+            ],
+        )
+        for start in range(0, len(args), 8):
+            yield AIMessageChunk(
+                content=[],
+                tool_call_chunks=[
+                    {
+                        "name": None,
+                        "id": None,
+                        "args": args[start : start + 8],
+                        "index": 2,
+                    }
+                ],
+            )
+            self._delay(rng, token_delay)
+
+    def _replay(self, path: Path, rng: random.Random) -> Iterator[AIMessageChunk]:
+        token_delay = 1 / self.settings.tokens_per_second
+        with path.open(encoding="utf-8") as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                record = json.loads(line)
+                chunk_type = record.get("type", "text")
+                if chunk_type == "tool_call":
+                    yield AIMessageChunk(
+                        content=[],
+                        tool_call_chunks=[
+                            {
+                                "name": record.get("name"),
+                                "id": record.get("id"),
+                                "args": record.get("args", ""),
+                                "index": record.get("index", 0),
+                            }
+                        ],
+                    )
+                elif chunk_type == "thinking":
+                    yield AIMessageChunk(
+                        content=[{"type": "thinking", "thinking": record["text"]}]
+                    )
+                else:
+                    yield AIMessageChunk(content=record["text"])
+                delay_ms = record.get("delay_ms")
+                if delay_ms is None:
+                    self._delay(rng, token_delay)
+                else:
+                    time.sleep(delay_ms / 1000)
+
+    @override
+    def _stream(
+        self,
+        messages: list[BaseMessage],
+        stop: list[str] | None = None,
+        run_manager: CallbackManagerForLLMRun | None = None,
+        **kwargs: Any,
+    ) -> Iterator[ChatGenerationChunk]:
+        input_tokens = sum(len(str(message.content)) for message in messages) // 4
+        output_tokens = 0
+        for chunk in self._chunks(messages):
+            output_tokens += 1
+            yield ChatGenerationChunk(message=chunk)
+        # Usage is reported on a last empty chunk, like the providers do
+        yield ChatGenerationChunk(
+            message=AIMessageChunk(
+                content="",
+                usage_metadata={
+                    "input_tokens": input_tokens,
+                    "output_tokens": output_tokens,
+                    "total_tokens": input_tokens + output_tokens,
+                },
+            )
+        )
+
+    @override
+    def _generate(
+        self,
+        messages: list[BaseMessage],
+        stop: list[str] | None = None,
+        run_manager: CallbackManagerForLLMRun | None = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        chunks = [
+            cast("AIMessageChunk", generation.message)
+            for generation in self._stream(messages)
+        ]
+        message = message_chunk_to_message(add_ai_message_chunks(*chunks))
+        return ChatResult(generations=[ChatGeneration(message=message)])
@@ -5,6 +5,7 @@ from pathlib import Path
 import trafilatura
 from pydantic import HttpUrl
 
+from llm_chat_term import db
 from llm_chat_term.exceptions import FileReadError, UrlReadError
 
 
@@ -35,6 +36,8 @@ def parse_insert_commands(user_input: str) -> str:
                     file_contents = f.read()
                 # Add file contents instead of the :read line
                 result_lines.append(file_contents.rstrip())
+                # Large files are saved once in the blob store
+                db.register_payload(file_contents.rstrip())
             except UnicodeDecodeError as e:
                 error_msg = f"Error: :read file appears to be binary: {file_path}"
                 raise FileReadError(error_msg) from e
@@ -64,6 +67,7 @@ def parse_insert_commands(user_input: str) -> str:
                     result_lines.append(
                         f"The following text was extracted from {url}:\n{text}"
                     )
+                    db.register_payload(text)
                     continue
 
                 raise UrlReadError(error_msg)
@@ -1,15 +1,18 @@
 import logging
 import sys
+from functools import partial
 
 from langchain_core.messages import SystemMessage
 from pydantic import SecretStr
 
-from llm_chat_term import db, utils
-from llm_chat_term.audio.audio_entrypoint import handle_voice
+from llm_chat_term import branches, db, usage, utils
+from llm_chat_term.audio.audio_entrypoint import handle_voice, prewarm_voice
 from llm_chat_term.config import config
 from llm_chat_term.llm.insert_commands import parse_insert_commands
 from llm_chat_term.llm.llm_client import LLMClient
 from llm_chat_term.llm.models import ModelConfig, get_models
+from llm_chat_term.llm.titler import get_titler
+from llm_chat_term.profiling import profile_call
 from llm_chat_term.ui.chat_ui import ChatUI
 
 logger = logging.getLogger(__name__)
@@ -18,17 +21,12 @@ logger = logging.getLogger(__name__)
 class LLMChat:
     def __init__(self):
         self.ui = ChatUI()
-        available_model: ModelConfig | None = None
-
         self.api_key = SecretStr("")
-        for model in get_models():
-            try:
-                self.api_key = utils.get_api_key(model.provider)
-            except ValueError:
-                continue
-            else:
-                available_model = model
-                break
+        # Discovering the endpoint models makes requests, only do it at startup
+        # if none of the configured models can be used
+        available_model = self._find_available_model(
+            get_models(discover=False)
+        ) or self._find_available_model(get_models())
 
         if available_model is None:
             error_msg = (
@@ -38,6 +36,9 @@ class LLMChat:
             sys.stderr.write(error_msg)
             sys.exit(1)
         self.model = available_model
+        prewarm_voice()
+        if config.llm.auto_title:
+            get_titler()
         self.chat_id = self.initialize()
         self.client = LLMClient(self.model, self.api_key)
         if self.chat_id:
@@ -58,6 +59,7 @@ class LLMChat:
 
     def start_chat(self):
         should_think = False
+        profile_next_turn = False
         recorded_prompt: str = ""
 
         while True:
@@ -127,6 +129,37 @@ class LLMChat:
                 self.client.agent_mode = False
                 self.ui.console.print("Agent mode disabled", style="bold orchid")
                 continue
+            if user_input == ":profile":
+                profile_next_turn = True
+                self.ui.console.print(
+                    "The next turn will be profiled", style="bold green"
+                )
+                continue
+            if user_input == ":thinking":
+                self.ui.display_thinking(self.client.get_last_thinking())
+                continue
+            if user_input == ":usage":
+                self.ui.display_usage(
+                    usage.get_chat_usage(self.chat_id),
+                    usage.get_model_usage(),
+                    usage.get_top_chats(),
+                )
+                continue
+            if user_input == ":gc":
+                deleted_nodes, node_blobs = branches.gc_nodes()
+                deleted, deleted_bytes = db.gc_blobs(node_blobs)
+                self.ui.console.print(
+                    f"Deleted {deleted_nodes} unreachable branch messages and "
+                    f"{deleted} unused blobs ({deleted_bytes / 1024:.0f} KB)",
+                    style="bold green",
+                )
+                continue
+            if user_input.startswith(":archive"):
+                self.handle_archive_command(user_input)
+                continue
+            if user_input.startswith((":fork", ":branch")):
+                self.handle_branch_command(user_input)
+                continue
             if user_input.startswith(":think"):
                 should_think = True
             elif user_input.startswith(":v"):
@@ -140,22 +173,90 @@ class LLMChat:
                     sys.stderr.write(error_msg)
                     continue
 
-            # Get and display streaming response
-            self.ui.display_loader()
-            try:
-                self.client.get_response(
-                    user_input,
-                    self.ui.stream_token,
-                    chat_id=self.chat_id,
-                    should_think=should_think,
+            if profile_next_turn:
+                profile_next_turn = False
+                path, elapsed, subsystems = profile_call(
+                    partial(self.respond, user_input, should_think=should_think)
                 )
-            except Exception as e:
-                error_msg = f"Something went wrong... {e!s}\n"
-                logger.exception(error_msg)
-                sys.stderr.write(error_msg)
+                self.ui.display_profile(path, elapsed, subsystems)
+            else:
+                self.respond(user_input, should_think=should_think)
             should_think = False
 
-            # End streaming
-            self.ui.end_streaming()
-
         return sys.exit(0)
+
+    def _find_available_model(self, models: list[ModelConfig]) -> ModelConfig | None:
+        """The first model with an API key, which is kept in self.api_key."""
+        for model in models:
+            try:
+                self.api_key = utils.get_api_key(model.provider)
+            except ValueError:
+                continue
+            return model
+        return None
+
+    def respond(self, user_input: str, *, should_think: bool):
+        # Get and display streaming response
+        self.ui.display_loader()
+        try:
+            self.client.get_response(
+                user_input,
+                self.ui.stream_token,
+                chat_id=self.chat_id,
+                should_think=should_think,
+            )
+        except KeyboardInterrupt:
+            # A second Ctrl+C, e.g. while the turn was being saved
+            sys.stderr.write("Cancelled\n")
+        except Exception as e:
+            error_msg = f"Something went wrong... {e!s}\n"
+            logger.exception(error_msg)
+            sys.stderr.write(error_msg)
+        else:
+            if self.chat_id and config.llm.auto_title:
+                get_titler().submit(self.chat_id)
+
+        # End streaming
+        self.ui.end_streaming()
+
+    def handle_archive_command(self, user_input: str):
+        args = user_input.split()[1:]
+        if len(args) > 1 or (args and not args[0].isdigit()):
+            sys.stderr.write(f"Invalid command: {user_input}\n")
+            return
+        days = int(args[0]) if args else db.DEFAULT_ARCHIVE_DAYS
+        # The open chat is in use even if it is old
+        archived, original_bytes, compressed_bytes = db.archive_chats(
+            days, exclude={self.chat_id}
+        )
+        self.ui.console.print(
+            f"Archived {archived} chats untouched for {days} days "
+            f"({original_bytes / 1024:.0f} KB -> {compressed_bytes / 1024:.0f} KB)",
+            style="bold green",
+        )
+
+    def handle_branch_command(self, user_input: str):
+        if not self.chat_id:
+            sys.stderr.write("Anonymous chats cannot have branches...\n")
+            return
+
+        command, *args = user_input.split()
+        try:
+            if command == ":fork" and len(args) in (1, 2):
+                drop = int(args[1]) if len(args) == 2 else 0  # noqa: PLR2004
+                self.client.fork(self.chat_id, args[0], drop)
+            elif command == ":branch" and len(args) == 1:
+                self.client.parse_messages(self.chat_id, branch=args[0])
+            elif command == ":branch" and not args:
+                active, names = branches.list_branches(self.chat_id)
+                for name in names:
+                    marker = "*" if name == active else " "
+                    self.ui.console.print(f"{marker} {name}", style="bold green")
+                return
+            else:
+                sys.stderr.write(f"Invalid command: {user_input}\n")
+                return
+        except ValueError as e:
+            sys.stderr.write(f"Error: {e!s}\n")
+            return
+        self.ui.render_conversation(self.client.messages, self.chat_id)
@@ -1,12 +1,16 @@
 """LLM client for the terminal chatbot using LangChain."""
 
 import json
+import logging
+import time
 from collections.abc import Callable
-from typing import TYPE_CHECKING, cast
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, Any, cast
 
 from langchain_anthropic import ChatAnthropic
 from langchain_core.messages import (
     AIMessage,
+    AIMessageChunk,
     BaseMessage,
     BaseMessageChunk,
     HumanMessage,
@@ -15,22 +19,39 @@ from langchain_core.messages import (
     ToolMessageChunk,
     message_chunk_to_message,
 )
+from langchain_core.messages.ai import UsageMetadata, add_ai_message_chunks, add_usage
 from langchain_deepseek import ChatDeepSeek
 from langchain_google_genai import ChatGoogleGenerativeAI
 from langchain_openai import ChatOpenAI
 from pydantic import SecretStr
 
-from llm_chat_term import db
+from llm_chat_term import branches, db, usage
 from llm_chat_term.config import config
-from llm_chat_term.exceptions import ConfigurationError
+from llm_chat_term.exceptions import ConfigurationError, StreamCancelledError
+from llm_chat_term.llm.endpoints import ENDPOINT_PROVIDER, get_endpoint, get_http_client
+from llm_chat_term.llm.fake_provider import FakeStreamingChatModel
 from llm_chat_term.llm.models import ModelConfig
+from llm_chat_term.llm.rate_limiter import (
+    INTERACTIVE_PRIORITY,
+    RATE_LIMIT_RETRIES,
+    get_rate_limiter,
+    is_rate_limit_error,
+)
 from llm_chat_term.llm.tools.definitions import tools
-from llm_chat_term.llm.tools.main import TOOL_REFUSAL, process_tool_request
+from llm_chat_term.llm.tools.main import (
+    TOOL_CANCELLED,
+    TOOL_REFUSAL,
+    clear_tool_cache,
+    is_auto_approved,
+    process_tool_requests,
+)
 from llm_chat_term.ui.chat_ui import ChatUI
 
 if TYPE_CHECKING:
     from langchain_core.language_models import BaseChatModel
 
+logger = logging.getLogger(__name__)
+
 
 def get_chunk_text_and_type(chunk: BaseMessageChunk) -> tuple[str, str]:
     """Get the text content and type of the message."""
@@ -52,10 +73,43 @@ def get_chunk_text_and_type(chunk: BaseMessageChunk) -> tuple[str, str]:
     ), chunk_type
 
 
+# Appended to a response cut off with Ctrl+C, it's kept in the history
+TRUNCATED_MARKER = "\n\n*-- Truncated, cancelled with Ctrl+C.*"
+
+# Used when the model config leaves the temperature unset
+DEFAULT_TEMPERATURES = {
+    "openai": 1.0,
+    "deepseek": 0.0,
+    "openai-compatible": 0.7,
+}
+
+
+@dataclass
+class StepResult:
+    """A single LLM request of the agent loop."""
+
+    # The streamed answer, without the thinking
+    response: str
+    thinking: str
+    # The complete message when the LLM asked for tools, with the requested calls
+    message: AIMessage | None
+    tool_calls: list[dict[str, str]]
+    usage: usage.CallUsage
+
+
+def make_answer(response: str, thinking: str) -> AIMessage:
+    """The assistant message, the thinking is kept aside and never sent."""
+    if not thinking:
+        return AIMessage(response)
+    return AIMessage(response, response_metadata={"thinking": thinking})
+
+
 class LLMClient:
     """Client for interacting with the LLM."""
 
     agent_mode = False
+    # Place in the rate limiter queue, batch scripts can lower it
+    request_priority = INTERACTIVE_PRIORITY
 
     def __init__(self, model: ModelConfig, api_key: SecretStr):
         """Initialize the LLM client with the configured model."""
@@ -64,28 +118,31 @@ class LLMClient:
 
     def configure_model(self, model_config: ModelConfig, api_key: SecretStr) -> None:
         self.model_config = model_config
-        if model_config.provider == "openai":
-            temperature = 1.0
-        elif model_config.provider == "deepseek":
-            temperature = 0.0
-        else:
-            temperature = 0.4
+        self.rate_limiter = get_rate_limiter(model_config.provider, api_key)
+        temperature = model_config.temperature
+        if temperature is None:
+            temperature = DEFAULT_TEMPERATURES.get(model_config.provider, 0.4)
         if model_config.provider == "anthropic":
             self.model = ChatAnthropic(  # pyright: ignore[reportCallIssue]
                 api_key=api_key,
                 model=model_config.name,  # pyright: ignore[reportCallIssue]
                 temperature=temperature,
-                max_tokens=16384,  # pyright: ignore[reportCallIssue]
-                stream_usage=False,
+                max_tokens=model_config.max_tokens,  # pyright: ignore[reportCallIssue]
+                timeout=model_config.timeout,
+                stream_usage=True,
                 streaming=True,
             )
             self.thinking_model = ChatAnthropic(  # pyright: ignore[reportCallIssue]
                 api_key=api_key,
                 model=model_config.name,  # pyright: ignore[reportCallIssue]
                 temperature=1.0,  # Needs to be 1 for thinking
-                max_tokens=16384,  # pyright: ignore[reportCallIssue]
-                thinking={"type": "enabled", "budget_tokens": 2048},
-                stream_usage=False,
+                max_tokens=model_config.max_tokens,  # pyright: ignore[reportCallIssue]
+                timeout=model_config.timeout,
+                thinking={
+                    "type": "enabled",
+                    "budget_tokens": model_config.thinking_budget,
+                },
+                stream_usage=True,
                 streaming=True,
             )
         elif model_config.provider == "openai":
@@ -93,8 +150,10 @@ class LLMClient:
                 api_key=api_key,
                 model=model_config.name,
                 temperature=temperature,
-                max_tokens=16384,  # pyright: ignore[reportCallIssue]
+                max_tokens=model_config.max_tokens,  # pyright: ignore[reportCallIssue]
+                timeout=model_config.timeout,
                 streaming=True,
+                stream_usage=True,
             )
             self.thinking_model = self.model
         elif model_config.provider == "deepseek":
@@ -102,8 +161,10 @@ class LLMClient:
                 api_key=api_key,
                 model=model_config.name,
                 temperature=temperature,
-                max_tokens=8192,
+                max_tokens=model_config.max_tokens,
+                timeout=model_config.timeout,
                 streaming=True,
+                stream_usage=True,
             )
             self.thinking_model = self.model
         elif model_config.provider == "google":
@@ -111,9 +172,33 @@ class LLMClient:
                 api_key=api_key,
                 model=model_config.name,
                 temperature=temperature,
-                max_tokens=16384,
+                max_tokens=model_config.max_tokens,
+                timeout=model_config.timeout,
             )
             self.thinking_model = self.model
+        elif model_config.provider == ENDPOINT_PROVIDER:
+            endpoint = get_endpoint(model_config.endpoint)
+            self.model = ChatOpenAI(
+                # The OpenAI client insists on a key, local servers ignore it
+                api_key=endpoint.api_key
+                if endpoint.api_key.get_secret_value()
+                else SecretStr("none"),
+                base_url=endpoint.base_url,
+                model=model_config.name,
+                temperature=temperature,
+                max_tokens=model_config.max_tokens,  # pyright: ignore[reportCallIssue]
+                streaming=True,
+                stream_usage=True,
+                http_client=get_http_client(
+                    endpoint.base_url, model_config.timeout or endpoint.timeout
+                ),
+            )
+            self.thinking_model = self.model
+        elif model_config.provider == "local-fake":
+            self.model = FakeStreamingChatModel(settings=config.fake)
+            self.thinking_model = FakeStreamingChatModel(
+                settings=config.fake, thinking=True
+            )
         else:
             msg = "Unknown model provider"
             raise ConfigurationError(msg)
@@ -144,84 +229,401 @@ class LLMClient:
             model = self.thinking_model if should_think else self.model
         model = cast("BaseChatModel", model)
 
-        response = ""
         if user_message:
             self.messages.append(HumanMessage(user_message))
-        is_tool = False
-        tool_json = ""
-        tool_name = ""
-        tool_call_id = ""
-        tool_message: BaseMessageChunk | None = None
-        # TODO: o3-mini doesn't know what to do with response ToolMessage
-        # Ditch langchain
-        for chunk in model.stream(self.messages):
-            if (
-                hasattr(chunk, "tool_call_chunks")
-                and isinstance(chunk.tool_call_chunks, list)
-                and len(chunk.tool_call_chunks) > 0
-                and isinstance(chunk.tool_call_chunks[0], dict)
-            ):
-                chunk = cast("ToolMessageChunk", chunk)
-                block = cast("dict[str, str]", chunk.tool_call_chunks[0])
-                if not is_tool:
-                    is_tool = True
-                    tool_name = block["name"]
-                    tool_call_id = block["id"]
-                    tool_message = chunk
-                else:
-                    tool_json += block["args"]
-                    if tool_message:
-                        tool_message = tool_message + chunk
-            else:
-                text, chunk_type = get_chunk_text_and_type(chunk)
-                stream_callback(text, chunk_type)
-                response += text
-        if is_tool and tool_message and tool_call_id:
-            ai_tool_message = message_chunk_to_message(tool_message)
-            # Pause streaming to display the confirm prompt
-            stream_callback("", "prompt_tool")
-            confirm = ChatUI.display_prompt(f"Use tool {tool_name} with {tool_json}:")
-            if confirm:
-                stream_callback(
-                    (f"\n\n*-- Calling tool {tool_name} with {tool_json}...*\n"),
-                    "text",
-                )
-                tool_result = process_tool_request(tool_name, json.loads(tool_json))
+        # Cached tool results are only reused within the same agent turn
+        clear_tool_cache()
+        context_window = self.model_config.context_window
+        context_tokens = self.estimate_context_tokens() if context_window else 0
+        if context_tokens > context_window:
+            stream_callback(
+                f"*-- The conversation is about {context_tokens} "
+                f"tokens, over the {context_window} tokens context window of "
+                f"{self.model_config.name}.*\n\n",
+                "text",
+            )
+
+        # Agent loop, every step is a request to the LLM. Steps go on as long as
+        # the LLM asks for tools, bounded by the steps limit and the token budget
+        max_steps = config.agent.max_steps if self.agent_mode else 1
+        token_budget = config.agent.token_budget
+        tokens_used = 0
+        try:
+            for step in range(1, max_steps + 1):
+                step_start = time.monotonic()
+                try:
+                    result = self._limited_step(model, stream_callback)
+                except StreamCancelledError as e:
+                    # Keep what was received, the tokens are paid for
+                    self._record_usage(chat_id, e.usage)
+                    self._append_truncated(e.response, e.thinking, stream_callback)
+                    break
+                tokens_used += result.usage.total_tokens
+                self._record_usage(chat_id, result.usage)
+                if not result.tool_calls or result.message is None:
+                    self.messages.append(make_answer(result.response, result.thinking))
+                    break
+
+                self.messages.append(result.message)
+                if not self._run_tool_calls(result.tool_calls, stream_callback):
+                    break
                 stream_callback(
-                    f"{'**success**' if tool_result['success'] else '**failure**'}\n\n",
+                    f"*-- Step {step} took {time.monotonic() - step_start:.1f}s "
+                    f"({tokens_used} tokens so far)*\n\n",
                     "text",
                 )
-                self.messages.append(ai_tool_message)
-                self.messages.append(
-                    ToolMessage(json.dumps(tool_result), tool_call_id=tool_call_id)
+                if token_budget and tokens_used >= token_budget:
+                    stream_callback(
+                        f"*-- Stopping, token budget of {token_budget} exhausted.*\n\n",
+                        "text",
+                    )
+                    break
+            else:
+                stream_callback(f"*-- Stopping after {max_steps} steps.*\n\n", "text")
+        except KeyboardInterrupt:
+            # Cancelled while waiting for the rate limit or while the tools ran,
+            # the turn is still saved
+            self._cancel_tool_calls()
+            self._append_truncated("", "", stream_callback)
+
+        if chat_id:
+            history = self.get_conversation_history()
+            db.save_chat_history(chat_id, history)
+            if branches.has_branches(chat_id):
+                branches.sync_branch(chat_id, history)
+            # Shown in the chat selector preview, the titler uses the provider
+            model_fields = {
+                "model": self.model_config.name,
+                "provider": self.model_config.provider,
+                "endpoint": self.model_config.endpoint,
+            }
+            metadata = db.get_chat_metadata(chat_id)
+            if any(metadata.get(key) != value for key, value in model_fields.items()):
+                db.update_chat_metadata(chat_id, **model_fields)
+
+    def _record_usage(self, chat_id: str, call_usage: usage.CallUsage) -> None:
+        try:
+            usage.record_call(chat_id, self.model_config, call_usage)
+        except Exception:
+            # The ledger is bookkeeping, never lose a response over it
+            logger.exception("Could not record the usage")
+
+    def _cancel_tool_calls(self) -> None:
+        """Answer the tool calls of the last step that have no result yet.
+
+        Providers reject a history with tool calls left unanswered.
+        """
+        answered: set[str] = set()
+        for message in reversed(self.messages):
+            if isinstance(message, ToolMessage):
+                answered.add(message.tool_call_id)
+                continue
+            if isinstance(message, AIMessage):
+                self.messages.extend(
+                    ToolMessage(TOOL_CANCELLED, tool_call_id=tool_call["id"])
+                    for tool_call in message.tool_calls
+                    if tool_call["id"] not in answered
                 )
-                self.get_response("", stream_callback, chat_id=chat_id)
+            return
+
+    def _append_truncated(
+        self,
+        response: str,
+        thinking: str,
+        stream_callback: Callable[[str, str], None],
+    ) -> None:
+        """End the turn with the partial answer, so the history still
+        alternates between the user and the assistant.
+        """
+        stream_callback(TRUNCATED_MARKER, "text")
+        self.messages.append(make_answer(response + TRUNCATED_MARKER, thinking))
+
+    def _limited_step(
+        self,
+        model: "BaseChatModel",
+        stream_callback: Callable[[str, str], None],
+    ) -> StepResult:
+        """Stream a step once the rate limit allows it.
+
+        A step rejected by the provider's rate limit is queued again.
+        """
+        limiter = self.rate_limiter
+        if limiter is None:
+            return self._stream_step(model, stream_callback)
+
+        def on_wait(seconds: float, ahead: int):
+            queued = f", {ahead} requests ahead" if ahead else ""
+            stream_callback(
+                f"Waiting for the {self.model_config.provider} rate limit "
+                f"(~{seconds:.1f}s{queued})...",
+                "status",
+            )
+
+        estimate = self.estimate_context_tokens()
+        attempt = 0
+        while True:
+            limiter.acquire(estimate, priority=self.request_priority, on_wait=on_wait)
+            try:
+                result = self._stream_step(model, stream_callback)
+            except StreamCancelledError as e:
+                limiter.consume(e.usage.total_tokens - estimate)
+                raise
+            except Exception as e:
+                if not is_rate_limit_error(e) or attempt >= RATE_LIMIT_RETRIES:
+                    raise
+                attempt += 1
+                limiter.drain()
             else:
-                stream_callback((f"\n\n-- Will not call tool {tool_name}.\n\n"), "text")
-                self.messages.append(ai_tool_message)
-                self.messages.append(
-                    ToolMessage(TOOL_REFUSAL, tool_call_id=tool_call_id)
+                limiter.consume(result.usage.total_tokens - estimate)
+                return result
+
+    def _stream_step(
+        self,
+        model: "BaseChatModel",
+        stream_callback: Callable[[str, str], None],
+    ) -> StepResult:
+        """Stream a single LLM request of the agent loop."""
+        response = ""
+        thinking = ""
+        chunks: list[BaseMessageChunk] = []
+        start = time.monotonic()
+        first_token_latency: float | None = None
+        reported: UsageMetadata | None = None
+        # Tool calls of this step, keyed by the index of their chunks
+        tool_calls: dict[int, dict[str, str]] = {}
+        # Text waiting to be passed to the UI in a larger piece
+        chunk_chars = self.model_config.stream_chunk_chars
+        pending, pending_type = "", "text"
+        # TODO: o3-mini doesn't know what to do with response ToolMessage
+        # Ditch langchain
+        stream = model.stream(self._expanded_messages())
+        cancelled = False
+        try:
+            for chunk in stream:
+                chunks.append(chunk)
+                if first_token_latency is None:
+                    first_token_latency = time.monotonic() - start
+                chunk_usage = getattr(chunk, "usage_metadata", None)
+                if chunk_usage:
+                    reported = add_usage(reported, chunk_usage)
+                if (
+                    hasattr(chunk, "tool_call_chunks")
+                    and isinstance(chunk.tool_call_chunks, list)
+                    and len(chunk.tool_call_chunks) > 0
+                    and isinstance(chunk.tool_call_chunks[0], dict)
+                ):
+                    chunk = cast("ToolMessageChunk", chunk)
+                    for block in cast("list[dict[str, Any]]", chunk.tool_call_chunks):
+                        index = block.get("index")
+                        if index is None:
+                            index = max(tool_calls, default=0)
+                        tool_call = tool_calls.setdefault(
+                            index, {"name": "", "id": "", "args": ""}
+                        )
+                        if block.get("name"):
+                            tool_call["name"] = block["name"]
+                        if block.get("id"):
+                            tool_call["id"] = block["id"]
+                        tool_call["args"] += block.get("args") or ""
+                else:
+                    text, chunk_type = get_chunk_text_and_type(chunk)
+                    if chunk_type == "thinking":
+                        thinking += text
+                    else:
+                        response += text
+                    if pending and chunk_type != pending_type:
+                        stream_callback(pending, pending_type)
+                        pending = ""
+                    pending += text
+                    pending_type = chunk_type
+                    if len(pending) >= chunk_chars:
+                        stream_callback(pending, pending_type)
+                        pending = ""
+        except KeyboardInterrupt:
+            cancelled = True
+        finally:
+            # Stops the generator. langchain_openai then closes the HTTP
+            # response, langchain_anthropic doesn't close the SDK stream, its
+            # connection is dropped when the stream is garbage collected
+            stream.close()
+        if pending:
+            stream_callback(pending, pending_type)
+
+        call_usage = usage.CallUsage(
+            latency=time.monotonic() - start, first_token_latency=first_token_latency
+        )
+        if reported:
+            call_usage.input_tokens = reported.get("input_tokens", 0)
+            call_usage.output_tokens = reported.get("output_tokens", 0)
+            call_usage.cached_tokens = reported.get("input_token_details", {}).get(
+                "cache_read", 0
+            )
+            call_usage.thinking_tokens = reported.get("output_token_details", {}).get(
+                "reasoning", 0
+            )
+        else:
+            # The provider doesn't stream usage, estimate it
+            call_usage.input_tokens = self.estimate_context_tokens()
+            call_usage.estimated = True
+        if not call_usage.output_tokens and (response or thinking):
+            # Also when cancelled before the usage of the output was reported
+            call_usage.output_tokens = len(response + thinking) // 4
+            call_usage.estimated = True
+        if not call_usage.thinking_tokens:
+            # Claude counts thinking in the output tokens without breaking it out
+            call_usage.thinking_tokens = len(thinking) // 4
+        if cancelled:
+            raise StreamCancelledError(response, thinking, call_usage)
+
+        pending_calls = [
+            tool_call for _, tool_call in sorted(tool_calls.items()) if tool_call["id"]
+        ]
+        if not pending_calls:
+            return StepResult(response, thinking, None, [], call_usage)
+
+        # Keep the text and the tool calls of the step in a single message
+        step_message = message_chunk_to_message(
+            add_ai_message_chunks(*cast("list[AIMessageChunk]", chunks))
+        )
+        return StepResult(
+            response,
+            thinking,
+            cast("AIMessage", step_message),
+            pending_calls,
+            call_usage,
+        )
+
+    def _expanded_messages(self) -> list[BaseMessage]:
+        """The messages with their blob references replaced by the contents.
+
+        Loaded chats keep the references, blobs are only read when sent.
+        """
+        messages: list[BaseMessage] = []
+        for message in self.messages:
+            if isinstance(message.content, str):
+                content = db.expand_blobs(message.content)
+                if content is not message.content:
+                    message = message.model_copy(update={"content": content})  # noqa: PLW2901
+            messages.append(message)
+        return messages
+
+    def estimate_context_tokens(self) -> int:
+        """The size of the conversation at ~4 characters per token."""
+        return (
+            sum(
+                db.expanded_size(message.content)
+                if isinstance(message.content, str)
+                else len(str(message.content))
+                for message in self.messages
+            )
+            // 4
+        )
+
+    def _run_tool_calls(
+        self,
+        tool_calls: list[dict[str, str]],
+        stream_callback: Callable[[str, str], None],
+    ) -> bool:
+        """Run the tool calls of a step after a single confirmation.
+
+        The confirmation is skipped when every call is in the auto-approve
+        allowlist. The ToolMessages for all calls are appended to the history,
+        returns whether the tools were run and the agent loop should go on.
+        """
+        requests: list[tuple[str, dict[str, Any]]] = []
+        for tool_call in tool_calls:
+            try:
+                arguments = json.loads(tool_call["args"] or "{}")
+            except json.JSONDecodeError:
+                arguments = {}
+            requests.append((tool_call["name"], arguments))
+
+        auto_approved = all(
+            is_auto_approved(name, arguments, config.agent.auto_approve)
+            for name, arguments in requests
+        )
+        plural = "s" if len(tool_calls) > 1 else ""
+        if not auto_approved:
+            descriptions = "\n".join(
+                f"  {tool_call['name']} with {tool_call['args']}"
+                for tool_call in tool_calls
+            )
+            # Pause streaming to display the confirm prompt
+            stream_callback("", "prompt_tool")
+            confirm = ChatUI.display_prompt(f"Use tool{plural}:\n{descriptions}\n")
+            if not confirm:
+                stream_callback(f"\n\n-- Will not call tool{plural}.\n\n", "text")
+                self.messages.extend(
+                    ToolMessage(TOOL_REFUSAL, tool_call_id=tool_call["id"])
+                    for tool_call in tool_calls
                 )
+                return False
 
-        self.messages.append(AIMessage(response))
-        if chat_id:
-            db.save_chat_history(chat_id, self.get_conversation_history())
+        for tool_call in tool_calls:
+            stream_callback(
+                f"\n\n*-- Calling tool {tool_call['name']} with {tool_call['args']}...*\n",
+                "text",
+            )
+
+        tool_results = process_tool_requests(
+            requests, on_output=lambda output: stream_callback(output, "tool_output")
+        )
+        for tool_call, tool_result in zip(tool_calls, tool_results, strict=True):
+            stream_callback(
+                f"\n\n*-- {tool_call['name']}:* "
+                f"{'**success**' if tool_result['success'] else '**failure**'}"
+                f"{' *(cached)*' if tool_result.get('cached') else ''}\n\n",
+                "text",
+            )
+            self.messages.append(
+                ToolMessage(json.dumps(tool_result), tool_call_id=tool_call["id"])
+            )
+        return True
+
+    def parse_messages(self, chat_id: str, branch: str | None = None):
+        """Load the messages of a chat, or switch it to another branch first.
 
-    def parse_messages(self, chat_id: str):
-        messages_dict = db.load_chat_history(chat_id)
+        Branch messages come straight from the shared message nodes, the
+        chat file is only written as the new working copy.
+        """
+        if branch is None:
+            messages_dict = db.load_chat_history(chat_id)
+        else:
+            messages_dict = branches.switch(chat_id, branch)
+        self._set_messages(chat_id, messages_dict)
+
+    def fork(self, chat_id: str, name: str, drop: int = 0):
+        """Fork the chat to a new branch, leaving out the last drop messages."""
+        self._set_messages(chat_id, branches.fork(chat_id, name, drop))
+
+    def _set_messages(self, chat_id: str, messages_dict: list[dict[str, str]]):
         self.messages = []
+        thinking = ""
         for message in messages_dict:
             if message["role"] == "system":
                 self.messages.append(SystemMessage(message["content"]))
             elif message["role"] == "user":
                 self.messages.append(HumanMessage(message["content"]))
+            elif message["role"] == "thinking":
+                # Saved before the answer it belongs to
+                thinking = message["content"]
             elif message["role"] == "assistant":
-                self.messages.append(AIMessage(message["content"]))
+                self.messages.append(make_answer(message["content"], thinking))
+                thinking = ""
 
         if not any(isinstance(message, SystemMessage) for message in self.messages):
             self.messages.insert(0, SystemMessage(config.llm.system_prompt))
             db.save_chat_history(chat_id, self.get_conversation_history())
 
+    def get_last_thinking(self) -> str:
+        """The thinking of the last answer that has one."""
+        for message in reversed(self.messages):
+            if isinstance(message, AIMessage) and message.response_metadata.get(
+                "thinking"
+            ):
+                return message.response_metadata["thinking"]
+        return ""
+
     def get_conversation_history(self) -> list[dict[str, str]]:
         """Get the conversation history as a list of dictionaries."""
         history: list[dict[str, str]] = []
@@ -236,11 +638,17 @@ class LLMClient:
             else:
                 continue
 
-            message.content = cast("str", message.content)
+            # Agent steps keep tool calls next to the text, save only the text
+            content = message.text
+            if isinstance(message, AIMessage) and message.tool_calls and not content:
+                continue
+            thinking = message.response_metadata.get("thinking")
+            if thinking and config.llm.save_thinking:
+                history.append({"role": "thinking", "content": thinking})
             history.append(
                 {
                     "role": role,
-                    "content": message.content,
+                    "content": content,
                 }
             )
 
@@ -1,24 +1,62 @@
-from pydantic import BaseModel
-
-
-class ModelConfig(BaseModel):
-    provider: str
-    name: str
-    temperature: float | None = None
-
-
-def get_models():
-    return [
-        ModelConfig(provider="google", name="gemini-3-pro-preview"),
-        ModelConfig(provider="deepseek", name="deepseek-reasoner"),
-        ModelConfig(provider="openai", name="gtp-5-mini"),
-        ModelConfig(provider="openai", name="gpt-5"),
-        ModelConfig(
-            provider="anthropic",
-            name="claude-sonnet-4-5",
-        ),
-        ModelConfig(
-            provider="anthropic",
-            name="claude-opus-4-1",
-        ),
+from functools import cache
+
+from llm_chat_term.config import ModelConfig, config
+from llm_chat_term.llm.endpoints import ENDPOINT_PROVIDER, get_endpoint_models
+
+__all__ = ["ModelConfig", "get_cheapest_model", "get_models"]
+
+
+@cache
+def _load_models(*, discover: bool) -> tuple[ModelConfig, ...]:
+    """The configured models, validated with the config at startup.
+
+    Endpoint models are discovered once per process, the ones also defined in
+    llm.models keep their tuned settings.
+    """
+    models = list(config.llm.models)
+    configured = {(model.endpoint, model.name) for model in models}
+    models.extend(
+        ModelConfig(provider=ENDPOINT_PROVIDER, name=name, endpoint=endpoint)
+        for endpoint, name in get_endpoint_models(discover=discover)
+        if (endpoint, name) not in configured
+    )
+    if config.fake.enabled:
+        models.append(
+            ModelConfig(
+                provider="local-fake",
+                name="local-fake",
+                input_price=0.0,
+                output_price=0.0,
+            )
+        )
+    # Stable, models of the same priority keep the config order
+    return tuple(sorted(models, key=lambda model: -model.priority))
+
+
+def get_models(*, discover: bool = True) -> list[ModelConfig]:
+    """The models by priority, discover=False skips the endpoint requests."""
+    return list(_load_models(discover=discover))
+
+
+def get_cheapest_model(
+    input_tokens: int, output_tokens: int, provider: str, endpoint: str = ""
+) -> ModelConfig | None:
+    """The model with the lowest estimated cost for a request of this size.
+
+    Only models of the provider, and of the endpoint for openai-compatible
+    ones, are considered. Models without prices are only picked if none has
+    prices.
+    """
+    models = [
+        model
+        for model in get_models()
+        if model.provider == provider and model.endpoint == endpoint
     ]
+    if not models:
+        return None
+
+    def cost(model: ModelConfig) -> float:
+        estimate = model.estimate_cost(input_tokens, output_tokens)
+        return float("inf") if estimate is None else estimate
+
+    return min(models, key=cost)
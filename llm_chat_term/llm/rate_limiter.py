@@ -0,0 +1,175 @@
+"""Client-side rate limits shared by every process using the same API key.
+
+Each provider and key has token buckets for requests and tokens per minute.
+They are kept in a state file in the data dir and updated under an exclusive
+file lock, so terminals and scripts sharing a key draw from the same budget.
+Requests waiting for the budget hold a ticket in the state, the one with the
+highest priority goes first, then the oldest.
+"""
+
+import contextlib
+import hashlib
+import json
+import time
+import uuid
+from collections.abc import Callable, Iterator
+from functools import cache
+from typing import Any
+
+from pydantic import SecretStr
+
+from llm_chat_term import db
+from llm_chat_term.config import RateLimitConfig, config
+
+# Priorities of the queued requests, higher goes first
+INTERACTIVE_PRIORITY = 10
+BACKGROUND_PRIORITY = 0
+# How often a waiting request checks the budget and its place in the queue
+POLL_SECONDS = 0.25
+# Tickets not refreshed for this long belong to a process that is gone
+TICKET_EXPIRY_SECONDS = 10.0
+# Times a request rejected by the provider's rate limit is queued again
+RATE_LIMIT_RETRIES = 3
+
+TOO_MANY_REQUESTS = 429
+
+# Called once when a request has to wait, with the estimated seconds and the
+# number of requests queued before it
+WaitCallback = Callable[[float, int], None]
+
+
+def is_rate_limit_error(error: Exception) -> bool:
+    """A 429 from any of the provider SDKs."""
+    return TOO_MANY_REQUESTS in (
+        getattr(error, "status_code", None),
+        getattr(error, "code", None),
+    )
+
+
+class RateLimiter:
+    def __init__(self, limits: RateLimitConfig, key_id: str):
+        self.limits = limits
+        state_dir = db.get_data_dir() / "rate_limits"
+        state_dir.mkdir(parents=True, exist_ok=True)
+        self.state_file = state_dir / f"{key_id}.json"
+        self.lock_file = state_dir / f"{key_id}.lock"
+
+    def _budgets(self) -> list[tuple[str, int]]:
+        budgets = [
+            ("requests", self.limits.requests_per_minute),
+            ("tokens", self.limits.tokens_per_minute),
+        ]
+        return [(name, limit) for name, limit in budgets if limit > 0]
+
+    @contextlib.contextmanager
+    def _locked_state(self) -> Iterator[dict[str, Any]]:
+        """The refilled state, written back when the block exits."""
+        with db.locked_file(self.lock_file):
+            try:
+                state = json.loads(self.state_file.read_text(encoding="utf-8"))
+            except (OSError, ValueError):
+                state = {}
+            now = time.time()
+            elapsed = max(now - state.get("time", now), 0)
+            state["time"] = now
+            for name, limit in self._budgets():
+                level = state.get(name, limit)
+                state[name] = min(level + elapsed * limit / 60, limit)
+            state.setdefault("tickets", {})
+            yield state
+            self.state_file.write_text(json.dumps(state), encoding="utf-8")
+
+    def _try_take(
+        self, state: dict[str, Any], ticket: list[Any], tokens: int
+    ) -> tuple[float, int] | None:
+        """Take the budget if the ticket is first and it suffices.
+
+        Otherwise returns the estimated wait and the requests queued before.
+        """
+        now = state["time"]
+        tickets: dict[str, list[Any]] = state["tickets"]
+        for ticket_id, (_, _, seen) in list(tickets.items()):
+            if now - seen > TICKET_EXPIRY_SECONDS:
+                del tickets[ticket_id]
+        ticket_id, priority, created = ticket
+        tickets[ticket_id] = [priority, created, now]
+        order = sorted(tickets, key=lambda key: (-tickets[key][0], tickets[key][1]))
+        ahead = order.index(ticket_id)
+
+        # A request larger than the whole budget waits for a full bucket
+        needed = {"requests": 1, "tokens": min(tokens, self.limits.tokens_per_minute)}
+        wait = max(
+            (
+                (needed[name] - state[name]) * 60 / limit
+                for name, limit in self._budgets()
+            ),
+            default=0,
+        )
+        if ahead or wait > 0:
+            return max(wait, POLL_SECONDS), ahead
+
+        for name, _ in self._budgets():
+            state[name] -= needed[name]
+        del tickets[ticket_id]
+        return None
+
+    def acquire(
+        self,
+        tokens: int,
+        *,
+        priority: int = INTERACTIVE_PRIORITY,
+        on_wait: WaitCallback | None = None,
+    ) -> None:
+        """Block until a request of about this many tokens fits the budget."""
+        ticket = [uuid.uuid4().hex, priority, time.time()]
+        notified = False
+        try:
+            while True:
+                with self._locked_state() as state:
+                    waiting = self._try_take(state, ticket, tokens)
+                if waiting is None:
+                    return
+                if on_wait is not None and not notified:
+                    on_wait(*waiting)
+                    notified = True
+                time.sleep(min(waiting[0], POLL_SECONDS))
+        except BaseException:
+            # Don't hold up the queue until the ticket expires, e.g. on Ctrl+C
+            with self._locked_state() as state:
+                state["tickets"].pop(ticket[0], None)
+            raise
+
+    def consume(self, tokens: int) -> None:
+        """Charge tokens used past the estimate given to acquire.
+
+        The bucket may go negative, later requests wait until it's paid back.
+        """
+        if tokens and self.limits.tokens_per_minute:
+            with self._locked_state() as state:
+                state["tokens"] -= tokens
+
+    def drain(self) -> None:
+        """Empty the buckets after the provider rejected a request."""
+        with self._locked_state() as state:
+            for name, _ in self._budgets():
+                state[name] = min(state[name], 0)
+
+
+@cache
+def _get_limiter(provider: str, key_id: str) -> RateLimiter | None:
+    limits = next(
+        (limit for limit in config.llm.rate_limits if limit.provider == provider),
+        None,
+    )
+    if limits is None or not (limits.requests_per_minute or limits.tokens_per_minute):
+        return None
+    return RateLimiter(limits, key_id)
+
+
+def get_rate_limiter(provider: str, api_key: SecretStr) -> RateLimiter | None:
+    """The limiter of the provider and key, None without configured limits."""
+    # The state file is named after a hash, never the key itself
+    key_id = hashlib.sha256(
+        f"{provider}:{api_key.get_secret_value()}".encode()
+    ).hexdigest()[:16]
+    return _get_limiter(provider, key_id)
@@ -0,0 +1,193 @@
+"""Background generation of chat titles and tags."""
+
+import json
+import logging
+import queue
+import threading
+from functools import cache
+from typing import Any
+
+from langchain_core.messages import HumanMessage, SystemMessage
+
+from llm_chat_term import db, utils
+from llm_chat_term.llm.models import get_cheapest_model
+from llm_chat_term.llm.rate_limiter import BACKGROUND_PRIORITY
+
+logger = logging.getLogger(__name__)
+
+# Untitled chats sent in a single request
+TITLE_BATCH_SIZE = 5
+# Time to wait for more chats to batch with the first one
+BATCH_WAIT_SECONDS = 2.0
+# Most recent untitled chats that are titled when starting
+BACKFILL_CHATS = 10
+# Characters of the first exchange sent per chat
+EXCERPT_CHARS = 1500
+# The offline fake model would only make up junk titles
+UNTITLED_PROVIDERS = {"local-fake"}
+
+TITLE_PROMPT = (
+    "You name chat conversations. For each numbered conversation below, give a "
+    "short title (at most 6 words) and 1 to 3 lowercase single-word tags.\n"
+    'Reply with JSON only, mapping each number to {"title": ..., "tags": [...]}.'
+)
+
+
+def _get_excerpt(chat_id: str) -> str | None:
+    """The first exchange of a chat, None if there isn't one yet."""
+    # Archived chats are read in place, they are not in use
+    messages = db.load_chat_history(chat_id, restore=False)
+    first_user = next((m["content"] for m in messages if m["role"] == "user"), None)
+    first_assistant = next(
+        (m["content"] for m in messages if m["role"] == "assistant"), None
+    )
+    if not first_user or not first_assistant:
+        return None
+    half = EXCERPT_CHARS // 2
+    # Embedded files are described, they are not read nor sent
+    first_user = db.describe_blobs(first_user)
+    first_assistant = db.describe_blobs(first_assistant)
+    return f"User: {first_user[:half]}\nAssistant: {first_assistant[:half]}"
+
+
+def _parse_titles(text: str) -> dict[str, Any]:
+    # Models like to wrap JSON in code fences or add some words around it
+    start, end = text.find("{"), text.rfind("}")
+    if start == -1 or end == -1:
+        return {}
+    try:
+        parsed = json.loads(text[start : end + 1])
+    except json.JSONDecodeError:
+        return {}
+    return parsed if isinstance(parsed, dict) else {}
+
+
+class ChatTitler:
+    """Titles chats on a worker thread, batching the queued chats per request.
+
+    Chats are only sent to the provider, and endpoint, that answers them,
+    using its cheapest model. Results are stored in the chat metadata,
+    failures are only logged.
+    """
+
+    def __init__(self):
+        self.queue: queue.Queue[str] = queue.Queue()
+        self.pending: set[str] = set()
+        self.lock = threading.Lock()
+        self.thread = threading.Thread(target=self._work, daemon=True)
+        self.thread.start()
+
+    def submit(self, chat_id: str) -> None:
+        if db.get_chat_metadata(chat_id).get("title"):
+            return
+        with self.lock:
+            if chat_id in self.pending:
+                return
+            self.pending.add(chat_id)
+        self.queue.put(chat_id)
+
+    def _backfill(self) -> None:
+        untitled = [
+            chat_id
+            for chat_id, metadata in db.list_all_chats_with_metadata()
+            if not metadata.get("title")
+        ]
+        for chat_id in untitled[:BACKFILL_CHATS]:
+            self.submit(chat_id)
+
+    def _next_batch(self) -> list[str]:
+        batch = [self.queue.get()]
+        while len(batch) < TITLE_BATCH_SIZE:
+            try:
+                batch.append(self.queue.get(timeout=BATCH_WAIT_SECONDS))
+            except queue.Empty:
+                break
+        return batch
+
+    def _title_batch(self, batch: list[str]) -> None:
+        """Title the chats of a batch, grouped by the provider of each chat."""
+        groups: dict[tuple[str, str], list[str]] = {}
+        for chat_id in batch:
+            metadata = db.get_chat_metadata(chat_id)
+            provider = metadata.get("provider")
+            # Chats saved before the provider was recorded are left untitled
+            if not provider or provider in UNTITLED_PROVIDERS:
+                continue
+            key = (provider, metadata.get("endpoint") or "")
+            groups.setdefault(key, []).append(chat_id)
+        for (provider, endpoint), chat_ids in groups.items():
+            self._title_chats(chat_ids, provider, endpoint)
+
+    def _work(self) -> None:
+        try:
+            self._backfill()
+        except Exception:
+            logger.exception("Could not list the untitled chats")
+        while True:
+            batch = self._next_batch()
+            try:
+                self._title_batch(batch)
+            except Exception:
+                logger.exception("Could not generate chat titles")
+            finally:
+                with self.lock:
+                    self.pending.difference_update(batch)
+
+    def _title_chats(self, chat_ids: list[str], provider: str, endpoint: str) -> None:
+        excerpts: dict[str, str] = {}
+        for chat_id in chat_ids:
+            excerpt = _get_excerpt(chat_id)
+            if excerpt is not None:
+                excerpts[chat_id] = excerpt
+        if not excerpts:
+            return
+
+        client = _get_client(provider, endpoint)
+        if client is None:
+            return
+        numbered = list(excerpts.items())
+        conversations = "\n\n".join(
+            f"## {number}\n{excerpt}" for number, (_, excerpt) in enumerate(numbered, 1)
+        )
+        if client.rate_limiter is not None:
+            # Titles wait behind the interactive requests
+            client.rate_limiter.acquire(
+                len(conversations) // 4, priority=BACKGROUND_PRIORITY
+            )
+        response = client.model.invoke(
+            [SystemMessage(TITLE_PROMPT), HumanMessage(conversations)]
+        )
+        titles = _parse_titles(response.text)
+
+        for number, (chat_id, _) in enumerate(numbered, 1):
+            result = titles.get(str(number))
+            if not isinstance(result, dict) or not result.get("title"):
+                continue
+            tags = result.get("tags") or []
+            db.update_chat_metadata(
+                chat_id,
+                title=str(result["title"]).strip(),
+                tags=[str(tag) for tag in tags][:3] if isinstance(tags, list) else [],
+            )
+
+
+@cache
+def _get_client(provider: str, endpoint: str):
+    # Imported here, the client pulls in every provider
+    from llm_chat_term.llm.llm_client import LLMClient
+
+    try:
+        api_key = utils.get_api_key(provider)
+    except ValueError:
+        return None
+    model = get_cheapest_model(
+        EXCERPT_CHARS // 4 * TITLE_BATCH_SIZE, 200, provider, endpoint
+    )
+    if model is None:
+        return None
+    return LLMClient(model, api_key)
+
+
+@cache
+def get_titler() -> ChatTitler:
+    return ChatTitler()
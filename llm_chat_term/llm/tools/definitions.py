@@ -1,3 +1,5 @@
+from typing import ClassVar
+
 from pydantic import BaseModel, Field
 
 
@@ -5,11 +7,16 @@ class CatFileCommand(BaseModel):
     """Execute the `cat` command with arbitrary arguments.
     The arguments will be passed through shlex.split().
     Use it to get the contents of one or more files in the current directory.
-    Returns a success boolean, the return code, stdout, and stderr of the command as json.
+    Returns a success boolean, the return code, stdout, stderr and the elapsed seconds
+    of the command as json. Long outputs are truncated in the middle (see "truncated")
+    and commands that run too long are killed (see "timed_out").
+    Repeated read-only calls are answered from a cache, marked with "cached".
     Example:
     To execute `cat file.txt` call this tool with {"arguments": "file.txt"}
     """
 
+    command: ClassVar[str] = "cat"
+
     arguments: str = Field(..., description="The arguments for the cat command")
 
 
@@ -18,16 +25,47 @@ class GitCommand(BaseModel):
     The arguments will be passed through shlex.split().
     Use it to execute git related commands (e.g. status, diff, add, commit, branch, rebase).
     If some action is destructive(not reversible, e.g. "git checkout file"), don't execute it.
-    Returns a success boolean, the return code, stdout, and stderr of the command as json.
+    Returns a success boolean, the return code, stdout, stderr and the elapsed seconds
+    of the command as json. Long outputs are truncated in the middle (see "truncated")
+    and commands that run too long are killed (see "timed_out").
+    Repeated read-only calls are answered from a cache, marked with "cached".
     Example:
     To execute `git status -s` call this tool with {"arguments": "status -s"}
     """
 
+    command: ClassVar[str] = "git"
+
     arguments: str = Field(..., description="The arguments for the git command")
 
 
+class SearchCommand(BaseModel):
+    """Search the files of the current directory for a text or a regex, like ripgrep.
+    Files ignored by git are skipped. Prefer it over cat to find where something is
+    defined or used, then cat only the relevant files.
+    Returns a success boolean, the number of matches and the matched lines with their
+    file path, line number and surrounding context lines as json.
+    Example:
+    To find the definitions of `get_response` call this tool with
+    {"query": "def get_response"}
+    """
+
+    command: ClassVar[str] = "search"
+
+    query: str = Field(..., description="The text, or the regex, to search for")
+    regex: bool = Field(default=False, description="Treat the query as a regex")
+    case_sensitive: bool = Field(default=False, description="Match case")
+    path: str = Field(
+        default="", description="Only search files under this relative path"
+    )
+    context: int = Field(
+        default=2, description="Number of lines to show around each match"
+    )
+    max_results: int = Field(default=50, description="Maximum number of matches")
+
+
 # These will be bound to the LLM model
 tools = [
     CatFileCommand,
     GitCommand,
+    SearchCommand,
 ]
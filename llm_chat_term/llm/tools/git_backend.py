@@ -0,0 +1,258 @@
+"""In-process backend for the read-only git commands that read objects.
+
+`show <rev>:<path>` is read through a long-lived `git cat-file --batch`
+co-process and `ls-files` is answered by parsing the index directly, so these
+calls don't pay for a fork/exec and an index refresh each. status, log and
+diff are not served: their output depends on the stat refresh of the working
+tree, the diff machinery and many config options, they always fork git.
+Anything that is not handled here exactly like git would do it returns None
+and goes through the subprocess path.
+"""
+
+import atexit
+import os
+import struct
+import subprocess
+import threading
+import time
+from pathlib import Path
+
+from llm_chat_term.llm.tools.runner import CommandResult, make_result
+
+_ENTRY_FIXED_SIZE = 62
+_EXTENDED_FLAG = 0x4000
+_DIRECTORY_MODE = 0o040000
+# The trailing checksum of the index (SHA-1)
+_CHECKSUM_SIZE = 20
+
+
+class CatFileBatch:
+    """A `git cat-file --batch` co-process for a repository."""
+
+    def __init__(self, worktree: Path):
+        self.worktree = worktree
+        self.lock = threading.Lock()
+        self.process: subprocess.Popen[bytes] | None = None
+
+    def _ensure_started(self) -> subprocess.Popen[bytes]:
+        if self.process is None or self.process.poll() is not None:
+            self.process = subprocess.Popen(  # noqa: S603
+                ["git", "cat-file", "--batch"],  # noqa: S607
+                cwd=self.worktree,
+                stdin=subprocess.PIPE,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.DEVNULL,
+            )
+        return self.process
+
+    def read_object(self, spec: str) -> tuple[str, bytes] | None:
+        """Get the type and the content of an object, None if it is missing."""
+        if "\n" in spec:
+            return None
+        with self.lock:
+            process = self._ensure_started()
+            if process.stdin is None or process.stdout is None:
+                return None
+            process.stdin.write(f"{spec}\n".encode())
+            process.stdin.flush()
+            header = process.stdout.readline().decode().split()
+            # "<oid> <type> <size>", or "<spec> missing|ambiguous"
+            if len(header) != 3 or not header[2].isdigit():  # noqa: PLR2004
+                return None
+            content = process.stdout.read(int(header[2]))
+            process.stdout.read(1)  # Trailing newline
+            return header[1], content
+
+    def close(self):
+        if self.process is not None and self.process.poll() is None:
+            if self.process.stdin:
+                self.process.stdin.close()
+            self.process.wait()
+
+
+_batches: dict[Path, CatFileBatch] = {}
+_batches_lock = threading.Lock()
+# Paths of the index, cached with the (mtime, size) they were read for
+_index_cache: dict[Path, tuple[tuple[int, int], list[bytes] | None]] = {}
+
+
+def _get_batch(worktree: Path) -> CatFileBatch:
+    with _batches_lock:
+        if worktree not in _batches:
+            _batches[worktree] = CatFileBatch(worktree)
+        return _batches[worktree]
+
+
+@atexit.register
+def _close_batches():
+    for batch in _batches.values():
+        batch.close()
+
+
+def _read_varint(data: bytes, pos: int) -> tuple[int, int]:
+    # The offset encoding of index v4, not the usual LEB128
+    byte = data[pos]
+    pos += 1
+    value = byte & 0x7F
+    while byte & 0x80:
+        byte = data[pos]
+        pos += 1
+        value = ((value + 1) << 7) | (byte & 0x7F)
+    return value, pos
+
+
+def parse_index_paths(data: bytes) -> list[bytes] | None:
+    """Get the paths of a git index file, None for anything unusual.
+
+    Unmerged entries and sparse directory entries make git ls-files output
+    differ from a plain list of the paths, so they are not handled. Neither is
+    a split index (the link extension), its entries are in another file.
+    """
+    signature, version, count = struct.unpack_from(">4sLL", data)
+    if signature != b"DIRC" or version not in (2, 3, 4):
+        return None
+
+    paths: list[bytes] = []
+    previous = b""
+    pos = 12
+    for _ in range(count):
+        entry_start = pos
+        (mode,) = struct.unpack_from(">L", data, pos + 24)
+        (flags,) = struct.unpack_from(">H", data, pos + 60)
+        pos += _ENTRY_FIXED_SIZE
+        if version >= 3 and flags & _EXTENDED_FLAG:  # noqa: PLR2004
+            pos += 2
+        if (flags >> 12) & 0x3 or mode == _DIRECTORY_MODE:
+            return None
+
+        if version == 4:  # noqa: PLR2004
+            strip, pos = _read_varint(data, pos)
+            end = data.index(b"\0", pos)
+            path = previous[: len(previous) - strip] + data[pos:end]
+            pos = end + 1
+        else:
+            end = data.index(b"\0", pos)
+            path = data[pos:end]
+            # Entries are NUL padded to a multiple of 8 bytes
+            pos = entry_start + ((end - entry_start + 8) & ~7)
+        paths.append(path)
+        previous = path
+
+    # The extensions follow the entries: signature, size and data
+    while pos + 8 <= len(data) - _CHECKSUM_SIZE:
+        signature, size = struct.unpack_from(">4sL", data, pos)
+        if signature == b"link":
+            return None
+        pos += 8 + size
+    return paths
+
+
+def _read_index_paths(git_dir: Path) -> list[bytes] | None:
+    index = git_dir / "index"
+    try:
+        stat = index.stat()
+    except OSError:
+        return None
+    key = (stat.st_mtime_ns, stat.st_size)
+    cached = _index_cache.get(index)
+    if cached is not None and cached[0] == key:
+        return cached[1]
+
+    try:
+        paths = parse_index_paths(index.read_bytes())
+    except (struct.error, ValueError, IndexError):
+        paths = None
+    _index_cache[index] = (key, paths)
+    return paths
+
+
+def _needs_quoting(path: bytes) -> bool:
+    # core.quotePath, git would print these paths quoted
+    return any(byte < 0x20 or byte >= 0x80 or byte in b'"\\' for byte in path)  # noqa: PLR2004
+
+
+def _config_files(git_dir: Path) -> list[Path]:
+    home = Path.home()
+    xdg_config_home = os.environ.get("XDG_CONFIG_HOME")
+    config_home = Path(xdg_config_home) if xdg_config_home else home / ".config"
+    return [
+        git_dir / "config",
+        home / ".gitconfig",
+        config_home / "git" / "config",
+        Path("/etc/gitconfig"),
+    ]
+
+
+def _may_use_textconv(git_dir: Path) -> bool:
+    """Whether a textconv driver may be configured for the repository.
+
+    git show runs textconv drivers on blobs. The attributes assigning them can
+    be in a .gitattributes file of any directory, tracked or not, so with a
+    driver configured git is always asked.
+    """
+    # Config given in the environment, or in other files
+    if any(
+        name in os.environ
+        for name in ("GIT_CONFIG_GLOBAL", "GIT_CONFIG_SYSTEM", "GIT_CONFIG_COUNT")
+    ):
+        return True
+    for config_file in _config_files(git_dir):
+        try:
+            config_text = config_file.read_text(encoding="utf-8", errors="replace")
+        except OSError:
+            continue
+        config_text = config_text.lower()
+        if "textconv" in config_text or "include" in config_text:
+            return True
+    return False
+
+
+def _is_supported_repository(git_dir: Path) -> bool:
+    config_file = git_dir / "config"
+    config_text = (
+        config_file.read_text(encoding="utf-8") if config_file.exists() else ""
+    )
+    # SHA-256 repositories have a different index layout
+    if "objectformat" in config_text.lower():
+        return False
+    return not _may_use_textconv(git_dir)
+
+
+def _ls_files(git_dir: Path) -> bytes | None:
+    paths = _read_index_paths(git_dir)
+    if paths is None or any(_needs_quoting(path) for path in paths):
+        return None
+    return b"".join(path + b"\n" for path in paths)
+
+
+def _show_blob(worktree: Path, spec: str) -> bytes | None:
+    rev, _, path = spec.partition(":")
+    # Paths starting with ./ are relative to the cwd, leave them to git
+    if not rev or not path or path.startswith(("./", "../")):
+        return None
+    result = _get_batch(worktree).read_object(spec)
+    if result is None or result[0] != "blob":
+        return None
+    return result[1]
+
+
+def try_run_git(arguments: list[str], cwd: Path) -> CommandResult | None:
+    """Run a read-only git command in-process, None if it isn't supported.
+
+    Handled: `ls-files` and `show <rev>:<path>` for blobs, from the top of the
+    working tree. status, log, diff and the rest fork git.
+    """
+    git_dir = cwd / ".git"
+    if not git_dir.is_dir() or not _is_supported_repository(git_dir):
+        return None
+
+    start = time.monotonic()
+    output: bytes | None = None
+    if arguments == ["ls-files"]:
+        output = _ls_files(git_dir)
+    elif len(arguments) == 2 and arguments[0] == "show" and ":" in arguments[1]:  # noqa: PLR2004
+        output = _show_blob(cwd, arguments[1])
+
+    if output is None:
+        return None
+    return make_result(output, elapsed=time.monotonic() - start)
@@ -1,26 +1,30 @@
 import shlex
-import subprocess
+from pathlib import Path
 
 from llm_chat_term.llm.tools.definitions import CatFileCommand
-from llm_chat_term.llm.tools.main import register_model
+from llm_chat_term.llm.tools.main import register_fingerprint, register_model
+from llm_chat_term.llm.tools.runner import OutputCallback, run_command
+
+
+@register_fingerprint
+def fingerprint_cat(model: CatFileCommand):
+    files: list[tuple[str, int, int]] = []
+    for argument in shlex.split(model.arguments):
+        if argument.startswith("-"):
+            # Options, or stdin
+            continue
+        stat = Path(argument).stat()
+        files.append((argument, stat.st_mtime_ns, stat.st_size))
+    return tuple(files) or None
 
 
 @register_model
-def handle_cat(model: CatFileCommand):
+def handle_cat(model: CatFileCommand, on_output: OutputCallback | None = None):
     try:
-        result = subprocess.run(  # noqa: S603
-            ["cat", *shlex.split(model.arguments)],  # noqa: S607
-            capture_output=True,
-            text=True,
-            check=False,
+        result = run_command(
+            ["cat", *shlex.split(model.arguments)], on_output=on_output
         )
     except Exception as e:
         return {"success": False, "exception": str(e)}
 
-    return {
-        "success": result.returncode == 0,
-        "stdout": result.stdout,
-        "stderr": result.stderr,
-        "returncode": result.returncode,
-        "command": f"cat {model.arguments}",
-    }
+    return result.to_tool_result(f"cat {model.arguments}")
@@ -1,26 +1,82 @@
 import shlex
-import subprocess
+from pathlib import Path
 
+from llm_chat_term.config import config
 from llm_chat_term.llm.tools.definitions import GitCommand
-from llm_chat_term.llm.tools.main import register_model
+from llm_chat_term.llm.tools.git_backend import try_run_git
+from llm_chat_term.llm.tools.main import register_fingerprint, register_model
+from llm_chat_term.llm.tools.runner import OutputCallback, run_command
+
+# Subcommands that never change the repository, their results can be cached
+READ_ONLY_SUBCOMMANDS = {"status", "diff", "log", "show", "ls-files", "blame"}
+
+
+def find_git_dir(path: Path) -> Path | None:
+    """Find the git dir of the repository containing path, without forking git."""
+    for directory in (path, *path.parents):
+        dot_git = directory / ".git"
+        if dot_git.is_dir():
+            return dot_git
+        if dot_git.is_file():
+            # Worktrees and submodules point to their git dir
+            content = dot_git.read_text(encoding="utf-8").strip()
+            if content.startswith("gitdir: "):
+                return (directory / content[8:]).resolve()
+    return None
+
+
+def resolve_head(git_dir: Path) -> str:
+    """Get the commit HEAD points to, reading the refs directly."""
+    head = (git_dir / "HEAD").read_text(encoding="utf-8").strip()
+    if not head.startswith("ref: "):
+        return head
+    ref = head[5:]
+
+    # Linked worktrees keep the refs in the common dir
+    common_dir = git_dir
+    commondir_file = git_dir / "commondir"
+    if commondir_file.exists():
+        common_dir = (
+            git_dir / commondir_file.read_text(encoding="utf-8").strip()
+        ).resolve()
+    for base in (git_dir, common_dir):
+        ref_file = base / ref
+        if ref_file.is_file():
+            return ref_file.read_text(encoding="utf-8").strip()
+
+    packed_refs = common_dir / "packed-refs"
+    if packed_refs.exists():
+        for line in packed_refs.read_text(encoding="utf-8").splitlines():
+            if line.endswith(f" {ref}"):
+                return line.split(" ", 1)[0]
+    # Unborn branch
+    return ref
+
+
+@register_fingerprint
+def fingerprint_git(model: GitCommand):
+    arguments = shlex.split(model.arguments)
+    if not arguments or arguments[0] not in READ_ONLY_SUBCOMMANDS:
+        return None
+
+    git_dir = find_git_dir(Path.cwd())
+    if git_dir is None:
+        return None
+    index = git_dir / "index"
+    index_mtime = index.stat().st_mtime_ns if index.exists() else 0
+    return (resolve_head(git_dir), index_mtime)
 
 
 @register_model
-def handle_git(model: GitCommand):
+def handle_git(model: GitCommand, on_output: OutputCallback | None = None):
     try:
-        result = subprocess.run(  # noqa: S603
-            ["git", *shlex.split(model.arguments)],  # noqa: S607
-            capture_output=True,
-            text=True,
-            check=False,
-        )
+        arguments = shlex.split(model.arguments)
+        result = None
+        if config.agent.git_backend == "batch":
+            result = try_run_git(arguments, Path.cwd())
+        if result is None:
+            result = run_command(["git", *arguments], on_output=on_output)
     except Exception as e:
         return {"success": False, "exception": str(e)}
 
-    return {
-        "success": result.returncode == 0,
-        "stdout": result.stdout,
-        "stderr": result.stderr,
-        "returncode": result.returncode,
-        "command": f"git {model.arguments}",
-    }
+    return result.to_tool_result(f"git {model.arguments}")
@@ -0,0 +1,86 @@
+import re
+import shutil
+import time
+from dataclasses import replace
+from pathlib import Path
+from typing import Any
+
+from llm_chat_term.llm.tools.definitions import SearchCommand
+from llm_chat_term.llm.tools.main import register_model
+from llm_chat_term.llm.tools.runner import OutputCallback, make_result, run_command
+from llm_chat_term.llm.tools.search_index import (
+    BUILD_WAIT_SECONDS,
+    get_search_index,
+    literal_runs,
+)
+
+
+def _grep_command(model: SearchCommand, path_prefix: str) -> list[str] | None:
+    """rg, or git grep, arguments for the search, None if neither can run it."""
+    context = str(max(model.context, 0))
+    if shutil.which("rg"):
+        args = ["rg", "--line-number", "--no-heading", "--color=never", "-C", context]
+        if not model.regex:
+            args.append("--fixed-strings")
+    elif (Path.cwd() / ".git").exists():
+        args = ["git", "grep", "--line-number", "-I", "--untracked", "-C", context]
+        args.append("--extended-regexp" if model.regex else "--fixed-strings")
+    else:
+        return None
+    if not model.case_sensitive:
+        args.append("--ignore-case")
+    return [*args, "-e", model.query, "--", path_prefix or "."]
+
+
+def _search_with_grep(
+    model: SearchCommand, path_prefix: str, on_output: OutputCallback | None
+) -> dict[str, Any]:
+    args = _grep_command(model, path_prefix)
+    if args is None:
+        return {
+            "success": False,
+            "exception": "The search index is still being built, retry shortly",
+        }
+    result = run_command(args, on_output=on_output)
+    # Both exit with 1 when nothing matches
+    if result.returncode == 1 and not result.stderr:
+        result = replace(result, returncode=0)
+    return {**result.to_tool_result(f"search {model.query}"), "fallback": args[0]}
+
+
+@register_model
+def handle_search(model: SearchCommand, on_output: OutputCallback | None = None):
+    start = time.monotonic()
+    try:
+        pattern = re.compile(
+            model.query if model.regex else re.escape(model.query),
+            0 if model.case_sensitive else re.IGNORECASE,
+        )
+        path_prefix = model.path.strip().removeprefix("./")
+        if path_prefix in (".", "/"):
+            path_prefix = ""
+        index = get_search_index(Path.cwd())
+        # The first build of the index goes on in the background
+        if not index.ensure_fresh(BUILD_WAIT_SECONDS):
+            return _search_with_grep(model, path_prefix, on_output)
+        matches, files_searched, limited = index.search(
+            pattern,
+            literal_runs(model.query, regex=model.regex),
+            path_prefix=path_prefix,
+            context=max(model.context, 0),
+            max_results=max(model.max_results, 1),
+        )
+    except Exception as e:
+        return {"success": False, "exception": str(e)}
+
+    output = "\n--\n".join(match.format() for match in matches)
+    if output:
+        output += "\n"
+
+    result = make_result(output.encode(), elapsed=time.monotonic() - start)
+    return {
+        **result.to_tool_result(f"search {model.query}"),
+        "matches": len(matches),
+        "files_searched": files_searched,
+        "limited": limited,
+    }
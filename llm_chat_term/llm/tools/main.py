@@ -1,23 +1,59 @@
 import json
-from collections.abc import Callable
+import shlex
+import threading
+from collections.abc import Callable, Hashable
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
 from typing import Any, TypeVar
 
 from pydantic import BaseModel
 
+from llm_chat_term.llm.tools.runner import OutputCallback
+
 TOOL_REFUSAL = json.dumps({"success": False, "reason": "User refused to allow tool"})
+TOOL_CANCELLED = json.dumps({"success": False, "reason": "User cancelled the tool"})
 
 # Type variables for type safety
 T = TypeVar("T", bound=BaseModel)
 
+# Upper bound for the tool calls of a single turn that run concurrently
+MAX_PARALLEL_TOOLS = 8
+
+# Options that make an auto approved command write files or read any file,
+# e.g. git diff --output=<file>, calls using them are always confirmed
+UNSAFE_OPTIONS = (
+    "--output",
+    "-o",
+    "-O",
+    "--no-index",
+    "--git-dir",
+    "--work-tree",
+    "-C",
+)
+
 # Registry to map model names to (model class, handler function) pairs
-_model_registry: dict[str, tuple[type[BaseModel], Callable[[Any], Any]]] = {}
+_model_registry: dict[str, tuple[type[BaseModel], Callable[..., Any]]] = {}
+
+
+# Registry to map model names to the fingerprint functions of cacheable tools
+_fingerprint_registry: dict[str, Callable[[Any], Hashable | None]] = {}
+
+# Results of read-only tool calls within an agent session
+_tool_cache: dict[tuple[str, str, str, Hashable], dict[str, Any]] = {}
+_tool_cache_lock = threading.Lock()
 
 
 def get_model_registry():
     return _model_registry
 
 
+def get_fingerprint_registry():
+    return _fingerprint_registry
+
+
 # Decorator to register models handlers
+# Handlers are called as handler(model, on_output=...) with a callback for
+# the live output of the tool
 def register_model(handler_func: Callable[[T], Any]):
     # Get the type annotation of the model parameter
     model_class = handler_func.__annotations__.get("model")
@@ -33,8 +69,32 @@ def register_model(handler_func: Callable[[T], Any]):
     return handler_func
 
 
+# Decorator to make the results of a tool cacheable
+# The fingerprint function returns a cheap value that changes whenever the
+# result of the call could change, or None if the call must not be cached
+def register_fingerprint(fingerprint_func: Callable[[T], Hashable | None]):
+    model_class = fingerprint_func.__annotations__.get("model")
+    if not model_class:
+        error_msg = f"Fingerprint {fingerprint_func.__name__} must have a typed 'model' parameter"
+
+        raise ValueError(error_msg)
+
+    registry = get_fingerprint_registry()
+    registry[model_class.__name__] = fingerprint_func
+    return fingerprint_func
+
+
+def clear_tool_cache():
+    with _tool_cache_lock:
+        _tool_cache.clear()
+
+
 # Function to process incoming requests
-def process_tool_request(model_name: str, data: dict[str, Any]):
+def process_tool_request(
+    model_name: str,
+    data: dict[str, Any],
+    on_output: OutputCallback | None = None,
+):
     registry = get_model_registry()
     if model_name not in registry:
         error_msg = f"Unknown tool: {model_name}"
@@ -45,5 +105,118 @@ def process_tool_request(model_name: str, data: dict[str, Any]):
     # Instantiate the model with the provided data
     model_instance = model_class(**data)
 
+    fingerprint_func = get_fingerprint_registry().get(model_name)
+    try:
+        fingerprint = fingerprint_func(model_instance) if fingerprint_func else None
+    except Exception:
+        # e.g. a missing file, the handler reports the error
+        return handler_func(model_instance, on_output=on_output)
+    if fingerprint is None:
+        if fingerprint_func:
+            # The call may have side effects, don't trust anything cached so far
+            clear_tool_cache()
+        return handler_func(model_instance, on_output=on_output)
+
+    cache_key = (
+        model_name,
+        json.dumps(data, sort_keys=True),
+        str(Path.cwd()),
+        fingerprint,
+    )
+    with _tool_cache_lock:
+        cached_result = _tool_cache.get(cache_key)
+    if cached_result is not None:
+        return {**cached_result, "cached": True}
+
     # Call the handler with the model instance
-    return handler_func(model_instance)
+    result = handler_func(model_instance, on_output=on_output)
+    if result.get("success"):
+        with _tool_cache_lock:
+            _tool_cache[cache_key] = result
+    return result
+
+
+def _safe_process_tool_request(
+    model_name: str,
+    data: dict[str, Any],
+    on_output: OutputCallback | None = None,
+):
+    try:
+        return process_tool_request(model_name, data, on_output)
+    except Exception as e:
+        return {"success": False, "exception": str(e)}
+
+
+# Run all the tool calls of a turn in parallel, results keep the request order
+def process_tool_requests(
+    requests: list[tuple[str, dict[str, Any]]],
+    on_output: OutputCallback | None = None,
+):
+    if not requests:
+        return []
+    if len(requests) == 1:
+        return [_safe_process_tool_request(*requests[0], on_output)]
+
+    with ThreadPoolExecutor(
+        max_workers=min(len(requests), MAX_PARALLEL_TOOLS)
+    ) as executor:
+        return list(
+            executor.map(
+                lambda request: _safe_process_tool_request(*request, on_output),
+                requests,
+            )
+        )
+
+
+# The command line of a tool call, e.g. ["git", "status", "-s"]
+def get_tool_command(model_name: str, data: dict[str, Any]) -> list[str] | None:
+    registry = get_model_registry()
+    if model_name not in registry:
+        return None
+    model_class, _ = registry[model_name]
+    command: str | None = getattr(model_class, "command", None)
+    if not command:
+        return None
+
+    arguments = data.get("arguments", "")
+    if not isinstance(arguments, str):
+        return None
+    try:
+        return [command, *shlex.split(arguments)]
+    except ValueError:
+        return None
+
+
+def _is_outside_cwd(argument: str) -> bool:
+    cwd = Path.cwd().resolve()
+    path = (cwd / Path(argument).expanduser()).resolve()
+    return not path.is_relative_to(cwd)
+
+
+def _has_unsafe_arguments(arguments: list[str]) -> bool:
+    """Arguments that write files or reach outside the working directory."""
+    for argument in arguments:
+        if argument.startswith(UNSAFE_OPTIONS):
+            return True
+        if argument.startswith("-"):
+            if not argument.startswith("--") or "=" not in argument:
+                continue
+            # The value of a long option, e.g. --git-dir=/elsewhere
+            argument = argument.split("=", 1)[1]  # noqa: PLW2901
+        if argument and _is_outside_cwd(argument):
+            return True
+    return False
+
+
+# A tool call is auto approved if its command line starts with one of the rules
+# and the rest of its arguments are safe
+def is_auto_approved(model_name: str, data: dict[str, Any], allowlist: list[str]):
+    tool_command = get_tool_command(model_name, data)
+    if tool_command is None:
+        return False
+
+    for rule in allowlist:
+        rule_command = shlex.split(rule)
+        if rule_command and tool_command[: len(rule_command)] == rule_command:
+            return not _has_unsafe_arguments(tool_command[len(rule_command) :])
+    return False
@@ -0,0 +1,174 @@
+"""Shared subprocess runner for the tool handlers."""
+
+import codecs
+import subprocess
+import threading
+import time
+from collections.abc import Callable
+from dataclasses import dataclass
+from typing import IO, Any
+
+from llm_chat_term.config import config
+
+# Receives the decoded output of a running tool as it is produced
+OutputCallback = Callable[[str], None]
+
+TRUNCATION_MARKER = "\n\n[... {omitted} bytes truncated ...]\n\n"
+_READ_SIZE = 64 * 1024
+
+
+class _BoundedCapture:
+    """Keep the head and the tail of a stream, dropping the middle past max_bytes."""
+
+    def __init__(self, max_bytes: int):
+        self.head_limit = max_bytes // 2
+        self.tail_limit = max_bytes - self.head_limit
+        self.head = bytearray()
+        self.tail = bytearray()
+        self.total = 0
+
+    def write(self, data: bytes) -> None:
+        self.total += len(data)
+        room = self.head_limit - len(self.head)
+        if room > 0:
+            self.head += data[:room]
+            data = data[room:]
+        if data:
+            self.tail += data
+            overflow = len(self.tail) - self.tail_limit
+            if overflow > 0:
+                del self.tail[:overflow]
+
+    @property
+    def truncated(self) -> bool:
+        return self.total > len(self.head) + len(self.tail)
+
+    def getvalue(self) -> str:
+        if not self.truncated:
+            return (self.head + self.tail).decode("utf-8", errors="replace")
+        omitted = self.total - len(self.head) - len(self.tail)
+        return (
+            self.head.decode("utf-8", errors="replace")
+            + TRUNCATION_MARKER.format(omitted=omitted)
+            + self.tail.decode("utf-8", errors="replace")
+        )
+
+
+@dataclass
+class CommandResult:
+    returncode: int
+    stdout: str
+    stderr: str
+    elapsed: float
+    timed_out: bool
+    truncated: bool
+
+    def to_tool_result(self, command: str) -> dict[str, Any]:
+        return {
+            "success": self.returncode == 0 and not self.timed_out,
+            "stdout": self.stdout,
+            "stderr": self.stderr,
+            "returncode": self.returncode,
+            "command": command,
+            "elapsed_seconds": round(self.elapsed, 3),
+            "timed_out": self.timed_out,
+            "truncated": self.truncated,
+        }
+
+
+def make_result(
+    stdout: bytes, *, elapsed: float, max_bytes: int | None = None
+) -> CommandResult:
+    """Build a successful result for output produced without a subprocess."""
+    capture = _BoundedCapture(max_bytes or config.agent.tool_max_output_bytes)
+    capture.write(stdout)
+    return CommandResult(
+        returncode=0,
+        stdout=capture.getvalue(),
+        stderr="",
+        elapsed=elapsed,
+        timed_out=False,
+        truncated=capture.truncated,
+    )
+
+
+def _pump(
+    stream: IO[bytes],
+    capture: _BoundedCapture,
+    on_output: OutputCallback | None,
+) -> None:
+    # Only the head of the output is echoed, the UI must not choke on it either
+    decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+    echoed = 0
+    while True:
+        data = stream.read1(_READ_SIZE)  # pyright: ignore[reportAttributeAccessIssue]
+        if not data:
+            break
+        capture.write(data)
+        if on_output and echoed < capture.head_limit:
+            data = data[: capture.head_limit - echoed]
+            echoed += len(data)
+            on_output(decoder.decode(data))
+    stream.close()
+
+
+def run_command(
+    args: list[str],
+    *,
+    timeout: float | None = None,
+    max_bytes: int | None = None,
+    on_output: OutputCallback | None = None,
+) -> CommandResult:
+    """Run a tool command with a wall-clock timeout and capped output capture.
+
+    Output past max_bytes keeps only its head and tail, joined by a marker.
+    If given, on_output receives the output while the command is running.
+    """
+    if timeout is None:
+        timeout = config.agent.tool_timeout
+    if max_bytes is None:
+        max_bytes = config.agent.tool_max_output_bytes
+
+    start = time.monotonic()
+    process = subprocess.Popen(  # noqa: S603
+        args,
+        stdin=subprocess.DEVNULL,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+    )
+    stdout = _BoundedCapture(max_bytes)
+    stderr = _BoundedCapture(max_bytes)
+    readers = [
+        threading.Thread(
+            target=_pump, args=(process.stdout, stdout, on_output), daemon=True
+        ),
+        threading.Thread(
+            target=_pump, args=(process.stderr, stderr, on_output), daemon=True
+        ),
+    ]
+    for reader in readers:
+        reader.start()
+
+    timed_out = False
+    try:
+        process.wait(timeout=timeout or None)
+    except subprocess.TimeoutExpired:
+        timed_out = True
+        process.kill()
+        process.wait()
+    finally:
+        if process.poll() is None:
+            process.kill()
+            process.wait()
+        # Grandchildren may keep the pipes open, don't wait on them forever
+        for reader in readers:
+            reader.join(timeout=1.0)
+
+    return CommandResult(
+        returncode=process.returncode,
+        stdout=stdout.getvalue(),
+        stderr=stderr.getvalue(),
+        elapsed=time.monotonic() - start,
+        timed_out=timed_out,
+        truncated=stdout.truncated or stderr.truncated,
+    )
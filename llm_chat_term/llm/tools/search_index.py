@@ -0,0 +1,315 @@
+"""Incrementally updated index of the working tree for the search tool.
+
+The index has two levels: every file maps to the set of its (lowercased) word
+tokens, and every token to the files containing it. Substring queries go
+through a trigram index over the token vocabulary, which is much smaller than
+the trigrams of all the file contents and is shared by all the files.
+"""
+
+import re
+import subprocess
+import threading
+import time
+from collections import defaultdict
+from dataclasses import dataclass, field
+from pathlib import Path
+
+# Files are listed and stat-ed again in the background at most this often
+REFRESH_INTERVAL = 5.0
+# A search waits this long for the first build of the index, then the search
+# tool falls back to rg or git grep while the build goes on
+BUILD_WAIT_SECONDS = 2.0
+MAX_FILE_SIZE = 1024 * 1024
+_BINARY_CHECK_SIZE = 8192
+_WORD = re.compile(r"\w+")
+_REGEX_SPECIAL = set("\\.^$*+?{}[]|()")
+
+
+def _trigrams(token: str) -> set[str]:
+    return {token[i : i + 3] for i in range(len(token) - 2)}
+
+
+@dataclass
+class SearchMatch:
+    path: str
+    line_number: int
+    lines: list[tuple[int, str]] = field(default_factory=list)
+
+    def format(self) -> str:
+        # Same layout as ripgrep: "path:line:" for matches, "path-line-" for context
+        return "\n".join(
+            f"{self.path}{':' if number == self.line_number else '-'}"
+            f"{number}{':' if number == self.line_number else '-'}{line}"
+            for number, line in self.lines
+        )
+
+
+class SearchIndex:
+    def __init__(self, root: Path):
+        self.root = root
+        self.lock = threading.Lock()
+        self.refresh_lock = threading.Lock()
+        # Set once the first build is complete
+        self.ready = threading.Event()
+        self.last_refresh = 0.0
+        # path -> (mtime_ns, size) of the indexed version
+        self.stats: dict[str, tuple[int, int]] = {}
+        self.file_tokens: dict[str, frozenset[str]] = {}
+        self.token_files: defaultdict[str, set[str]] = defaultdict(set)
+        self.trigram_tokens: defaultdict[str, set[str]] = defaultdict(set)
+
+    def _list_files(self) -> list[str]:
+        try:
+            result = subprocess.run(  # noqa: S603
+                [  # noqa: S607
+                    "git",
+                    "ls-files",
+                    "-z",
+                    "--cached",
+                    "--others",
+                    "--exclude-standard",
+                ],
+                cwd=self.root,
+                capture_output=True,
+                check=True,
+            )
+            paths = [path for path in result.stdout.decode().split("\0") if path]
+            if paths:
+                return paths
+        except (OSError, subprocess.CalledProcessError):
+            pass
+
+        # Not a git repository, or an ignored directory of one,
+        # skip hidden files and directories
+        paths: list[str] = []
+        for directory, dirnames, filenames in self.root.walk():
+            dirnames[:] = [name for name in dirnames if not name.startswith(".")]
+            paths.extend(
+                str((directory / name).relative_to(self.root))
+                for name in filenames
+                if not name.startswith(".")
+            )
+        return paths
+
+    def _read_text(self, path: str) -> str | None:
+        try:
+            data = (self.root / path).read_bytes()
+        except OSError:
+            return None
+        if b"\0" in data[:_BINARY_CHECK_SIZE]:
+            return None
+        return data.decode("utf-8", errors="replace")
+
+    def _remove(self, path: str) -> None:
+        self.stats.pop(path, None)
+        for token in self.file_tokens.pop(path, frozenset()):
+            files = self.token_files[token]
+            files.discard(path)
+            if not files:
+                # The vocabulary trigrams may keep pointing at it, that's harmless
+                del self.token_files[token]
+
+    def _add(self, path: str, stat: tuple[int, int]) -> None:
+        self.stats[path] = stat
+        text = self._read_text(path) if stat[1] <= MAX_FILE_SIZE else None
+        if text is None:
+            self.file_tokens[path] = frozenset()
+            return
+
+        tokens = frozenset(_WORD.findall(text.lower()))
+        self.file_tokens[path] = tokens
+        for token in tokens:
+            files = self.token_files.get(token)
+            if files is None:
+                files = self.token_files[token] = set()
+                for trigram in _trigrams(token):
+                    self.trigram_tokens[trigram].add(token)
+            files.add(path)
+
+    def _update(self, path: str) -> None:
+        try:
+            stat = (self.root / path).stat()
+        except OSError:
+            self._remove(path)
+            return
+        key = (stat.st_mtime_ns, stat.st_size)
+        if self.stats.get(path) != key:
+            self._remove(path)
+            self._add(path, key)
+
+    def refresh(self) -> None:
+        """Re-index the files that changed since the last refresh."""
+        paths = self._list_files()
+        with self.lock:
+            for path in set(self.stats) - set(paths):
+                self._remove(path)
+        for path in paths:
+            with self.lock:
+                self._update(path)
+        self.last_refresh = time.monotonic()
+        self.ready.set()
+
+    def _background_refresh(self) -> None:
+        try:
+            self.refresh()
+        finally:
+            self.refresh_lock.release()
+
+    def ensure_fresh(self, timeout: float | None = None) -> bool:
+        """Build or refresh the index in the background if it is stale.
+
+        Waits up to timeout seconds (forever with None) for the first build,
+        returns whether the index is ready to be searched.
+        """
+        if (
+            not self.ready.is_set()
+            or time.monotonic() - self.last_refresh > REFRESH_INTERVAL
+        ) and self.refresh_lock.acquire(blocking=False):
+            threading.Thread(target=self._background_refresh, daemon=True).start()
+        return self.ready.wait(timeout)
+
+    def _files_for_run(self, run: str) -> set[str] | None:
+        """Files with a token containing run, None if run is too short to tell."""
+        trigrams = _trigrams(run)
+        if not trigrams:
+            return None
+        tokens: set[str] | None = None
+        for trigram in sorted(trigrams, key=lambda t: len(self.trigram_tokens[t])):
+            matches = self.trigram_tokens.get(trigram, set())
+            tokens = set(matches) if tokens is None else tokens & matches
+            if not tokens:
+                return set()
+        files: set[str] = set()
+        for token in tokens or ():
+            if run in token:
+                files.update(self.token_files.get(token, ()))
+        return files
+
+    def candidates(self, literal_runs: list[str]) -> set[str]:
+        """Files that may contain all the literal runs of a query."""
+        result: set[str] | None = None
+        for literal in literal_runs:
+            for run in _WORD.findall(literal.lower()):
+                files = self._files_for_run(run)
+                if files is None:
+                    continue
+                result = files if result is None else result & files
+                if not result:
+                    return set()
+        return set(self.stats) if result is None else result
+
+    def search(
+        self,
+        pattern: re.Pattern[str],
+        literal_runs: list[str],
+        *,
+        path_prefix: str = "",
+        context: int = 0,
+        max_results: int = 50,
+    ) -> tuple[list[SearchMatch], int, bool]:
+        """Search the working tree for pattern, once ensure_fresh is True.
+
+        Returns the matches, the number of files searched and whether more
+        matches than max_results were found.
+        """
+        with self.lock:
+            candidates = sorted(
+                path
+                for path in self.candidates(literal_runs)
+                if path.startswith(path_prefix)
+            )
+
+        matches: list[SearchMatch] = []
+        for path in candidates:
+            # The index may be a few seconds old, make sure the candidate isn't
+            with self.lock:
+                self._update(path)
+            text = self._read_text(path)
+            if text is None:
+                continue
+            lines = text.splitlines()
+            for idx, line in enumerate(lines):
+                if not pattern.search(line):
+                    continue
+                if len(matches) == max_results:
+                    return matches, len(candidates), True
+                first = max(idx - context, 0)
+                last = min(idx + context, len(lines) - 1)
+                matches.append(
+                    SearchMatch(
+                        path,
+                        idx + 1,
+                        [(i + 1, lines[i]) for i in range(first, last + 1)],
+                    )
+                )
+        return matches, len(candidates), False
+
+
+def literal_runs(pattern: str, *, regex: bool) -> list[str]:
+    """Get the parts of a query that every match has to contain literally."""
+    if not regex:
+        return [pattern]
+    # Any alternation at any level makes every part optional
+    if "|" in pattern:
+        return []
+
+    runs: list[str] = []
+    # Number of runs before each open group
+    groups: list[int] = []
+    current = ""
+    i = 0
+    while i < len(pattern):
+        char = pattern[i]
+        if char == "\\" and i + 1 < len(pattern):
+            escaped = pattern[i + 1]
+            i += 2
+            if escaped.isalnum():
+                # A character class (\w, \d...) or a backreference
+                runs.append(current)
+                current = ""
+            else:
+                current += escaped
+            continue
+        if char in "?*{":
+            # The previous character is optional
+            current = current[:-1]
+            if char == "{":
+                end = pattern.find("}", i)
+                i = len(pattern) if end == -1 else end
+        elif char == "(":
+            if pattern.startswith("?", i + 1):
+                # Lookarounds, named groups and flags have no literal text
+                if not pattern.startswith("?:", i + 1):
+                    return []
+                i += 2
+            groups.append(len(runs) + 1)
+        elif char == ")":
+            runs.append(current)
+            current = ""
+            start = groups.pop() if groups else 0
+            if i + 1 < len(pattern) and pattern[i + 1] in "?*{":
+                # The whole group is optional
+                del runs[start:]
+        elif char == "[":
+            # Skip the whole character class
+            end = pattern.find("]", i + 2)
+            i = len(pattern) if end == -1 else end
+        if char in _REGEX_SPECIAL:
+            runs.append(current)
+            current = ""
+        else:
+            current += char
+        i += 1
+    runs.append(current)
+    return [run for run in runs if run]
+
+
+_indexes: dict[Path, SearchIndex] = {}
+_indexes_lock = threading.Lock()
+
+
+def get_search_index(root: Path) -> SearchIndex:
+    with _indexes_lock:
+        if root not in _indexes:
+            _indexes[root] = SearchIndex(root)
+        return _indexes[root]
@@ -0,0 +1,205 @@
+"""Profile a chat turn and summarize where its time went per subsystem.
+
+The turn runs on several threads: tool calls on a thread pool, their output
+pumped by reader threads. cProfile keeps a single call stack for the whole
+process since Python 3.12, so the calls of threads running concurrently are
+charged to the wrong functions. The stacks of the threads of the turn are
+sampled instead, and the samples are saved in the pstats format.
+"""
+
+import itertools
+import marshal
+import pstats
+import sys
+import threading
+import time
+from collections import Counter
+from collections.abc import Callable
+from dataclasses import dataclass, field
+from pathlib import Path
+from types import FrameType
+from typing import Any
+
+from llm_chat_term import db
+
+TOP_FUNCTIONS = 5
+# Seconds between two samples of the thread stacks
+SAMPLE_INTERVAL = 0.002
+
+# Matched in order against the file (or builtin) of every profiled function
+SUBSYSTEMS: list[tuple[str, tuple[str, ...]]] = [
+    ("tools", ("llm_chat_term/llm/tools/",)),
+    ("llm_client", ("llm_chat_term/llm/",)),
+    (
+        "ui",
+        (
+            "llm_chat_term/ui/",
+            "/rich/",
+            "/prompt_toolkit/",
+            "/pygments/",
+            "/markdown_it/",
+        ),
+    ),
+    ("db", ("llm_chat_term/db.py", "llm_chat_term/branches.py")),
+    (
+        "network",
+        ("/httpx/", "/httpcore/", "/h11/", "/ssl.py", "/socket.py", "_ssl.", "socket"),
+    ),
+    ("langchain", ("/langchain", "/anthropic/", "/openai/", "/google/", "/pydantic")),
+]
+
+
+@dataclass
+class SubsystemStats:
+    name: str
+    # Time spent in the functions of the subsystem themselves
+    self_time: float = 0.0
+    functions: list[tuple[float, int, str]] = field(default_factory=list)
+
+
+def get_subsystem(file_name: str) -> str:
+    file_name = file_name.replace("\\", "/")
+    for name, patterns in SUBSYSTEMS:
+        if any(pattern in file_name for pattern in patterns):
+            return name
+    return "other"
+
+
+# (file name, first line, function name), as pstats keys functions
+FunctionKey = tuple[str, int, str]
+
+
+def _get_stack(frame: FrameType | None) -> tuple[FunctionKey, ...]:
+    """The functions of a stack, innermost first."""
+    stack: list[FunctionKey] = []
+    while frame is not None:
+        code = frame.f_code
+        stack.append((code.co_filename, code.co_firstlineno, code.co_name))
+        frame = frame.f_back
+    return tuple(stack)
+
+
+class StackSampler:
+    """Sample the stacks of a thread and of the threads it starts.
+
+    Threads that were already running (e.g. the titler) are left out, they
+    would only add their idle time. Each sample is weighted with the time
+    since the previous one. The stats have the layout of cProfile's, the
+    call counts are the number of samples.
+    """
+
+    def __init__(self):
+        self.stats: dict[FunctionKey, tuple[Any, ...]] = {}
+        # Seconds and number of samples per stack
+        self._samples: Counter[tuple[FunctionKey, ...]] = Counter()
+        self._counts: Counter[tuple[FunctionKey, ...]] = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._ignored: set[int] = set()
+
+    def start(self) -> None:
+        current = threading.get_ident()
+        self._ignored = {
+            thread.ident
+            for thread in threading.enumerate()
+            if thread.ident is not None and thread.ident != current
+        }
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self) -> None:
+        self._ignored.add(threading.get_ident())
+        last = time.perf_counter()
+        while not self._stop.wait(SAMPLE_INTERVAL):
+            now = time.perf_counter()
+            weight = now - last
+            last = now
+            for thread_id, frame in sys._current_frames().items():  # noqa: SLF001
+                if thread_id not in self._ignored:
+                    stack = _get_stack(frame)
+                    self._samples[stack] += weight
+                    self._counts[stack] += 1
+
+    def create_stats(self) -> None:
+        """Build the stats, {function: (calls, calls, self, cumulative, callers)}."""
+        self_time: Counter[FunctionKey] = Counter()
+        cumulative: Counter[FunctionKey] = Counter()
+        samples: Counter[FunctionKey] = Counter()
+        callers: dict[FunctionKey, Counter[FunctionKey]] = {}
+        for stack, weight in self._samples.items():
+            self_time[stack[0]] += weight
+            # Recursive functions count once per sample
+            for function in set(stack):
+                cumulative[function] += weight
+                samples[function] += self._counts[stack]
+            for callee, caller in set(itertools.pairwise(stack)):
+                callers.setdefault(callee, Counter())[caller] += weight
+        self.stats = {
+            function: (
+                samples[function],
+                samples[function],
+                self_time[function],
+                cumulative[function],
+                {
+                    caller: (1, 1, weight, weight)
+                    for caller, weight in callers.get(function, Counter()).items()
+                },
+            )
+            for function in cumulative
+        }
+
+    def dump_stats(self, path: Path) -> None:
+        self.create_stats()
+        with path.open("wb") as f:
+            marshal.dump(self.stats, f)
+
+
+def summarize(stats: pstats.Stats) -> list[SubsystemStats]:
+    """Self time per subsystem, with its hottest functions, slowest first."""
+    subsystems: dict[str, SubsystemStats] = {}
+    raw_stats = stats.stats  # pyright: ignore[reportAttributeAccessIssue, reportUnknownMemberType, reportUnknownVariableType]
+    for (file_name, line, function), entry in raw_stats.items():  # pyright: ignore[reportUnknownVariableType]
+        _, ncalls, tottime, _, _ = entry  # pyright: ignore[reportUnknownVariableType]
+        # Builtins have no file, their name tells where they belong
+        location = function if file_name == "~" else file_name
+        subsystem = get_subsystem(str(location))
+        group = subsystems.setdefault(subsystem, SubsystemStats(subsystem))
+        group.self_time += tottime
+        label = (
+            function
+            if file_name == "~"
+            else f"{Path(file_name).name}:{line}({function})"
+        )
+        group.functions.append((tottime, ncalls, label))
+
+    for group in subsystems.values():
+        group.functions.sort(reverse=True)
+        del group.functions[TOP_FUNCTIONS:]
+    return sorted(subsystems.values(), key=lambda group: group.self_time, reverse=True)
+
+
+def get_profiles_dir() -> Path:
+    profiles_dir = db.get_data_dir() / "profiles"
+    profiles_dir.mkdir(parents=True, exist_ok=True)
+    return profiles_dir
+
+
+def profile_call(func: Callable[[], None]) -> tuple[Path, float, list[SubsystemStats]]:
+    """Run func sampling its threads, saving the stats to the profiles dir.
+
+    Returns the pstats file, the wall-clock time and the summary.
+    """
+    sampler = StackSampler()
+    start = time.perf_counter()
+    sampler.start()
+    try:
+        func()
+    finally:
+        sampler.stop()
+        elapsed = time.perf_counter() - start
+        path = get_profiles_dir() / f"turn-{time.strftime('%Y%m%d-%H%M%S')}.pstats"
+        sampler.dump_stats(path)
+    return path, elapsed, summarize(pstats.Stats(sampler))
@@ -8,11 +8,11 @@ from llm_chat_term.ui.prompt_menu import Menu
 
 
 def handle_delete(event: KeyPressEvent, menu: Menu):
-    if menu.selected_index == 0:
+    index = menu.selected_index
+    if index == 0:
         return
-    utils.delete_chat(menu.items[menu.selected_index])
-    menu.items.pop(menu.selected_index)
-    menu.selected_index = menu.selected_index - 1
+    utils.delete_chat(menu.items[index])
+    menu.remove_item(index)
     event.app.invalidate()
 
 
@@ -21,6 +21,34 @@ def handle_edit(event: KeyPressEvent, menu: Menu):
     event.app.invalidate()
 
 
+PREVIEW_MAX_LINES = 8
+
+
+def _snippet(text: str) -> str:
+    lines = text.splitlines()[:PREVIEW_MAX_LINES]
+    return "\n".join(line[:200] for line in lines)
+
+
+def get_preview_text(chat_id: str) -> list[tuple[str, str]]:
+    preview = db.get_chat_preview(chat_id)
+    if preview is None:
+        return []
+
+    details = f"{preview.message_count} messages"
+    if preview.model:
+        details += f" · {preview.model}"
+    if preview.tags:
+        details += " · " + ", ".join(f"#{tag}" for tag in preview.tags)
+    return [
+        ("bold", f" {preview.title or chat_id}\n"),
+        ("ansibrightblack", f" {details}\n\n"),
+        ("blue", " First question:\n"),
+        ("", f"{_snippet(preview.first_user_message)}\n\n"),
+        ("green", " Last answer:\n"),
+        ("", f"{_snippet(preview.last_assistant_message)}\n"),
+    ]
+
+
 def select_chat() -> str:
     all_chats = db.list_all_chats()
     if len(all_chats) == 0:
@@ -30,7 +58,12 @@ def select_chat() -> str:
 
     menu = Menu(
         chats,
-        " Select a chat (j/k to move, Enter to select, e to edit, d to delete, q to quit):\n",
+        (
+            " Select a chat (j/k to move, / to filter, Enter to select, "
+            "e to edit, d to delete, q to quit):\n"
+        ),
+        # Nothing to preview for "Create new chat"
+        preview=lambda index: get_preview_text(chats[index]) if index > 0 else [],
     )
 
     menu.add_binding("e", handle_edit)
@@ -72,7 +105,8 @@ def create_new_chat(*, allow_blank: bool = True) -> str:
 
         if chat_id:
             file_path = db.get_chat_file(chat_id)
-            if file_path.exists():
+            # Archived chats have no file until they are opened
+            if db.chat_exists(chat_id):
                 console.print(
                     (
                         f"[red]Chat [bold]{chat_id}[/bold] "
@@ -1,5 +1,7 @@
 """Terminal UI for the LLM chatbot using prompt_toolkit and rich."""
 
+import threading
+from pathlib import Path
 from typing import cast, override
 
 from langchain_core.messages import AIMessage, BaseMessage, HumanMessage
@@ -13,13 +15,26 @@ from rich.rule import Rule
 from rich.syntax import Syntax
 from rich.text import Text
 
+from llm_chat_term import db
 from llm_chat_term.config import config
 from llm_chat_term.llm.models import ModelConfig
+from llm_chat_term.profiling import SubsystemStats
 from llm_chat_term.ui.audio_device_selector import select_audio_device
 from llm_chat_term.ui.chat_selector import create_new_chat, select_chat
 from llm_chat_term.ui.confirm_prompt import confirm_prompt
 from llm_chat_term.ui.help import print_help
 from llm_chat_term.ui.model_selector import select_model
+from llm_chat_term.usage import UsageTotals
+
+# Lines of the thinking kept on screen while it streams
+THINKING_TAIL_LINES = 4
+
+
+def _format_tokens(tokens: int) -> str:
+    for size, suffix in ((1_000_000, "M"), (1000, "k")):
+        if tokens >= size:
+            return f"{tokens / size:.1f}{suffix}"
+    return str(tokens)
 
 
 class CodeBlockNoPadding(CodeBlock):
@@ -64,7 +79,12 @@ class ChatUI:
         # Track whether we're in a thinking block
         self.thinking = False
         self.current_response = ""
+        # Thinking of the current response, kept apart from the answer
+        self.current_thinking = ""
         self.live = Live(refresh_per_second=10.0)
+        # Partial last lines of the live tool output, per output pump thread
+        self.tool_output: dict[int, str] = {}
+        self.tool_output_lock = threading.Lock()
 
     def _get_ai_title(self):
         content = Text(
@@ -131,8 +151,74 @@ class ChatUI:
             style=f"bold {config.colors.system}",
         )
 
+    def display_profile(
+        self, path: Path, elapsed: float, subsystems: list[SubsystemStats]
+    ):
+        style = f"bold {config.colors.system}"
+        self.console.print(
+            f"Turn took {elapsed:.2f}s, profile saved to {path}", style=style
+        )
+        self.console.print(
+            f"Inspect it with: python -m pstats {path}", style=config.colors.system
+        )
+        for subsystem in subsystems:
+            self.console.print(
+                f"{subsystem.name:<12} {subsystem.self_time:>8.3f}s", style=style
+            )
+            for tottime, ncalls, label in subsystem.functions:
+                self.console.print(
+                    f"    {tottime:>8.3f}s {ncalls:>8} {label}",
+                    style=config.colors.system,
+                )
+        self.console.print()
+
+    def display_usage(
+        self,
+        chat_totals: UsageTotals | None,
+        models: list[UsageTotals],
+        top_chats: list[UsageTotals],
+    ):
+        style = f"bold {config.colors.system}"
+        header = (
+            f"{'calls':>6} {'input':>8} {'cached':>8} {'output':>8} "
+            f"{'thinking':>8} {'cost':>9} {'per call':>8}"
+        )
+
+        def row(totals: UsageTotals) -> str:
+            cost = "n/a" if totals.cost is None else f"${totals.cost:.4f}"
+            return (
+                f"{totals.calls:>6} {_format_tokens(totals.input_tokens):>8} "
+                f"{_format_tokens(totals.cached_tokens):>8} "
+                f"{_format_tokens(totals.output_tokens):>8} "
+                f"{_format_tokens(totals.thinking_tokens):>8} "
+                f"{cost:>9} {totals.latency / totals.calls:>7.1f}s  "
+                f"{totals.name or 'Anonymous chat'}"
+            )
+
+        self.console.print(header, style=style)
+        if chat_totals is not None:
+            self.console.print("This chat", style=style)
+            self.console.print(row(chat_totals), style=config.colors.system)
+        for title, rows in (("Per model", models), ("Top chats", top_chats)):
+            if rows:
+                self.console.print(title, style=style)
+            for totals in rows:
+                self.console.print(row(totals), style=config.colors.system)
+        self.console.print()
+
+    def display_thinking(self, thinking: str):
+        if not thinking:
+            self.console.print(
+                "No thinking saved for this chat", style=f"bold {config.colors.system}"
+            )
+            return
+        self.console.print(Text(thinking, style="dim italic"))
+        self.console.print()
+
     def display_loader(self):
-        self.console.print("[yellow]Contemplating...[/yellow]")
+        self.console.print(
+            "[yellow]Contemplating...[/yellow] [dim](Ctrl+C to stop)[/dim]"
+        )
 
     @staticmethod
     def create_new_chat(*, allow_blank: bool = False):
@@ -190,35 +276,73 @@ class ChatUI:
             message.content = cast("str", message.content)
             if isinstance(message, HumanMessage):
                 self.console.print(self._get_user_title())
+                # Embedded files are only described, they are not read
                 self.console.print(
-                    f"[{config.colors.user}]{config.ui.prompt_symbol}[/] {message.content}"
+                    f"[{config.colors.user}]{config.ui.prompt_symbol}[/] "
+                    f"{db.describe_blobs(message.content)}"
                 )
             elif isinstance(message, AIMessage):
                 self.console.print(self._get_ai_title())
-                self.console.print(self._get_markdown(message.content))
+                if message.response_metadata.get("thinking"):
+                    self.console.print(self._get_thinking_note())
+                # Long answers are stored as a blob, they are shown in full
+                self.console.print(self._get_markdown(db.expand_blobs(message.content)))
                 self.console.print()
             else:
                 continue
 
+    def _get_thinking_note(self) -> Text:
+        return Text("Thinking hidden, :thinking to show it", style="dim")
+
     def _update_live(self):
         text = self._get_markdown(self.current_response)
 
-        content = Group(self._get_ai_title(), text)
+        if self.current_thinking:
+            content = Group(self._get_ai_title(), self._get_thinking_note(), text)
+        else:
+            content = Group(self._get_ai_title(), text)
         self.live.update(content, refresh=True)
 
+    def _update_thinking(self):
+        """Show the last lines of the thinking as plain text.
+
+        Only the tail that fits in those lines is wrapped, the cost of a
+        repaint doesn't grow with the length of the thinking.
+        """
+        width = self.console.width
+        tail = Text(
+            self.current_thinking[-THINKING_TAIL_LINES * width :], style="dim italic"
+        )
+        lines = tail.wrap(self.console, width)[-THINKING_TAIL_LINES:]
+        header = Text(
+            f"Thinking... ({len(self.current_thinking)} characters)",
+            style=config.colors.system,
+        )
+        self.live.update(Group(self._get_ai_title(), header, *lines), refresh=True)
+
     def stream_token(self, token: str, chunk_type: str):
         """Display a streaming token from the assistant."""
+        if chunk_type == "tool_output":
+            # Live output of a running tool, printed outside the response
+            self._write_tool_output(token)
+            return
+        self._flush_tool_output()
+        if chunk_type == "status":
+            # Progress outside the response, e.g. waiting for a rate limit
+            self.console.print(Text(token, style=config.colors.system))
+            return
         if not self.streaming:
             self.console.clear()
             self.live.start()
             self.streaming = True
-        if chunk_type == "thinking" and not self.thinking:
+        if chunk_type == "thinking":
             self.thinking = True
-            self.current_response += "\\<think>\n"
-        elif chunk_type == "text" and self.thinking:
-            # Here starts the actual response, clear the thinking part
+            self.current_thinking += token
+            self._update_thinking()
+            return
+        if chunk_type == "text" and self.thinking:
+            # Here starts the actual response, the thinking is put away
             self.thinking = False
-            self.current_response = ""
         elif chunk_type == "prompt_tool" and self.streaming:
             self.live.stop()
             self.streaming = False
@@ -226,10 +350,36 @@ class ChatUI:
         self.current_response += token
         self._update_live()
 
+    def _write_tool_output(self, token: str):
+        """Print the complete lines of a tool's output.
+
+        Called from the output pump threads of tools running in parallel, the
+        lines of each are kept whole and printed one thread at a time.
+        """
+        with self.tool_output_lock:
+            thread_id = threading.get_ident()
+            lines, newline, rest = (
+                self.tool_output.pop(thread_id, "") + token
+            ).rpartition("\n")
+            if rest:
+                self.tool_output[thread_id] = rest
+            if newline:
+                self.console.print(Text(lines + newline, style="dim"), end="")
+
+    def _flush_tool_output(self):
+        """Print the last lines of the tools that didn't end with a newline."""
+        with self.tool_output_lock:
+            for rest in self.tool_output.values():
+                self.console.print(Text(rest, style="dim"))
+            self.tool_output.clear()
+
     def end_streaming(self):
         """End the streaming response and print a newline."""
+        self._flush_tool_output()
         if self.streaming:
             self.live.stop()
             self.console.print()
             self.streaming = False
             self.current_response = ""
+            self.current_thinking = ""
+            self.thinking = False
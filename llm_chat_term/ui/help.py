@@ -24,6 +24,30 @@ COMMANDS: dict[str, list[str]] = {
     ":agent {on|off}": [
         "Enables/disables agent mode. Agent mode has access to tools that can",
         "affect your filesystem, use git etc.",
+        "Read-only tools in the agent.auto_approve config run without confirmation.",
+    ],
+    ":fork {name} [n]": [
+        "Fork the chat to a new branch, leaving out its last n messages.",
+        "Branches share their common messages on disk.",
+    ],
+    ":branch [name]": [
+        "List the branches of the chat, or switch to another branch."
+    ],
+    ":archive [days]": [
+        "Compress the chats untouched for days (30 by default) into the archive.",
+        "Archived chats are still listed and are restored when opened.",
+    ],
+    ":gc": [
+        "Delete the stored :read/:web contents that no chat references anymore,",
+        "and the branch messages of deleted chats and branches.",
+    ],
+    ":profile": [
+        "Profile the next turn, the stats are saved in the data dir and the",
+        "hottest functions are shown per subsystem (llm_client, ui, db, tools...).",
+    ],
+    ":usage": [
+        "Show the tokens, cost and latency of this chat, per model and of the",
+        "chats that cost the most. Every LLM call is recorded in the data dir.",
     ],
     ":redraw": [
         "Redraw the whole conversation."
@@ -31,6 +55,10 @@ COMMANDS: dict[str, list[str]] = {
     ":think {prompt}": [
         "Enable thinking mode only for this question (Claude only)."
     ],
+    ":thinking": [
+        "Show the full thinking of the last answer, while it streams only its",
+        "last lines are shown. Set llm.save_thinking to keep it in the chat file.",
+    ],
     ":read {path}": [
         "Embed a text file in the prompt (replaces the line with :read)."
     ],
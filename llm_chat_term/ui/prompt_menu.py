@@ -1,40 +1,176 @@
+import shutil
 import sys
 from collections.abc import Callable
 
 from prompt_toolkit import Application
+from prompt_toolkit.filters import Condition
 from prompt_toolkit.key_binding import KeyBindings, KeyPressEvent
-from prompt_toolkit.layout import FormattedTextControl, HSplit, Layout, Window
+from prompt_toolkit.keys import Keys
+from prompt_toolkit.layout import (
+    Dimension,
+    FormattedTextControl,
+    HSplit,
+    Layout,
+    VSplit,
+    Window,
+)
+
+PreviewCallback = Callable[[int], list[tuple[str, str]]]
+
+# Lines kept free around the items: the title, the filter line and the prompt
+RESERVED_LINES = 4
 
 
 class Menu:
-    def __init__(self, items: list[str], title: str, *, can_quit: bool = True):
+    """A picker with j/k navigation and "/" to fuzzy filter the items.
+
+    Filtering is incremental, every matching item keeps the position where its
+    match of the query ended. Typing a character only continues from there for
+    the items that matched the shorter query, and backspace pops back to the
+    previous result, so a keypress never rescans the full list.
+    """
+
+    def __init__(
+        self,
+        items: list[str],
+        title: str,
+        *,
+        can_quit: bool = True,
+        preview: PreviewCallback | None = None,
+    ):
         self.items = items
         self.title = title
         self.can_quit = can_quit
-        self.selected_index = 0
+        # Renders a pane next to the items for the highlighted item index
+        self.preview = preview
+        self.query = ""
+        self.filtering = False
+        # (item index, end of the match) per query length, the last is shown
+        self._matches: list[list[tuple[int, int]]] = [self._all_matches()]
+        self._lowered: list[str] | None = None
+        self.cursor = 0
+        self.scroll_offset = 0
         self.result = 0
         self.kb = KeyBindings()
         self._setup_default_bindings()
 
+    @property
+    def matches(self) -> list[tuple[int, int]]:
+        return self._matches[-1]
+
+    @property
+    def selected_index(self) -> int:
+        """The index in items of the highlighted item, -1 if nothing matches."""
+        if not self.matches:
+            return -1
+        return self.matches[self.cursor][0]
+
+    def _all_matches(self) -> list[tuple[int, int]]:
+        return [(i, 0) for i in range(len(self.items))]
+
+    def _get_lowered(self) -> list[str]:
+        if self._lowered is None:
+            self._lowered = [item.lower() for item in self.items]
+        return self._lowered
+
+    def _push_char(self, char: str):
+        lowered = self._get_lowered()
+        char = char.lower()
+        narrowed: list[tuple[int, int]] = []
+        for item_index, end in self.matches:
+            found = lowered[item_index].find(char, end)
+            if found != -1:
+                narrowed.append((item_index, found + 1))
+        self.query += char
+        self._matches.append(narrowed)
+        self.cursor = 0
+
+    def _pop_char(self):
+        if not self.query:
+            return
+        self.query = self.query[:-1]
+        self._matches.pop()
+        self.cursor = 0
+
+    def _refilter(self):
+        query = self.query
+        self.query = ""
+        self._matches = [self._all_matches()]
+        for char in query:
+            self._push_char(char)
+
+    def remove_item(self, index: int):
+        """Remove an item, keeping the filter and the highlighted position."""
+        cursor = self.cursor
+        self.items.pop(index)
+        self._lowered = None
+        self._refilter()
+        self.cursor = min(cursor, max(len(self.matches) - 1, 0))
+
+    def _move(self, step: int):
+        if self.matches:
+            self.cursor = (self.cursor + step) % len(self.matches)
+
     def _setup_default_bindings(self):
-        @self.kb.add("j")
+        filtering = Condition(lambda: self.filtering)
+
+        @self.kb.add("j", filter=~filtering)
         @self.kb.add("down")
         def _(event: KeyPressEvent):
-            self.selected_index = (self.selected_index + 1) % len(self.items)
+            self._move(1)
             event.app.invalidate()
 
-        @self.kb.add("k")
+        @self.kb.add("k", filter=~filtering)
         @self.kb.add("up")
         def _(event: KeyPressEvent):
-            self.selected_index = (self.selected_index - 1) % len(self.items)
+            self._move(-1)
+            event.app.invalidate()
+
+        @self.kb.add("pagedown")
+        def _(event: KeyPressEvent):
+            self.cursor = min(
+                self.cursor + self._visible_count(), len(self.matches) - 1
+            )
+            self.cursor = max(self.cursor, 0)
+            event.app.invalidate()
+
+        @self.kb.add("pageup")
+        def _(event: KeyPressEvent):
+            self.cursor = max(self.cursor - self._visible_count(), 0)
             event.app.invalidate()
 
         @self.kb.add("enter")
         def _(event: KeyPressEvent):
+            if not self.matches:
+                return
             self.result = self.selected_index
             event.app.exit()
 
-        @self.kb.add("q")
+        @self.kb.add("/", filter=~filtering)
+        def _(event: KeyPressEvent):
+            self.filtering = True
+            event.app.invalidate()
+
+        @self.kb.add(Keys.Any, filter=filtering)
+        def _(event: KeyPressEvent):
+            char = event.data
+            if len(char) == 1 and char.isprintable():
+                self._push_char(char)
+                event.app.invalidate()
+
+        @self.kb.add("backspace", filter=filtering)
+        def _(event: KeyPressEvent):
+            self._pop_char()
+            event.app.invalidate()
+
+        @self.kb.add("escape", filter=filtering)
+        def _(event: KeyPressEvent):
+            self.filtering = False
+            while self.query:
+                self._pop_char()
+            event.app.invalidate()
+
+        @self.kb.add("q", filter=~filtering)
         @self.kb.add("c-c")
         def _(event: KeyPressEvent):
             if not self.can_quit:
@@ -43,14 +179,33 @@ class Menu:
             sys.exit(1)
 
     def add_binding(self, key: str, handler: Callable[[KeyPressEvent, "Menu"], None]):
-        # Wrapper to add custom bindings
-        @self.kb.add(key)
+        # Wrapper to add custom bindings, typing a filter takes precedence
+        @self.kb.add(key, filter=Condition(lambda: not self.filtering))
         def _(event: KeyPressEvent):
-            handler(event, self)
+            if self.matches:
+                handler(event, self)
 
     def run(self) -> int:
         # Create the layout
-        layout = Layout(HSplit([Window(FormattedTextControl(self._get_menu_text))]))
+        menu_window = Window(FormattedTextControl(self._get_menu_text))
+        if self.preview is None:
+            layout = Layout(HSplit([menu_window]))
+        else:
+            preview = self.preview
+            preview_window = Window(
+                FormattedTextControl(lambda: preview(self.selected_index)),
+                wrap_lines=True,
+                height=Dimension(max=self._visible_count()),
+            )
+            layout = Layout(
+                VSplit(
+                    [
+                        menu_window,
+                        Window(width=1, char="│", style="ansibrightblack"),
+                        preview_window,
+                    ]
+                )
+            )
 
         # Create and run the application
         app = Application(  # pyright: ignore[reportUnknownVariableType]
@@ -63,6 +218,11 @@ class Menu:
 
         return self.result
 
+    def _visible_count(self) -> int:
+        title_lines = self.title.count("\n") + 1
+        rows = shutil.get_terminal_size().lines
+        return max(rows - title_lines - RESERVED_LINES, 1)
+
     def _get_menu_text(self) -> list[tuple[str, str]]:
         result: list[tuple[str, str]] = []
         result.append(
@@ -71,11 +231,31 @@ class Menu:
                 self.title,
             )
         )
+        if self.filtering:
+            result.append(
+                ("bold", f" /{self.query}  ({len(self.matches)}/{len(self.items)})\n")
+            )
 
-        for i, item in enumerate(self.items):
-            if i == self.selected_index:
+        # Only the window of items around the cursor is rendered
+        visible = self._visible_count()
+        if self.cursor < self.scroll_offset:
+            self.scroll_offset = self.cursor
+        elif self.cursor >= self.scroll_offset + visible:
+            self.scroll_offset = self.cursor - visible + 1
+        self.scroll_offset = min(
+            self.scroll_offset, max(len(self.matches) - visible, 0)
+        )
+
+        window = self.matches[self.scroll_offset : self.scroll_offset + visible]
+        for position, (item_index, _) in enumerate(window, self.scroll_offset):
+            item = self.items[item_index]
+            if position == self.cursor:
                 result.append(("green", f" > {item}\n"))
             else:
                 result.append(("", f"   {item}\n"))
 
+        hidden = len(self.matches) - len(window)
+        if hidden > 0:
+            result.append(("ansibrightblack", f"   ({hidden} more)\n"))
+
         return result
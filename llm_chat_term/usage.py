@@ -0,0 +1,231 @@
+"""Ledger of the token usage, cost and latency of every LLM call.
+
+Calls are appended to a SQLite table. Every insert also updates per-chat and
+per-model rollup rows in the same transaction, so the reports read a few
+indexed rows and never rescan the ledger. The cost of calls to models without
+prices is NULL, the rollups only add up the known costs.
+"""
+
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass
+from functools import cache
+
+from llm_chat_term import db
+from llm_chat_term.config import ModelConfig
+
+# Seconds a writer waits for another process holding the database
+BUSY_TIMEOUT_SECONDS = 10.0
+
+_ROLLUP_COLUMNS = """
+    calls INTEGER NOT NULL DEFAULT 0,
+    input_tokens INTEGER NOT NULL DEFAULT 0,
+    output_tokens INTEGER NOT NULL DEFAULT 0,
+    cached_tokens INTEGER NOT NULL DEFAULT 0,
+    thinking_tokens INTEGER NOT NULL DEFAULT 0,
+    cost REAL,
+    latency REAL NOT NULL DEFAULT 0,
+    last_time REAL NOT NULL DEFAULT 0
+"""
+
+SCHEMA = f"""
+CREATE TABLE IF NOT EXISTS calls (
+    id INTEGER PRIMARY KEY,
+    time REAL NOT NULL,
+    chat_id TEXT NOT NULL,
+    provider TEXT NOT NULL,
+    model TEXT NOT NULL,
+    input_tokens INTEGER NOT NULL,
+    output_tokens INTEGER NOT NULL,
+    cached_tokens INTEGER NOT NULL,
+    thinking_tokens INTEGER NOT NULL,
+    cost REAL,
+    latency REAL NOT NULL,
+    first_token_latency REAL,
+    estimated INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS calls_chat_id ON calls (chat_id, time);
+CREATE TABLE IF NOT EXISTS chat_usage (
+    chat_id TEXT PRIMARY KEY,
+    {_ROLLUP_COLUMNS}
+);
+CREATE TABLE IF NOT EXISTS model_usage (
+    provider TEXT NOT NULL,
+    model TEXT NOT NULL,
+    {_ROLLUP_COLUMNS},
+    PRIMARY KEY (provider, model)
+);
+"""
+
+_ROLLUP_UPDATE = """
+    calls = calls + 1,
+    input_tokens = input_tokens + excluded.input_tokens,
+    output_tokens = output_tokens + excluded.output_tokens,
+    cached_tokens = cached_tokens + excluded.cached_tokens,
+    thinking_tokens = thinking_tokens + excluded.thinking_tokens,
+    cost = CASE WHEN excluded.cost IS NULL THEN cost
+        ELSE coalesce(cost, 0) + excluded.cost END,
+    latency = latency + excluded.latency,
+    last_time = excluded.last_time
+"""
+
+
+@dataclass
+class CallUsage:
+    input_tokens: int = 0
+    output_tokens: int = 0
+    # Input tokens read from the provider's prompt cache
+    cached_tokens: int = 0
+    # Output tokens spent thinking, part of output_tokens
+    thinking_tokens: int = 0
+    # Seconds until the response was complete and until its first chunk
+    latency: float = 0.0
+    first_token_latency: float | None = None
+    # The provider reported no usage, the tokens are estimated from the text
+    estimated: bool = False
+
+    @property
+    def total_tokens(self) -> int:
+        return self.input_tokens + self.output_tokens
+
+
+@dataclass
+class UsageTotals:
+    # The chat id, or the model as "provider/name"
+    name: str
+    calls: int
+    input_tokens: int
+    output_tokens: int
+    cached_tokens: int
+    thinking_tokens: int
+    # None if none of the calls had known prices
+    cost: float | None
+    latency: float
+    last_time: float
+
+
+_lock = threading.Lock()
+
+
+@cache
+def _get_connection() -> sqlite3.Connection:
+    # Shared by the chat and the background threads, under _lock
+    connection = sqlite3.connect(
+        db.get_data_dir() / "usage.sqlite3",
+        timeout=BUSY_TIMEOUT_SECONDS,
+        check_same_thread=False,
+        isolation_level=None,
+    )
+    # Other terminals keep reading while one of them writes
+    connection.execute("PRAGMA journal_mode=WAL")
+    connection.executescript(SCHEMA)
+    return connection
+
+
+def record_call(chat_id: str, model: ModelConfig, usage: CallUsage) -> None:
+    """Append a call to the ledger and add it to the rollups."""
+    cost = model.estimate_cost(
+        usage.input_tokens, usage.output_tokens, usage.cached_tokens
+    )
+    now = time.time()
+    totals = (
+        usage.input_tokens,
+        usage.output_tokens,
+        usage.cached_tokens,
+        usage.thinking_tokens,
+        cost,
+        usage.latency,
+        now,
+    )
+    columns = (
+        "input_tokens, output_tokens, cached_tokens, thinking_tokens, cost, "
+        "latency, last_time"
+    )
+    with _lock:
+        connection = _get_connection()
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            connection.execute(
+                "INSERT INTO calls (time, chat_id, provider, model, input_tokens, "
+                "output_tokens, cached_tokens, thinking_tokens, cost, latency, "
+                "first_token_latency, estimated) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (
+                    now,
+                    chat_id,
+                    model.provider,
+                    model.name,
+                    usage.input_tokens,
+                    usage.output_tokens,
+                    usage.cached_tokens,
+                    usage.thinking_tokens,
+                    cost,
+                    usage.latency,
+                    usage.first_token_latency,
+                    usage.estimated,
+                ),
+            )
+            connection.execute(
+                f"INSERT INTO chat_usage (chat_id, calls, {columns}) "  # noqa: S608
+                "VALUES (?, 1, ?, ?, ?, ?, ?, ?, ?) "
+                f"ON CONFLICT (chat_id) DO UPDATE SET {_ROLLUP_UPDATE}",
+                (chat_id, *totals),
+            )
+            connection.execute(
+                f"INSERT INTO model_usage (provider, model, calls, {columns}) "  # noqa: S608
+                "VALUES (?, ?, 1, ?, ?, ?, ?, ?, ?, ?) "
+                f"ON CONFLICT (provider, model) DO UPDATE SET {_ROLLUP_UPDATE}",
+                (model.provider, model.name, *totals),
+            )
+        except BaseException:
+            connection.execute("ROLLBACK")
+            raise
+        connection.execute("COMMIT")
+
+
+_TOTALS_COLUMNS = (
+    "calls, input_tokens, output_tokens, cached_tokens, thinking_tokens, cost, "
+    "latency, last_time"
+)
+
+
+def get_chat_usage(chat_id: str) -> UsageTotals | None:
+    with _lock:
+        row = (
+            _get_connection()
+            .execute(
+                f"SELECT chat_id, {_TOTALS_COLUMNS} FROM chat_usage WHERE chat_id = ?",  # noqa: S608
+                (chat_id,),
+            )
+            .fetchone()
+        )
+    return UsageTotals(*row) if row else None
+
+
+def get_top_chats(limit: int = 10) -> list[UsageTotals]:
+    """The chats that cost the most, then used the most tokens."""
+    with _lock:
+        rows = (
+            _get_connection()
+            .execute(
+                f"SELECT chat_id, {_TOTALS_COLUMNS} FROM chat_usage "  # noqa: S608
+                "ORDER BY cost DESC, input_tokens + output_tokens DESC LIMIT ?",
+                (limit,),
+            )
+            .fetchall()
+        )
+    return [UsageTotals(*row) for row in rows]
+
+
+def get_model_usage() -> list[UsageTotals]:
+    with _lock:
+        rows = (
+            _get_connection()
+            .execute(
+                f"SELECT provider || '/' || model, {_TOTALS_COLUMNS} "  # noqa: S608
+                "FROM model_usage ORDER BY cost DESC, calls DESC"
+            )
+            .fetchall()
+        )
+    return [UsageTotals(*row) for row in rows]
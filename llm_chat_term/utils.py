@@ -1,13 +1,19 @@
 import os
+import shutil
 import subprocess
 
 from pydantic import SecretStr
 
-from llm_chat_term import db
+from llm_chat_term import branches, db
 from llm_chat_term.config import config
 
+# Providers that need no API key, endpoints have theirs in their config
+KEYLESS_PROVIDERS = {"local-fake", "openai-compatible"}
+
 
 def get_api_key(provider: str) -> SecretStr:
+    if provider in KEYLESS_PROVIDERS:
+        return SecretStr("")
     api_key: SecretStr = next(
         (x.api_key for x in config.llm.api_keys if x.provider == provider),
         SecretStr(""),
@@ -26,11 +32,14 @@ def get_api_key(provider: str) -> SecretStr:
 
 
 def delete_chat(chat_id: str) -> None:
-    full_path = db.get_chat_file(chat_id)
-    full_path.unlink()
+    db.delete_chat(chat_id)
+    db.delete_chat_metadata(chat_id)
+    branches.delete_branches(chat_id)
 
 
 def open_in_editor(chat_id: str):
+    # Archived chats are edited as plain files again
+    db.restore_chat(chat_id)
     full_path = db.get_chat_file(chat_id)
     editor = os.environ.get("EDITOR", "vim")
     # Assume that the user knows what EDITOR is set
@@ -38,9 +47,11 @@ def open_in_editor(chat_id: str):
 
 
 def has_audio_support():
+    # The recordings are encoded by ffmpeg while capturing
+    if shutil.which("ffmpeg") is None:
+        return False
     try:
         import pyaudio  # pyright: ignore[reportUnusedImport]  # noqa: F401
-        import pydub  # pyright: ignore[reportUnusedImport]  # noqa: F401
 
     except ImportError:
         return False
@@ -0,0 +1,19 @@
+from pathlib import Path
+
+import pytest
+
+from llm_chat_term import branches, db
+
+
+@pytest.fixture(autouse=True)
+def data_dir(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> Path:
+    """Keep the chats, blobs and state files of every test apart."""
+    monkeypatch.setenv("XDG_DATA_HOME", str(tmp_path / "data"))
+    # The in-process caches would outlive the data dir
+    monkeypatch.setattr(branches, "_node_cache", {})
+    monkeypatch.setattr(db, "_payload_hashes", {})
+    monkeypatch.setattr(db, "_metadata_cache", None)
+    monkeypatch.setattr(db, "_archive_index_cache", None)
+    monkeypatch.setattr(db, "_preview_cache", {})
+    db.read_blob.cache_clear()
+    return tmp_path / "data" / "llm_chat_term"
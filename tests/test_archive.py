@@ -0,0 +1,43 @@
+import os
+import time
+from pathlib import Path
+
+from llm_chat_term import db
+
+MESSAGES = [
+    {"role": "user", "content": "Hi"},
+    {"role": "ai", "content": "Hello"},
+]
+
+
+def _save_old(chat_id: str, messages: list[dict[str, str]]) -> None:
+    db.save_chat_history(chat_id, messages)
+    old = time.time() - 60 * 24 * 60 * 60
+    os.utime(db.get_chat_file(chat_id), (old, old))
+
+
+def _segments_size(data_dir: Path) -> int:
+    return sum(path.stat().st_size for path in (data_dir / "archive").glob("segment-*"))
+
+
+def test_restored_chat_is_not_archived_twice(data_dir: Path):
+    _save_old("chat", MESSAGES)
+    assert db.archive_chats(days=30)[0] == 1
+    size = _segments_size(data_dir)
+
+    assert db.load_chat_history("chat")[1:] == MESSAGES
+    assert db.get_chat_file("chat").exists()
+    assert db.archive_chats(days=30)[0] == 1
+    assert _segments_size(data_dir) == size
+    assert not db.get_chat_file("chat").exists()
+    assert db.load_chat_history("chat", restore=False)[1:] == MESSAGES
+
+
+def test_changed_chat_is_archived_again():
+    _save_old("chat", MESSAGES)
+    db.archive_chats(days=30)
+    db.restore_chat("chat")
+    changed = [*MESSAGES, {"role": "user", "content": "Bye"}]
+    _save_old("chat", changed)
+    assert db.archive_chats(days=30)[0] == 1
+    assert db.load_chat_history("chat", restore=False)[1:] == changed
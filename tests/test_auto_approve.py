@@ -0,0 +1,26 @@
+import pytest
+
+import llm_chat_term.llm.tools  # noqa: F401  # registers the tools
+from llm_chat_term.llm.tools.main import is_auto_approved
+
+ALLOWLIST = ["cat", "git status", "git diff", "git log", "git show", "search"]
+
+
+@pytest.mark.parametrize(
+    ("tool", "arguments", "approved"),
+    [
+        ("GitCommand", "diff", True),
+        ("GitCommand", "log -p -- llm_chat_term", True),
+        ("GitCommand", "show HEAD~1:README.md", True),
+        ("GitCommand", "diff --output=/tmp/patch", False),
+        ("GitCommand", "log -o patch", False),
+        ("GitCommand", "log --git-dir=/elsewhere", False),
+        ("GitCommand", "commit -m message", False),
+        ("CatFileCommand", "README.md", True),
+        ("CatFileCommand", "~/.ssh/id_rsa", False),
+        ("CatFileCommand", "../secrets", False),
+        ("CatFileCommand", "/etc/passwd", False),
+    ],
+)
+def test_auto_approve(tool: str, arguments: str, *, approved: bool):
+    assert is_auto_approved(tool, {"arguments": arguments}, ALLOWLIST) == approved
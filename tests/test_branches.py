@@ -0,0 +1,64 @@
+import os
+import time
+from pathlib import Path
+
+import pytest
+
+from llm_chat_term import branches, db
+
+QUESTION = [
+    {"role": "system", "content": "Be brief"},
+    {"role": "user", "content": "Name a color"},
+    {"role": "thinking", "content": "Any will do"},
+    {"role": "ai", "content": "Blue"},
+]
+
+
+def _save(chat_id: str, messages: list[dict[str, str]]) -> None:
+    db.save_chat_history(chat_id, messages)
+    branches.sync_branch(chat_id, messages)
+
+
+def _age_nodes(data_dir: Path) -> None:
+    # Older than the grace period of the garbage collection
+    old = time.time() - 2 * db.BLOB_GC_GRACE_SECONDS
+    for path in (data_dir / "nodes").glob("*/*"):
+        os.utime(path, (old, old))
+
+
+def test_default_branch_before_any_fork():
+    db.save_chat_history("chat", QUESTION)
+    assert branches.list_branches("chat") == ("main", ["main"])
+    assert branches.switch("chat", "main") == QUESTION
+    with pytest.raises(ValueError, match="does not exist"):
+        branches.switch("chat", "other")
+
+
+def test_fork_switch_and_gc(data_dir: Path):
+    db.save_chat_history("chat", QUESTION)
+    # Drops the answer with its thinking, and the question
+    forked = branches.fork("chat", "retry", drop=2)
+    assert forked == QUESTION[:1]
+    retry = [*forked, {"role": "user", "content": "Name a fruit"}]
+    _save("chat", retry)
+    assert branches.list_branches("chat") == ("retry", ["main", "retry"])
+
+    assert branches.switch("chat", "main") == QUESTION
+    assert branches.switch("chat", "retry") == retry
+    assert db.load_chat_history("chat")[1:] == retry
+
+    # The nodes of a deleted chat are collected, the shared ones are kept
+    _save("other", [*QUESTION[:1], {"role": "user", "content": "Bye"}])
+    branches.delete_branches("other")
+    _age_nodes(data_dir)
+    deleted, referenced = branches.gc_nodes()
+    assert deleted == 1
+    assert referenced == set()
+    assert branches.switch("chat", "main") == QUESTION
+    assert branches.switch("chat", "retry") == retry
+
+
+def test_gc_keeps_recent_nodes():
+    _save("chat", QUESTION)
+    branches.delete_branches("chat")
+    assert branches.gc_nodes()[0] == 0
@@ -0,0 +1,41 @@
+from concurrent.futures import ProcessPoolExecutor
+
+from llm_chat_term import db
+
+UPDATES = 50
+
+
+def _save_chats(terminal: int) -> None:
+    for i in range(UPDATES):
+        db.update_chat_metadata(f"chat-{terminal}", message_count=i + 1)
+        db.update_chat_metadata(f"chat-{terminal}-{i}", title=f"Title {i}")
+
+
+def test_terminals_keep_each_others_updates():
+    terminals = 4
+    with ProcessPoolExecutor(terminals) as executor:
+        list(executor.map(_save_chats, range(terminals)))
+
+    metadata = db.load_chats_metadata()
+    for terminal in range(terminals):
+        assert metadata[f"chat-{terminal}"] == {"message_count": UPDATES}
+        for i in range(UPDATES):
+            assert metadata[f"chat-{terminal}-{i}"] == {"title": f"Title {i}"}
+
+
+def test_message_count_is_kept_on_save():
+    messages = [
+        {"role": "system", "content": "Be brief"},
+        {"role": "user", "content": "Hi"},
+        {"role": "thinking", "content": "A greeting"},
+        {"role": "ai", "content": "Hello"},
+    ]
+    db.save_chat_history("chat", messages)
+    db.update_chat_metadata("chat", title="Greeting")
+    assert db.get_chat_metadata("chat") == {"message_count": 2, "title": "Greeting"}
+    preview = db.get_chat_preview("chat")
+    assert preview is not None
+    assert preview.message_count == len(messages) - 2
+
+    db.delete_chat_metadata("chat")
+    assert db.get_chat_metadata("chat") == {}
@@ -0,0 +1,105 @@
+import math
+import re
+from array import array
+
+import pytest
+
+# The audio modules need the voice extra
+pytest.importorskip("pyaudio")
+
+from llm_chat_term.audio import recorder
+from llm_chat_term.audio.speech_to_text import (
+    ChunkedTranscriber,
+    MockTranscriptionBackend,
+)
+from llm_chat_term.audio.vad import (
+    CALIBRATION_MS,
+    FRAME_MS,
+    MIN_THRESHOLD,
+    PRE_ROLL_MS,
+    SPEECH_TO_NOISE_RATIO,
+    SpeechSegmenter,
+)
+
+SAMPLE_RATE = 16000
+NOISE = 100
+SPEECH = 3000
+
+
+def _audio(level: int, ms: int) -> bytes:
+    # A constant signal, its RMS is the level
+    return array("h", [level] * (SAMPLE_RATE * ms // 1000)).tobytes()
+
+
+def _frames(pcm: bytes) -> int:
+    return len(pcm) // (SAMPLE_RATE * 2 * FRAME_MS // 1000)
+
+
+def test_threshold_is_calibrated_from_the_noise_floor():
+    segmenter = SpeechSegmenter(lambda _: None, sample_rate=SAMPLE_RATE)
+    assert segmenter.threshold == math.inf
+    segmenter.feed(_audio(NOISE, CALIBRATION_MS))
+    assert segmenter.threshold == NOISE * SPEECH_TO_NOISE_RATIO
+
+    silent = SpeechSegmenter(lambda _: None, sample_rate=SAMPLE_RATE)
+    silent.feed(_audio(0, CALIBRATION_MS))
+    assert silent.threshold == MIN_THRESHOLD
+
+
+def test_speech_is_split_on_silence():
+    segments: list[bytes] = []
+    segmenter = SpeechSegmenter(
+        segments.append, sample_rate=SAMPLE_RATE, min_silence_ms=700
+    )
+    segmenter.feed(_audio(NOISE, 1000))
+    segmenter.feed(_audio(SPEECH, 400))
+    segmenter.feed(_audio(NOISE, 1000))
+    segmenter.feed(_audio(SPEECH, 200))
+    segmenter.feed(_audio(NOISE, 300))
+    segmenter.flush()
+
+    pre_roll = PRE_ROLL_MS // FRAME_MS
+    assert [_frames(segment) for segment in segments] == [
+        # The pre-roll, the speech and the silence that ended it
+        pre_roll + 400 // FRAME_MS + 700 // FRAME_MS,
+        # Cut short by the end of the capture
+        pre_roll + 200 // FRAME_MS + 300 // FRAME_MS,
+    ]
+    first = segments[0]
+    speech_start = pre_roll * SAMPLE_RATE * 2 * FRAME_MS // 1000
+    assert first[:speech_start] == _audio(NOISE, PRE_ROLL_MS)
+    assert first[speech_start:].startswith(_audio(SPEECH, 400))
+
+
+def test_no_segment_without_speech():
+    segments: list[bytes] = []
+    segmenter = SpeechSegmenter(segments.append, sample_rate=SAMPLE_RATE)
+    segmenter.feed(_audio(NOISE, 3000))
+    segmenter.flush()
+    assert segments == []
+
+
+def test_transcriptions_are_joined_in_segment_order(monkeypatch: pytest.MonkeyPatch):
+    # WAV, so the size of every encoded segment is known
+    monkeypatch.setattr(recorder, "_get_encoder", lambda: None)
+    backend = MockTranscriptionBackend(latency=0.05)
+    transcriber = ChunkedTranscriber(backend, max_workers=4)
+    durations = [900, 300, 600, 100, 500]
+    for ms in durations:
+        transcriber.submit(_audio(SPEECH, ms))
+
+    text = transcriber.result()
+    wav_header = 44
+    sizes = [int(size) for size in re.findall(r"(\d+) bytes", text)]
+    assert sizes == [SAMPLE_RATE * 2 * ms // 1000 + wav_header for ms in durations]
+    assert backend.calls == len(durations)
+
+
+def test_hallucinations_and_empty_segments_are_dropped():
+    backend = MockTranscriptionBackend(
+        texts=["Hello", " Thanks for watching!", "  ", "world "]
+    )
+    transcriber = ChunkedTranscriber(backend, max_workers=1)
+    for _ in range(4):
+        transcriber.submit(_audio(SPEECH, 100))
+    assert transcriber.result() == "Hello world"
@@ -0,0 +1,79 @@
+import json
+import threading
+import time
+from collections.abc import Iterator
+from http.server import ThreadingHTTPServer
+from pathlib import Path
+
+import pytest
+
+from benchmarks.stub_server import StubHandler
+from llm_chat_term.config import EndpointConfig, config
+from llm_chat_term.llm import endpoints
+
+
+@pytest.fixture
+def server(monkeypatch: pytest.MonkeyPatch) -> Iterator[ThreadingHTTPServer]:
+    monkeypatch.setattr(StubHandler, "models", ["stub-a", "stub-b"])
+    monkeypatch.setattr(StubHandler, "connections", 0)
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StubHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    endpoint = EndpointConfig(
+        name="stub", base_url=f"http://127.0.0.1:{server.server_port}/v1"
+    )
+    monkeypatch.setattr(config.llm, "endpoints", [endpoint])
+    endpoints.discover_models.cache_clear()
+    endpoints.get_http_client.cache_clear()
+    yield server
+    server.shutdown()
+    server.server_close()
+    endpoints.discover_models.cache_clear()
+    endpoints.get_http_client.cache_clear()
+
+
+def _stop(server: ThreadingHTTPServer) -> None:
+    server.shutdown()
+    server.server_close()
+    endpoints.get_http_client.cache_clear()
+
+
+def test_discovers_the_models(server: ThreadingHTTPServer):  # noqa: ARG001
+    assert endpoints.discover_models("stub") == ("stub-a", "stub-b")
+    assert endpoints.get_endpoint_models() == [("stub", "stub-a"), ("stub", "stub-b")]
+    assert endpoints.get_endpoint_models(discover=False) == []
+
+
+def test_reads_the_disk_cache(server: ThreadingHTTPServer):
+    endpoints.discover_models("stub")
+    _stop(server)
+    # A new process within the hour doesn't ask the endpoint again
+    endpoints.discover_models.cache_clear()
+    assert endpoints.discover_models("stub") == ("stub-a", "stub-b")
+
+
+def test_falls_back_to_a_stale_cache(server: ThreadingHTTPServer, data_dir: Path):
+    endpoints.discover_models("stub")
+    _stop(server)
+    cache_file = data_dir / "endpoint_models.json"
+    models_cache = json.loads(cache_file.read_text(encoding="utf-8"))
+    for entry in models_cache.values():
+        entry["time"] = time.time() - 2 * endpoints.DISCOVERY_TTL_SECONDS
+    cache_file.write_text(json.dumps(models_cache), encoding="utf-8")
+
+    endpoints.discover_models.cache_clear()
+    assert endpoints.discover_models("stub") == ("stub-a", "stub-b")
+
+
+def test_reuses_the_client_of_the_endpoint(server: ThreadingHTTPServer, data_dir: Path):
+    base_url = f"http://127.0.0.1:{server.server_port}/v1"
+    for _ in range(3):
+        (data_dir / "endpoint_models.json").unlink(missing_ok=True)
+        endpoints.discover_models.cache_clear()
+        assert endpoints.discover_models("stub") == ("stub-a", "stub-b")
+    assert endpoints.get_http_client.cache_info().currsize == 1
+    assert endpoints.get_http_client(base_url, 120) is endpoints.get_http_client(
+        base_url, 120
+    )
+    # The three requests went over one keep-alive connection
+    assert StubHandler.connections == 1
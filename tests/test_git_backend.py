@@ -0,0 +1,40 @@
+import subprocess
+from pathlib import Path
+
+import pytest
+
+from llm_chat_term.llm.tools.git_backend import parse_index_paths
+
+
+def _git(repo: Path, *arguments: str) -> bytes:
+    return subprocess.run(  # noqa: S603
+        ["git", *arguments],  # noqa: S607
+        cwd=repo,
+        capture_output=True,
+        check=True,
+    ).stdout
+
+
+@pytest.fixture
+def repo(tmp_path: Path) -> Path:
+    _git(tmp_path, "init", "-q")
+    for name in ("README.md", "src/app.py", "src/lib/util.py", "tests/test_app.py"):
+        path = tmp_path / name
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(name, encoding="utf-8")
+    _git(tmp_path, "add", ".")
+    return tmp_path
+
+
+@pytest.mark.parametrize("version", ["2", "3", "4"])
+def test_index_paths_match_ls_files(repo: Path, version: str):
+    _git(repo, "update-index", "--index-version", version)
+    paths = parse_index_paths((repo / ".git" / "index").read_bytes())
+    assert paths == _git(repo, "ls-files").splitlines()
+
+
+def test_split_index_is_left_to_git(repo: Path):
+    _git(repo, "update-index", "--split-index")
+    (repo / "NEWS.md").write_text("news", encoding="utf-8")
+    _git(repo, "add", "NEWS.md")
+    assert parse_index_paths((repo / ".git" / "index").read_bytes()) is None
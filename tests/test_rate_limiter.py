@@ -0,0 +1,48 @@
+import contextlib
+import threading
+
+from llm_chat_term.config import RateLimitConfig
+from llm_chat_term.llm.rate_limiter import RateLimiter
+
+LIMITS = RateLimitConfig(
+    provider="openai", requests_per_minute=10, tokens_per_minute=1000
+)
+
+
+class BudgetSpentError(Exception):
+    pass
+
+
+def _spend(limiter: RateLimiter, taken: list[int]) -> None:
+    def stop(_wait: float, _ahead: int) -> None:
+        raise BudgetSpentError
+
+    # Takes requests until one of them would have to wait
+    with contextlib.suppress(BudgetSpentError):
+        while True:
+            limiter.acquire(300, on_wait=stop)
+            taken.append(300)
+
+
+def test_limiters_share_the_budget():
+    # Two processes using the same key, each with two requesting threads
+    limiters = [RateLimiter(LIMITS, "key"), RateLimiter(LIMITS, "key")]
+    taken: list[int] = []
+    threads = [
+        threading.Thread(target=_spend, args=(limiter, taken))
+        for limiter in limiters * 2
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert sum(taken) <= LIMITS.tokens_per_minute
+    assert len(taken) == LIMITS.tokens_per_minute // 300
+
+
+def test_consume_is_charged_to_the_other_limiter():
+    first, second = RateLimiter(LIMITS, "key"), RateLimiter(LIMITS, "key")
+    first.consume(800)
+    taken: list[int] = []
+    _spend(second, taken)
+    assert taken == []
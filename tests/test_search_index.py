@@ -0,0 +1,73 @@
+import subprocess
+import threading
+from pathlib import Path
+
+import pytest
+
+import llm_chat_term.llm.tools  # noqa: F401  # registers the tools
+from llm_chat_term.llm.tools.definitions import SearchCommand
+from llm_chat_term.llm.tools.handlers import search
+from llm_chat_term.llm.tools.search_index import (
+    SearchIndex,
+    get_search_index,
+    literal_runs,
+)
+
+
+def test_plain_query():
+    assert literal_runs("self.get(", regex=False) == ["self.get("]
+
+
+@pytest.mark.parametrize(
+    ("pattern", "expected"),
+    [
+        (r"def \w+_response", ["def ", "_response"]),
+        ("get_(resp)?onse", ["get_", "onse"]),
+        ("(?:get)_response", ["get", "_response"]),
+    ],
+)
+def test_literal_parts(pattern: str, expected: list[str]):
+    assert literal_runs(pattern, regex=True) == expected
+
+
+@pytest.mark.parametrize(
+    "pattern",
+    [
+        "foo|bar",
+        r"(?<!self\.)get_response",
+        "(?!zzz)get_response",
+        "(?P<n>get)_response",
+        "(?i)get_response",
+    ],
+)
+def test_no_required_literals(pattern: str):
+    assert literal_runs(pattern, regex=True) == []
+
+
+def test_falls_back_to_grep_while_the_index_builds(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+):
+    subprocess.run(["git", "init", "-q"], cwd=tmp_path, check=True)  # noqa: S603, S607
+    (tmp_path / "app.py").write_text("def get_response():\n    pass\n")
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(search, "BUILD_WAIT_SECONDS", 0.1)
+    listed = threading.Event()
+    list_files = SearchIndex._list_files  # noqa: SLF001
+
+    def slow_list_files(index: SearchIndex) -> list[str]:
+        listed.wait()
+        return list_files(index)
+
+    monkeypatch.setattr(SearchIndex, "_list_files", slow_list_files)
+    query = SearchCommand(query="def get_response", context=0)
+
+    result = search.handle_search(query)
+    assert result["success"]
+    assert result["fallback"] in ("rg", "git")
+    assert "app.py:1:def get_response():" in result["stdout"]
+
+    listed.set()
+    assert get_search_index(Path.cwd()).ready.wait(5)
+    result = search.handle_search(query)
+    assert "fallback" not in result
+    assert result["stdout"] == "app.py:1:def get_response():\n"